@@ -1,22 +1,50 @@
+import asyncio
 import uvicorn
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 
-from app.core.config import RELOAD, UPLOAD_DIR
+from app.core.config import (
+    PRELOAD_MODELS,
+    RELOAD,
+    RISK_ENGINE_INTERVAL_SECONDS,
+    STORAGE_GC_INTERVAL_SECONDS,
+    UPLOAD_DIR,
+)
+from app.db.migrations import run_migrations
 from app.db.session import engine
-from app.db import models
-from app.router import crop_router, disease_router, risk_router, soiltype_router, user_router, weather_router, chat_router, forum_router, game_router
+from app.models import disease
+from app.models.executor import PoolSaturated, inference_pool
+from app.models.loading import ModelUnavailable, preload_models
+from app.services import derivatives
+from app.services.maintenance import maintenance
+from app.services.risk_engine import risk_engine
+from app.services.static import UploadStaticFiles
+from app.router import crop_router, disease_router, risk_router, soiltype_router, user_router, weather_router, chat_router, forum_router, game_router, system_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(models.Base.metadata.create_all)
+    await run_migrations(engine)
+    # Load models in the background so "/" answers before TensorFlow is up
+    preload = asyncio.create_task(preload_models()) if PRELOAD_MODELS else None
+    # Incremental orphan collection and per-user usage totals
+    gc = asyncio.create_task(maintenance.run_forever()) if STORAGE_GC_INTERVAL_SECONDS else None
+    # 120-day risk reports for users whose forecast changed
+    risk = asyncio.create_task(risk_engine.run_forever()) if RISK_ENGINE_INTERVAL_SECONDS else None
     yield
+    if preload:
+        preload.cancel()
+    if gc:
+        gc.cancel()
+    if risk:
+        risk.cancel()
+    await disease.batcher.close()
     await engine.dispose()
+    inference_pool.executor.shutdown(wait=False, cancel_futures=True)
+    derivatives.executor.shutdown(wait=False, cancel_futures=True)
 
 
 app = FastAPI(lifespan=lifespan, title="KrishiBot API", version="1.0.0")
@@ -34,8 +62,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for uploads (images)
-app.mount("/static", StaticFiles(directory=UPLOAD_DIR), name="static")
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated):
+    # Backpressure: ask the client to retry instead of queueing without bound
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Inference capacity exhausted, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(ModelUnavailable)
+async def model_unavailable_handler(request: Request, exc: ModelUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+# Mount static files for uploads (images); ?w=<pixels> serves a resized variant
+app.mount("/static", UploadStaticFiles(directory=UPLOAD_DIR), name="static")
 
 # Include routers
 app.include_router(user_router, prefix="/users", tags=["Users"])
@@ -47,6 +88,7 @@ app.include_router(weather_router, prefix="/weather", tags=["Weather"])
 app.include_router(chat_router, prefix="/chat", tags=["AI Chat"])
 app.include_router(forum_router, prefix="/forum", tags=["Community Forum"])
 app.include_router(game_router, prefix="/game-api", tags=["EcoFarm Game"])
+app.include_router(system_router, tags=["Health"])
 
 
 @app.get("/", tags=["Health"])
@@ -184,6 +184,7 @@ GRID_WIDTH = 4
 
 MODEL_ALPHA = 100
 MODEL_GOLDUNIT = 10
+MODEL_KNN_K = 15
 SPEED = 1400
 
 MONTHS = [
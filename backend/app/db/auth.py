@@ -1,13 +1,79 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
 from fastapi import Depends, Cookie, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 import app.db.models as models
+from app.core.config import AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS
 from app.db.session import get_db
 
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    The authenticated user's own columns, without any relationships: all
+    most routes need is the id. Immutable, so one instance can be cached and
+    shared between requests.
+    """
+
+    id: int
+    username: str
+    is_expert: bool
+    latitude: float | None
+    longitude: float | None
+
+
+class IdentityCache:
+    """
+    username -> CurrentUser for ttl seconds, so authenticated requests skip
+    the users query. Unknown usernames are not cached, so a new account works
+    at once; routes that change a user call forget() so edits show at once too.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, CurrentUser]] = OrderedDict()
+
+    def get(self, username: str) -> CurrentUser | None:
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        expires, user = entry
+        if expires < time.monotonic():
+            del self._entries[username]
+            return None
+        return user
+
+    def put(self, user: CurrentUser) -> None:
+        self._entries[user.username] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.username)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def forget(self, *usernames: str) -> None:
+        for username in usernames:
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+identity_cache = IdentityCache(AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_SIZE)
+
+
 async def get_user_by_username(username: str, db: AsyncSession = Depends(get_db)):
+    """The User row alone; its history relationships are not loaded."""
+    result = await db.execute(select(models.User).filter(models.User.username == username))
+    return result.scalars().first()
+
+
+async def get_user_with_history(username: str, db: AsyncSession):
+    """The User with its scans, soil predictions and risk reports, for profile responses."""
     result = await db.execute(
         select(models.User)
         .options(
@@ -20,17 +86,46 @@ async def get_user_by_username(username: str, db: AsyncSession = Depends(get_db)
     return result.scalars().first()
 
 
+async def get_identity(username: str, db: AsyncSession) -> CurrentUser | None:
+    user = identity_cache.get(username) if AUTH_CACHE_TTL_SECONDS else None
+    if user is not None:
+        return user
+    row = (
+        await db.execute(
+            select(
+                models.User.id,
+                models.User.username,
+                models.User.is_expert,
+                models.User.latitude,
+                models.User.longitude,
+            ).filter(models.User.username == username)
+        )
+    ).first()
+    if row is None:
+        return None
+    user = CurrentUser(
+        id=row.id,
+        username=row.username,
+        is_expert=bool(row.is_expert),
+        latitude=float(row.latitude) if row.latitude is not None else None,
+        longitude=float(row.longitude) if row.longitude is not None else None,
+    )
+    if AUTH_CACHE_TTL_SECONDS:
+        identity_cache.put(user)
+    return user
+
+
 async def get_user_from_cookie(
     username: str | None = Cookie(default=None),
     db: AsyncSession = Depends(get_db),
-):
+) -> CurrentUser:
     if username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = await get_user_by_username(username=username, db=db)
+    user = await get_identity(username, db)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,105 @@
+"""
+Keyset pagination over a user's history tables, newest first.
+
+Pages are ordered by (created_at, id) descending and the cursor is the key
+of the last row served, so fetching page n costs the same as page 1 and
+rows saved while a client pages through never shift or repeat items. The
+cursor is opaque to clients: base64 of "<created_at>|<id>".
+
+SQLite keeps DateTime columns as text, and rows written by the server
+default ("2026-01-05 10:00:00") and by the app ("2026-01-05
+10:00:00.123456") differ in precision, so there the comparison is made on
+the stored text itself; on PostgreSQL it is made on the timestamps.
+"""
+
+import base64
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import String, and_, func, or_, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+def _is_sqlite(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "sqlite"
+
+
+def _sort_column(db: AsyncSession, model):
+    return type_coerce(model.created_at, String) if _is_sqlite(db) else model.created_at
+
+
+def _bound(db: AsyncSession, day: date):
+    """Midnight starting day, in the form _sort_column compares against."""
+    return day.isoformat() if _is_sqlite(db) else datetime(day.year, day.month, day.day)
+
+
+def encode_cursor(created_at, row_id: int) -> str:
+    value = created_at if isinstance(created_at, str) else created_at.isoformat()
+    return base64.urlsafe_b64encode(f"{value}|{row_id}".encode()).decode()
+
+
+def decode_cursor(db: AsyncSession, cursor: str):
+    try:
+        value, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return (value if _is_sqlite(db) else datetime.fromisoformat(value)), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def history_page(
+    db: AsyncSession,
+    model,
+    user_id: int,
+    limit: int,
+    cursor: str | None = None,
+    since: date | None = None,
+    until: date | None = None,
+    omit: tuple = (),
+) -> tuple[list, str | None]:
+    """
+    One page of model rows belonging to user_id, created on or after since
+    and on or before until. Columns in omit are not fetched (they read as
+    None). Returns the rows and the cursor of the next page, None at the end.
+    """
+    sort_column = _sort_column(db, model)
+    query = (
+        select(model, sort_column.label("sort_key"))
+        .filter(model.user_id == user_id)
+        .order_by(model.created_at.desc(), model.id.desc())
+        .limit(limit + 1)  # One extra row tells whether another page follows
+    )
+    if omit:
+        query = query.options(*(defer(column, raiseload=True) for column in omit))
+    if since:
+        query = query.filter(sort_column >= _bound(db, since))
+    if until:
+        query = query.filter(sort_column < _bound(db, until + timedelta(days=1)))
+    if cursor:
+        created_at, row_id = decode_cursor(db, cursor)
+        query = query.filter(
+            or_(
+                sort_column < created_at,
+                and_(sort_column == created_at, model.id < row_id),
+            )
+        )
+
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].sort_key, rows[-1][0].id)
+    items = [row[0] for row in rows]
+    for item in items:
+        for column in omit:
+            # Never loaded: mark as None so serializing doesn't hit the raiseload
+            set_committed_value(item, column.key, None)
+    return items, next_cursor
+
+
+async def history_summary(db: AsyncSession, model, user_id: int, omit: tuple = ()) -> dict:
+    """Row count and newest row of model for user_id."""
+    count = await db.scalar(select(func.count()).filter(model.user_id == user_id))
+    latest, _ = await history_page(db, model, user_id, limit=1, omit=omit)
+    return {"count": count, "latest": latest[0] if latest else None}
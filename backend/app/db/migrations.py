@@ -0,0 +1,154 @@
+"""
+Schema migrations.
+
+create_all only creates missing tables, so columns, indexes and
+constraints added to app/db/models.py after a database was first created
+never reach it. Each migration here runs once per database, in order, and
+is recorded in the schema_migrations table. The app applies pending ones
+at startup (lifespan); to apply or inspect them by hand, from the backend
+directory:
+
+    python -m app.db.migrations
+    python -m app.db.migrations --list
+
+A migration is a function of a synchronous Connection run inside one
+transaction. Models keep declaring the final schema, so on a new database
+create_all builds everything and the migrations find nothing left to do:
+write them to be idempotent (checkfirst=True, IF NOT EXISTS).
+"""
+
+import argparse
+import asyncio
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, func, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db import models
+from app.db.session import Base, engine
+
+migrations_table = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def _index(table, name: str) -> Index:
+    return next(index for index in table.indexes if index.name == name)
+
+
+def _keep_one_vote(conn: Connection, table: str, target: str) -> None:
+    """Drop duplicate votes a racing select-then-insert let in, keeping the newest."""
+    conn.execute(
+        text(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT MAX(id) FROM {table} GROUP BY {target}, user_id)"
+        )
+    )
+
+
+def add_history_and_vote_indexes(conn: Connection) -> None:
+    _keep_one_vote(conn, "question_votes", "question_id")
+    _keep_one_vote(conn, "answer_votes", "answer_id")
+    for model, name in [
+        (models.DiseaseDetection, "ix_disease_detections_user_created"),
+        (models.SoilTypePrediction, "ix_soil_type_predictions_user_created"),
+        (models.RiskPrediction, "ix_risk_predictions_user_created"),
+        (models.Question, "ix_questions_created"),
+        (models.Question, "ix_questions_user"),
+        (models.Answer, "ix_answers_question_created"),
+        (models.QuestionVote, "uq_question_votes_question_user"),
+        (models.AnswerVote, "uq_answer_votes_answer_user"),
+        # Used by the blob store's reference counting
+        (models.DiseaseDetection, "ix_disease_detections_image_path"),
+        (models.SoilTypePrediction, "ix_soil_type_predictions_image_path"),
+        (models.Question, "ix_questions_image_path"),
+    ]:
+        _index(model.__table__, name).create(conn, checkfirst=True)
+
+
+def add_risk_report_key(conn: Connection) -> None:
+    # Reports written before the key existed: keep the newest per crop and day
+    conn.execute(
+        text(
+            "DELETE FROM risk_predictions WHERE id NOT IN (SELECT MAX(id) FROM "
+            "risk_predictions GROUP BY user_id, crop_name, forecast_start_date)"
+        )
+    )
+    _index(models.RiskPrediction.__table__, "uq_risk_predictions_user_crop_start").create(
+        conn, checkfirst=True
+    )
+
+
+# (version, description, migration), applied in this order
+MIGRATIONS: list[tuple[str, str, Callable[[Connection], None]]] = [
+    (
+        "0001",
+        "History (user_id, created_at) and forum indexes, unique votes",
+        add_history_and_vote_indexes,
+    ),
+    (
+        "0002",
+        "One risk report per user, crop and forecast start date",
+        add_risk_report_key,
+    ),
+]
+
+
+def _applied(conn: Connection) -> set[str]:
+    return set(conn.execute(select(migrations_table.c.version)).scalars())
+
+
+async def run_migrations(engine: AsyncEngine) -> list[str]:
+    """Create missing tables, then apply pending migrations. Returns their versions."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(migrations_table.create, checkfirst=True)
+        applied = await conn.run_sync(_applied)
+
+    ran = []
+    for version, description, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        # One transaction per migration: a failure leaves earlier ones recorded
+        async with engine.begin() as conn:
+            if version in await conn.run_sync(_applied):
+                continue  # Another worker starting at the same time got here first
+            await conn.run_sync(migration)
+            await conn.execute(
+                migrations_table.insert().values(version=version, description=description)
+            )
+        print(f"Applied migration {version}: {description}")
+        ran.append(version)
+    return ran
+
+
+async def status(engine: AsyncEngine) -> list[tuple[str, str, bool]]:
+    async with engine.begin() as conn:
+        await conn.run_sync(migrations_table.create, checkfirst=True)
+        applied = await conn.run_sync(_applied)
+    return [(version, description, version in applied) for version, description, _ in MIGRATIONS]
+
+
+async def main_async(list_only: bool) -> None:
+    if list_only:
+        for version, description, done in await status(engine):
+            print(f"{version}  {'applied' if done else 'pending'}  {description}")
+    elif not await run_migrations(engine):
+        print("Database is up to date")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--list", action="store_true", help="Show migrations and their state")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.list))
+
+
+if __name__ == "__main__":
+    main()
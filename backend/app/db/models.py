@@ -1,13 +1,17 @@
 from sqlalchemy import (
+    BigInteger,
     Column,
     Integer,
     String,
     Numeric,
     ForeignKey,
     DateTime,
+    Float,
     Text,
     Date,
     Boolean,
+    Index,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -39,12 +43,15 @@ class DiseaseDetection(Base):
     """
 
     __tablename__ = "disease_detections"
+    # History pages: a user's rows by (created_at, id); see app/db/migrations.py
+    __table_args__ = (Index("ix_disease_detections_user_created", "user_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
-    # Store path to the image file, not the BLOB itself for performance
-    image_path = Column(String, nullable=False)
+    # Store path to the image file, not the BLOB itself for performance.
+    # Indexed for the blob store's reference counting on delete.
+    image_path = Column(String, nullable=False, index=True)
 
     # Prediction results
     detected_disease = Column(String, nullable=False)
@@ -65,11 +72,12 @@ class SoilTypePrediction(Base):
     """
 
     __tablename__ = "soil_type_predictions"
+    __table_args__ = (Index("ix_soil_type_predictions_user_created", "user_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
-    image_path = Column(String, nullable=False)
+    image_path = Column(String, nullable=False, index=True)
     predicted_soil_type = Column(String, nullable=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -77,12 +85,44 @@ class SoilTypePrediction(Base):
     user = relationship("User", back_populates="soil_type_predictions")
 
 
+class PredictionCache(Base):
+    """
+    Model output per uploaded image content, so re-uploads of the same photo
+    skip inference. Keyed by the SHA-256 of the bytes and the model version,
+    so retrained or re-quantized models never serve stale results.
+    """
+
+    __tablename__ = "prediction_cache"
+    __table_args__ = (UniqueConstraint("content_hash", "model", "model_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    model = Column(String, nullable=False)  # "disease" or "soil"
+    model_version = Column(String, nullable=False)
+
+    result = Column(Text, nullable=False)  # JSON-encoded prediction
+    image_path = Column(String, nullable=False)  # Stored copy of the upload
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class RiskPrediction(Base):
     """
     Stores risk assessments for specific crops based on 120-day weather data.
     """
 
     __tablename__ = "risk_predictions"
+    __table_args__ = (
+        Index("ix_risk_predictions_user_created", "user_id", "created_at"),
+        # One report per crop and forecast day; the risk engine upserts on it
+        Index(
+            "uq_risk_predictions_user_crop_start",
+            "user_id",
+            "crop_name",
+            "forecast_start_date",
+            unique=True,
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -105,11 +145,15 @@ class RiskPrediction(Base):
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (
+        Index("ix_questions_created", "created_at"),
+        Index("ix_questions_user", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
-    image_path = Column(String, nullable=True)
+    image_path = Column(String, nullable=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -120,6 +164,7 @@ class Question(Base):
 
 class Answer(Base):
     __tablename__ = "answers"
+    __table_args__ = (Index("ix_answers_question_created", "question_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
@@ -134,17 +179,22 @@ class Answer(Base):
 
 class QuestionVote(Base):
     __tablename__ = "question_votes"
+    __table_args__ = (
+        Index("uq_question_votes_question_user", "question_id", "user_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
 
-    # Constraint: Only one upvote per user per question
+    # Constraint: Only one upvote per user per question (uq_question_votes_question_user)
     question = relationship("Question", back_populates="votes")
 
 
 class AnswerVote(Base):
     __tablename__ = "answer_votes"
+    # One vote per user per answer, enforced by the database
+    __table_args__ = (Index("uq_answer_votes_answer_user", "answer_id", "user_id", unique=True),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -152,3 +202,62 @@ class AnswerVote(Base):
     vote_type = Column(Integer, nullable=False)  # 1 for upvote, -1 for downvote
 
     answer = relationship("Answer", back_populates="votes")
+
+
+class StorageUsage(Base):
+    """
+    Bytes of uploaded images each user's scans, predictions and questions
+    refer to, checked against USER_STORAGE_QUOTA_MB on upload. Saved uploads
+    add to it; the storage maintenance task recomputes it from the
+    referencing rows, which also corrects for deletions.
+    """
+
+    __tablename__ = "storage_usage"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    bytes = Column(BigInteger, nullable=False, default=0)
+    files = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class RiskForecastState(Base):
+    """
+    Hash of the forecast each user's risk reports were last computed from.
+    The risk engine recomputes a user only when the hash of their current
+    forecast differs (app/services/risk_engine.py).
+    """
+
+    __tablename__ = "risk_forecast_state"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    cell = Column(String, nullable=False)  # Grid cell the forecast was fetched for
+    forecast_hash = Column(String(64), nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class TaskLease(Base):
+    """
+    Which process runs a scheduled task when several workers start it. The
+    holder renews the lease before every run; another process takes it over
+    once it expires (app/services/risk_engine.py).
+    """
+
+    __tablename__ = "task_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)  # "hostname:pid"
+    expires_at = Column(Float, nullable=False)  # Unix time
+
+
+class ClimateNormal(Base):
+    """
+    Day-of-year climate normals per grid cell, computed once from the daily
+    history of the past CLIMATE_NORMAL_YEARS (app/services/climatology.py).
+    """
+
+    __tablename__ = "climate_normals"
+
+    cell = Column(String, primary_key=True)
+    years = Column(Integer, nullable=False)
+    normals = Column(Text, nullable=False)  # JSON: 366 x [t_max, t_min, precipitation]
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,17 +1,70 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from typing import AsyncGenerator
 
-# NOTE: Use the "+aiosqlite" driver for async SQLite
-DATABASE_URL = "sqlite+aiosqlite:///./data.db"
-
-# 1. Create Async Engine
-engine = create_async_engine(
+from app.core.config import (
     DATABASE_URL,
-    connect_args={"check_same_thread": False},  # Needed for SQLite
-    echo=False,
+    DB_ECHO,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE_SECONDS,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_MB,
+    SQLITE_MMAP_SIZE_MB,
+)
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    # Durable across crashes in WAL mode; only a power loss can drop the last commits
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 2**20}",
+    # Negative: size in KiB rather than pages
+    f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_MB * 1024}",
+    "PRAGMA temp_store=MEMORY",
+    # Off by default in SQLite, unlike the server databases
+    "PRAGMA foreign_keys=ON",
 )
 
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def build_engine(url: str = DATABASE_URL) -> AsyncEngine:
+    """
+    1. Create Async Engine. SQLite connections get the pragmas above as they
+    open; server databases get a sized, health-checked connection pool.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        engine = create_async_engine(
+            url,
+            connect_args={"check_same_thread": False},  # Needed for SQLite
+            echo=DB_ECHO,
+        )
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        return engine
+    return create_async_engine(
+        url,
+        echo=DB_ECHO,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        # Replace connections the server closed while they sat in the pool
+        pool_pre_ping=True,
+    )
+
+
+engine = build_engine()
+
 # 2. Create Async Session Factory
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -24,6 +77,13 @@ AsyncSessionLocal = async_sessionmaker(
 Base = declarative_base()
 
 
+def dialect_insert(session: AsyncSession, model):
+    """An INSERT supporting on_conflict_do_nothing / _do_update on either backend."""
+    if session.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
 # 3. Async Dependency
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
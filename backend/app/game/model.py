@@ -1,13 +1,16 @@
-import pandas as pd
 import numpy as np
+from app.models.crop_artifact import load_crop_data
 from .constants import CROPS_USED, MODEL_ALPHA, MODEL_GOLDUNIT
 
+CSV_PATH = "./app/game/data/data.csv"
+ARTIFACT_PATH = "./app/game/data/crop_model.npz"
+
 
 class Model:
     """ML Model for crop recommendation based on soil parameters"""
     
     _instance = None
-    _df = None
+    _data = None
     
     def __new__(cls, *args, **kwargs):
         """Singleton pattern to avoid reloading data"""
@@ -30,15 +33,21 @@ class Model:
         self.crops_used = crops_used
         
         try:
-            if Model._df is None:
-                Model._df = pd.read_csv("./app/game/data/data.csv")
-            self.df_filtered = Model._df[Model._df["label"].isin(self.crops_used)]
-            self.summary_dict = self.df_filtered.groupby("label").mean().T.to_dict()
-            self.d = {k: np.array(list(v.values())) for k, v in self.summary_dict.items()}
+            if Model._data is None:
+                Model._data = load_crop_data(CSV_PATH, ARTIFACT_PATH)
+            keep = np.isin(Model._data.crops, self.crops_used)
+            self.d = {
+                str(crop): np.asarray(centroid)
+                for crop, centroid in zip(Model._data.crops[keep], Model._data.centroids[keep])
+            }
+            self.crops = np.array(list(self.d))
+            self.centroids = np.stack(list(self.d.values()))
             self._initialized = True
         except Exception as e:
             print(f"Error loading model data: {e}")
             self.d = {}
+            self.crops = np.array([], dtype=str)
+            self.centroids = np.empty((0, 7))
             self._initialized = True
 
     def predict(self, params: np.ndarray) -> dict:
@@ -51,6 +60,65 @@ class Model:
             return {}
         return {k: float(np.linalg.norm(v - params)) for k, v in self.d.items()}
 
+    def distance_matrix(self, params: np.ndarray) -> np.ndarray:
+        """
+        Distances from many parameter rows (e.g. one per grid cell) to every
+        crop in a single broadcast.
+        Takes a (cells, 7) array, returns (cells, crops) ordered as self.crops.
+        """
+        params = np.atleast_2d(np.asarray(params, dtype=np.float64))
+        diff = params[:, None, :] - self.centroids[None, :, :]
+        return np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+
+    def score_grid(self, params: np.ndarray, k: int = 3) -> tuple:
+        """
+        Best k crops per row of a (cells, 7) array without sorting every crop.
+
+        Returns:
+            tuple of (crop_indices, distances), both (cells, k), best first
+        """
+        distances = self.distance_matrix(params)
+        k = min(k, distances.shape[1])
+        if k < distances.shape[1]:
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(k), (len(distances), 1))
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_distances, order, axis=1)
+
+    def top_crops_per_cell(self, params: np.ndarray, k: int = 3) -> list:
+        """Per-cell lists of (crop_name, distance), best first."""
+        indices, distances = self.score_grid(params, k)
+        return [
+            [(str(self.crops[i]), float(d)) for i, d in zip(row_indices, row_distances)]
+            for row_indices, row_distances in zip(indices, distances)
+        ]
+
+    def to_gold(self, distances: np.ndarray) -> np.ndarray:
+        """Convert distances to gold values (closer = higher gold)."""
+        distances = np.asarray(distances, dtype=np.float64)
+        safe = np.where(distances > 0, distances, 1.0)
+        return np.where(
+            distances > 0,
+            np.round(self.alpha / safe * self.goldunit, 2),
+            self.alpha * self.goldunit,  # Perfect match
+        )
+
+    def recommend_grid(self, params: np.ndarray, top_n: int = 3) -> list:
+        """
+        Top N crop recommendations with gold values for every row of a
+        (cells, 7) array, e.g. a whole farm grid or a per-tick overlay.
+
+        Returns list (one per cell) of [{"crop": name, "score": gold_value}, ...]
+        """
+        indices, distances = self.score_grid(params, top_n)
+        gold = self.to_gold(distances)
+        return [
+            [{"crop": str(self.crops[i]).capitalize(), "score": float(g)} for i, g in zip(row_i, row_g)]
+            for row_i, row_g in zip(indices, gold)
+        ]
+
     def topn(self, n: int, params: np.ndarray, predict_gold: bool = False) -> tuple:
         """
         Get top N recommended crops based on soil parameters.
@@ -92,10 +160,7 @@ class Model:
         
         Returns list of dicts: [{"crop": name, "score": gold_value}, ...]
         """
-        params = np.array([n, p, k, temperature, humidity, ph, rainfall])
-        top_crops, gold_dict = self.topn(top_n, params, predict_gold=True)
-        
-        return [
-            {"crop": crop.capitalize(), "score": gold_dict.get(crop, 0)}
-            for crop in top_crops
-        ]
+        if not self.d:
+            return []
+        params = np.array([[n, p, k, temperature, humidity, ph, rainfall]])
+        return self.recommend_grid(params, top_n)[0]
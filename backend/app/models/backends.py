@@ -0,0 +1,176 @@
+"""
+Inference backends for the image classifiers.
+
+"keras" runs the original .h5 model through TensorFlow. "tflite" runs a
+converted float16/int8 variant (see app/tools/convert_models.py) through the
+standalone LiteRT interpreter when ai-edge-litert (or tflite-runtime) is
+installed, so a CPU-only worker never has to import TensorFlow; without
+either package it falls back to tf.lite.
+"""
+
+import functools
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+BACKENDS = ("keras", "tflite")
+
+
+def tflite_path(h5_path: str, variant: str) -> str:
+    """app/data/model.h5 + "float16" -> app/data/model.float16.tflite"""
+    return f"{os.path.splitext(h5_path)[0]}.{variant}.tflite"
+
+
+@functools.cache
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_version(kind: str, h5_path: str, variant: str) -> str:
+    """
+    Identifies the weights the configured backend would serve, without loading
+    them: "keras-<sha>" or "tflite-<variant>-<sha>" of the file on disk.
+    """
+    prefix, path = kind, h5_path
+    if kind == "tflite":
+        prefix, path = f"tflite-{variant}", tflite_path(h5_path, variant)
+    if not os.path.exists(path):
+        return f"{prefix}-missing"  # Loading will fail, nothing gets cached
+    return f"{prefix}-{_file_digest(path)[:16]}"
+
+
+class KerasBackend:
+    """
+    The model behind a tf.function with a fixed [None, H, W, 3] float32
+    signature: one graph serves every batch size, and calls skip the data
+    adapter and callback machinery of model.predict.
+    """
+
+    name = "keras"
+
+    def __init__(self, model_path: str):
+        import tensorflow as tf
+
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+        self.input_shape = tuple(self.model.input_shape[1:])
+        self._forward = tf.function(
+            lambda batch: self.model(batch, training=False),
+            input_signature=[tf.TensorSpec([None, *self.input_shape], tf.float32)],
+        )
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(int(np.prod(w.shape)) * np.dtype(w.dtype).itemsize for w in self.model.weights)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self._forward(batch.astype(np.float32, copy=False)).numpy()
+
+    def warmup(self, batch_sizes) -> None:
+        """Trace the graph and run each batch size once so no request pays for it."""
+        for size in batch_sizes:
+            self.predict(np.zeros((size, *self.input_shape), dtype=np.float32))
+
+
+def _tflite_interpreter_class():
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, model_path: str, num_threads: int | None = None):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found, run python -m app.tools.convert_models first"
+            )
+        self.model_path = model_path
+        self.interpreter = _tflite_interpreter_class()(
+            model_path=model_path, num_threads=num_threads
+        )
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # One interpreter holds one set of tensors; calls must not interleave
+        self._lock = threading.Lock()
+
+    def _quantize(self, batch: np.ndarray) -> np.ndarray:
+        dtype = self._input["dtype"]
+        scale, zero_point = self._input["quantization"]
+        if np.issubdtype(dtype, np.integer) and scale:
+            info = np.iinfo(dtype)
+            batch = np.round(batch / scale + zero_point)
+            return np.clip(batch, info.min, info.max).astype(dtype)
+        return batch.astype(dtype, copy=False)
+
+    def _dequantize(self, output: np.ndarray) -> np.ndarray:
+        scale, zero_point = self._output["quantization"]
+        if np.issubdtype(output.dtype, np.integer) and scale:
+            return (output.astype(np.float32) - zero_point) * scale
+        return output
+
+    @property
+    def memory_bytes(self) -> int:
+        """Weights plus the interpreter's tensor arena at the current batch size."""
+        return sum(
+            int(np.prod(t["shape"])) * np.dtype(t["dtype"]).itemsize
+            for t in self.interpreter.get_tensor_details()
+        )
+
+    @property
+    def input_shape(self) -> tuple:
+        return tuple(int(d) for d in self._input["shape"][1:])
+
+    def warmup(self, batch_sizes) -> None:
+        # Ends on the largest size so the busiest batches need no reallocation
+        for size in sorted(batch_sizes):
+            self.predict(np.zeros((size, *self.input_shape), dtype=np.float32))
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(
+                    self._input["index"], [len(batch), *self._input["shape"][1:]]
+                )
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self._input["index"], self._quantize(batch))
+            self.interpreter.invoke()
+            return self._dequantize(self.interpreter.get_tensor(self._output["index"]).copy())
+
+
+def load_backend(
+    kind: str,
+    h5_path: str,
+    variant: str,
+    num_threads: int | None = None,
+    warmup_batch_sizes=(),
+):
+    """
+    Build the configured backend for a model whose original weights live at
+    h5_path, warmed up on dummy batches of each of warmup_batch_sizes.
+    """
+    if kind == "keras":
+        backend = KerasBackend(h5_path)
+    elif kind == "tflite":
+        backend = TFLiteBackend(tflite_path(h5_path, variant), num_threads=num_threads)
+    else:
+        raise ValueError(f"Unknown inference backend: {kind} (expected one of {BACKENDS})")
+    backend.warmup(warmup_batch_sizes)
+    return backend
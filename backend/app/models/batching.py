@@ -0,0 +1,114 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-sample inference requests into one batch.
+
+    The first queued sample opens a batch; the batch is closed after
+    max_wait_ms or once max_batch_size samples are waiting, run through
+    predict_fn in a single call by run(predict_fn, batch) (on the loop's
+    default executor if None), and each output row is handed back to the
+    request that submitted it. An exception from run, e.g. a full pool, is
+    raised to every request in the batch.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        run: Callable[..., Awaitable[Any]] | None = None,
+    ):
+        self.predict_fn = predict_fn
+        self.run = run
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._in_flight = 0
+        self._batches = 0
+        self._samples = 0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        # A new event loop (e.g. a test client or a reload) needs its own queue
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, sample: np.ndarray) -> np.ndarray:
+        """Queue one sample (without batch dimension) and wait for its output row."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((sample, future))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Requests whose handler went away no longer need a forward pass
+        return [(sample, future) for sample, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            self._in_flight = len(batch)
+            try:
+                inputs = np.stack([sample for sample, _ in batch])
+                if self.run is None:
+                    outputs = await self._loop.run_in_executor(None, self.predict_fn, inputs)
+                else:
+                    outputs = await self.run(self.predict_fn, inputs)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), output in zip(batch, outputs):
+                    if not future.done():
+                        future.set_result(output)
+            finally:
+                self._in_flight = 0
+            self._batches += 1
+            self._samples += len(batch)
+
+    async def close(self) -> None:
+        """Stop the worker task; requests still queued are cancelled."""
+        worker, self._worker = self._worker, None
+        if worker is None or worker.done():
+            return
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+        while self._queue and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "in_flight": self._in_flight,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self._batches,
+            "samples": self._samples,
+            "avg_batch_size": self._samples / self._batches if self._batches else 0.0,
+        }
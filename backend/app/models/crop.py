@@ -1,7 +1,13 @@
 from typing import Any
-import pandas as pd
 import numpy as np
-from app.core.constants import CROPS_USED, MODEL_ALPHA, MODEL_GOLDUNIT
+from scipy.spatial import cKDTree
+from app.core.config import CROP_MODEL_MODE
+from app.core.constants import CROPS_USED, MODEL_ALPHA, MODEL_GOLDUNIT, MODEL_KNN_K
+from app.models.crop_artifact import load_crop_data
+
+MODES = ("centroid", "knn")
+CSV_PATH = "app/data/data.csv"
+ARTIFACT_PATH = "app/data/crop_model.npz"
 
 
 class Model:
@@ -12,14 +18,44 @@ class Model:
         alpha=MODEL_ALPHA,
         goldunit=MODEL_GOLDUNIT,
         crops_used=CROPS_USED,
+        mode=CROP_MODEL_MODE,
+        k=MODEL_KNN_K,
     ):
-        self._df = pd.read_csv("app/data/data.csv")
+        if mode not in MODES:
+            raise ValueError(f"Unknown recommender mode: {mode}")
+        self.data = load_crop_data(CSV_PATH, ARTIFACT_PATH)
         self.alpha = alpha
         self.goldunit = goldunit
         self.crops_used = crops_used
-        self.df_filtered = self._df[self._df["label"].isin(self.crops_used)]
-        self.summary_dict = self.df_filtered.groupby("label").mean().T.to_dict()
-        self.d = {k: np.array(list(v.values())) for k, v in self.summary_dict.items()}
+        self.mode = mode
+        self.k = k
+        keep = np.isin(self.data.crops, self.crops_used)
+        self.d = {
+            str(crop): np.asarray(centroid)
+            for crop, centroid in zip(self.data.crops[keep], self.data.centroids[keep])
+        }
+        self.crops = np.array(list(self.d))
+        self.centroids = np.stack(list(self.d.values()))
+        self._crop_index = {crop: i for i, crop in enumerate(self.d)}
+
+        # Standardization stats and the spatial index over every training row,
+        # built once so k-NN queries stay logarithmic in the number of rows.
+        row_mask = np.isin(self.data.labels, self.crops_used)
+        self.labels = self.data.labels[row_mask]
+        if row_mask.all() and self.data.index_rows is not None:
+            self.mean, self.std = self.data.mean, self.data.std
+            index_rows = self.data.index_rows
+        else:
+            rows = np.asarray(self.data.rows)[row_mask]
+            self.mean = rows.mean(axis=0)
+            self.std = rows.std(axis=0)
+            self.std[self.std == 0] = 1.0
+            index_rows = self.standardize(rows)
+        self.tree = cKDTree(index_rows)
+
+    def standardize(self, params: np.ndarray) -> np.ndarray:
+        """Z-score params (or a matrix of params) with the training set statistics."""
+        return (np.asarray(params, dtype=np.float64) - self.mean) / self.std
 
     def predict(self, params: np.ndarray) -> dict:
         """
@@ -29,23 +65,102 @@ class Model:
         """
         return {k: float(np.linalg.norm(v - params)) for k, v in self.d.items()}
 
-    def topn(self, n: int, params: np.ndarray) -> tuple[list[str], dict[str, Any]]:
+    def predict_knn(self, params: np.ndarray, k: int | None = None) -> dict:
+        """
+        Vote among the k nearest training rows in standardized feature space.
+        Each neighbour votes with weight 1/distance, so ties go to the closer rows.
+        Returns dict of {crop_name: vote_share}, shares sum to 1.
+        """
+        k = min(k or self.k, len(self.labels))
+        distances, indices = self.tree.query(self.standardize(params), k=k)
+        weights = 1.0 / (np.atleast_1d(distances) + 1e-9)
+        votes: dict[str, float] = {}
+        for label, weight in zip(self.labels[np.atleast_1d(indices)], weights):
+            votes[str(label)] = votes.get(str(label), 0.0) + float(weight)
+        total = sum(votes.values())
+        return {label: vote / total for label, vote in votes.items()}
+
+    def score_matrix(self, params: np.ndarray, mode: str | None = None) -> np.ndarray:
+        """
+        Score many parameter rows against every crop in one vectorized pass.
+
+        Args:
+            params: (rows, 7) array, columns ordered as in FEATURES
+            mode: "centroid" gives distances (lower is better), "knn" gives
+                vote shares (higher is better)
+
+        Returns:
+            (rows, crops) array, columns ordered as self.crops
+        """
+        params = np.atleast_2d(np.asarray(params, dtype=np.float64))
+        if (mode or self.mode) != "knn":
+            return np.linalg.norm(params[:, None, :] - self.centroids[None, :, :], axis=2)
+
+        k = min(self.k, len(self.labels))
+        distances, indices = self.tree.query(self.standardize(params), k=k)
+        distances = distances.reshape(len(params), -1)
+        indices = indices.reshape(len(params), -1)
+        codes = np.vectorize(self._crop_index.__getitem__, otypes=[np.intp])(self.labels[indices])
+        votes = np.zeros((len(params), len(self.crops)))
+        rows = np.repeat(np.arange(len(params)), codes.shape[1])
+        np.add.at(votes, (rows, codes.ravel()), (1.0 / (distances + 1e-9)).ravel())
+        return votes / votes.sum(axis=1, keepdims=True)
+
+    def timeline(
+        self, params: np.ndarray, n: int, mode: str | None = None
+    ) -> tuple[list[list[str]], np.ndarray, dict[str, float]]:
+        """
+        Rank crops for each row of a (days, 7) parameter matrix.
+
+        Returns:
+            tuple of (top_n_crops_per_day, score_matrix, stability) where
+            stability maps each crop that ever makes the top N to the
+            fraction of days it does so
+        """
+        mode = mode or self.mode
+        scores = self.score_matrix(params, mode=mode)
+        order = np.argsort(-scores if mode == "knn" else scores, axis=1)[:, :n]
+        # k-NN only ranks crops that received at least one vote
+        if mode == "knn":
+            in_top = np.take_along_axis(scores, order, axis=1) > 0
+        else:
+            in_top = np.ones(order.shape, dtype=bool)
+        ranked = [[str(c) for c in self.crops[row[keep]]] for row, keep in zip(order, in_top)]
+
+        counts = np.bincount(order[in_top], minlength=len(self.crops)) / len(order)
+        stability = {
+            str(self.crops[i]): float(counts[i])
+            for i in np.argsort(-counts, kind="stable")
+            if counts[i] > 0
+        }
+        return ranked, scores, stability
+
+    def topn(
+        self, n: int, params: np.ndarray, mode: str | None = None
+    ) -> tuple[list[str], dict[str, Any]]:
         """
         Get top N recommended crops based on soil parameters.
 
         Args:
             n: Number of top crops to return
             params: np.array of [N, P, K, temperature, humidity, ph, rainfall]
-            predict_gold: If True, convert distances to gold predictions
+            mode: "centroid" (distance to crop means) or "knn" (vote share),
+                defaults to the mode the model was built with
 
         Returns:
             tuple of (top_crop_names, prediction_dict)
         """
-        predictions = self.predict(params)
+        mode = mode or self.mode
+        if mode == "knn":
+            predictions = self.predict_knn(params)
+        else:
+            predictions = self.predict(params)
         if not predictions:
             return [], {}
 
-        # Sort by distance (lower is better)
-        sorted_predictions = dict(sorted(predictions.items(), key=lambda item: item[1]))
+        # Sort by distance (lower is better) or by vote share (higher is better)
+        sorted_predictions = dict(
+            sorted(predictions.items(), key=lambda item: item[1], reverse=mode == "knn")
+        )
         top_keys = list(sorted_predictions.keys())[:n]
         return top_keys, sorted_predictions
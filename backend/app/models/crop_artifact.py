@@ -0,0 +1,143 @@
+"""
+Precompiled crop recommendation data.
+
+The training CSV is compiled offline (see app/tools/build_crop_artifact.py)
+into an uncompressed .npz holding the raw rows, label codes, per-crop
+centroids, normalization stats and the standardized rows the k-NN tree is
+built over. At runtime the members are memory-mapped straight out of the
+archive, so neither pandas nor a CSV parse is needed on startup. The CSV is
+only read when the artifact is missing or was built from different data.
+"""
+
+import csv
+import hashlib
+import os
+import zipfile
+from dataclasses import dataclass
+
+import numpy as np
+
+ARTIFACT_VERSION = 1
+FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+
+@dataclass
+class CropData:
+    rows: np.ndarray  # (n_rows, 7) raw feature values
+    labels: np.ndarray  # (n_rows,) crop name per row
+    crops: np.ndarray  # (n_crops,) sorted crop names
+    centroids: np.ndarray  # (n_crops, 7) per-crop feature means
+    mean: np.ndarray  # (7,)
+    std: np.ndarray  # (7,)
+    index_rows: np.ndarray | None  # (n_rows, 7) standardized rows, if compiled in
+    source: str  # "artifact" or "csv"
+
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def compile_csv(csv_path: str, with_index: bool = True) -> dict[str, np.ndarray]:
+    """Parse the training CSV into the arrays stored in the artifact."""
+    with open(csv_path, newline="") as f:
+        records = list(csv.DictReader(f))
+
+    rows = np.array([[float(r[c]) for c in FEATURES] for r in records], dtype=np.float64)
+    crops, codes = np.unique([r["label"] for r in records], return_inverse=True)
+    centroids = np.stack([rows[codes == i].mean(axis=0) for i in range(len(crops))])
+    mean = rows.mean(axis=0)
+    std = rows.std(axis=0)
+    std[std == 0] = 1.0
+
+    arrays = {
+        "version": np.array(ARTIFACT_VERSION),
+        "source_sha256": np.array(file_sha256(csv_path)),
+        "features": np.array(FEATURES),
+        "rows": rows,
+        "codes": codes.astype(np.uint16),
+        "crops": crops.astype(str),
+        "centroids": centroids,
+        "mean": mean,
+        "std": std,
+    }
+    if with_index:
+        arrays["index_rows"] = (rows - mean) / std
+    return arrays
+
+
+def write_artifact(arrays: dict[str, np.ndarray], path: str) -> None:
+    # Uncompressed on purpose: stored members can be memory-mapped in place.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _mmap_npz(path: str) -> dict[str, np.ndarray]:
+    """Memory-map every member of an uncompressed .npz archive."""
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as raw:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{info.filename} is compressed, rebuild the artifact")
+            # Local file header: 30 fixed bytes, then the name and extra field
+            raw.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(raw.read(4), dtype="<u2")
+            raw.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+            major, _ = np.lib.format.read_magic(raw)
+            if major == 1:
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(raw)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(raw)
+            name = info.filename.removesuffix(".npy")
+            if shape == ():
+                arrays[name] = np.fromfile(raw, dtype=dtype, count=1).reshape(())
+            else:
+                arrays[name] = np.memmap(
+                    path,
+                    dtype=dtype,
+                    mode="r",
+                    offset=raw.tell(),
+                    shape=shape,
+                    order="F" if fortran else "C",
+                )
+    return arrays
+
+
+def _from_arrays(arrays: dict[str, np.ndarray], source: str) -> CropData:
+    crops = arrays["crops"]
+    return CropData(
+        rows=arrays["rows"],
+        labels=crops[arrays["codes"]],
+        crops=crops,
+        centroids=arrays["centroids"],
+        mean=arrays["mean"],
+        std=arrays["std"],
+        index_rows=arrays.get("index_rows"),
+        source=source,
+    )
+
+
+def is_stale(arrays: dict[str, np.ndarray], csv_path: str) -> bool:
+    if int(arrays["version"]) != ARTIFACT_VERSION:
+        return True
+    if list(arrays["features"]) != FEATURES:
+        return True
+    # Without the CSV there is nothing fresher to compare against
+    if not os.path.exists(csv_path):
+        return False
+    return str(arrays["source_sha256"]) != file_sha256(csv_path)
+
+
+def load_crop_data(csv_path: str, artifact_path: str) -> CropData:
+    """Memory-map the compiled artifact, compiling the CSV in memory if it is stale."""
+    if os.path.exists(artifact_path):
+        try:
+            arrays = _mmap_npz(artifact_path)
+            if not is_stale(arrays, csv_path):
+                return _from_arrays(arrays, source="artifact")
+            print(f"Crop artifact {artifact_path} is stale, falling back to {csv_path}")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not read crop artifact {artifact_path}: {e}")
+    return _from_arrays(compile_csv(csv_path), source="csv")
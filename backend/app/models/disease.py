@@ -1,20 +1,141 @@
-import tensorflow as tf
+import asyncio
 import numpy as np
-from io import BytesIO
+from collections import defaultdict
+from typing import BinaryIO
+from PIL import Image
+from app.core.config import (
+    DISEASE_BACKEND,
+    DISEASE_BATCH_SIZE,
+    DISEASE_BATCH_WAIT_MS,
+    TFLITE_THREADS,
+    TFLITE_VARIANT,
+    WARMUP_MODELS,
+)
 from app.core.constants import DISEASE_CLASSES
+from app.models import backends
+from app.models.batching import MicroBatcher
+from app.models.executor import inference_pool
+from app.models.loading import register, registry
+from app.models.preprocess import decode, decode_batch, decode_into
+from app.models.result_cache import ResultCache
 
+MODEL_PATH = "app/data/trained_model.h5"
+IMG_SIZE = (128, 128)
 
-model = tf.keras.models.load_model("app/data/trained_model.h5")
 
+# The micro-batcher sends anything from 1 to DISEASE_BATCH_SIZE images
+WARMUP_BATCH_SIZES = sorted({1, 2, 4, 8, DISEASE_BATCH_SIZE}) if WARMUP_MODELS else []
 
-def predict_disease_from_file(file: BytesIO) -> tuple[str, float]:
-    image = tf.keras.utils.load_img(
-        file, target_size=(128, 128)
-    )  # or tf.keras.preprocessing.image.load_img
-    input_arr = tf.keras.utils.img_to_array(image)
-    input_arr = np.expand_dims(input_arr, axis=0)  # (1, 128, 128, 3)
-    prediction = model.predict(input_arr)
+
+def load_model():
+    return backends.load_backend(
+        DISEASE_BACKEND, MODEL_PATH, TFLITE_VARIANT, TFLITE_THREADS, WARMUP_BATCH_SIZES
+    )
+
+
+def model_version() -> str:
+    return backends.model_version(DISEASE_BACKEND, MODEL_PATH, TFLITE_VARIANT)
+
+
+disease_model = register("disease", load_model)
+# Results of earlier uploads with identical bytes, see app/models/result_cache.py
+results = ResultCache("disease", model_version)
+
+
+def load_image_array(file: BinaryIO | str) -> np.ndarray:
+    # Nearest-neighbour like the tf.keras.utils.load_img call this replaced
+    return decode(file, IMG_SIZE, Image.NEAREST)  # (128, 128, 3) uint8
+
+
+def predict_batch(input_arr: np.ndarray) -> np.ndarray:
+    """Run the CNN on a (batch, 128, 128, 3) array, returns class probabilities."""
+    backend = registry.get("disease")  # Raises ModelUnavailable if disabled or not loadable
+    return backend.predict(input_arr)
+
+
+def decode_prediction(prediction: np.ndarray) -> tuple[str, float]:
     confidence_score = float(np.max(prediction))
     result_index = int(np.argmax(prediction))
     disease_name = DISEASE_CLASSES[result_index]
     return disease_name, confidence_score
+
+
+# Concurrent uploads share one forward pass instead of a batch of one each. The
+# pass goes through the pool's accounting, so a full pool answers 429 here too.
+batcher = MicroBatcher(
+    predict_batch, DISEASE_BATCH_SIZE, DISEASE_BATCH_WAIT_MS, run=inference_pool.run
+)
+
+
+def predict_disease_from_file(file: BinaryIO | str) -> tuple[str, float]:
+    input_arr = decode_batch([file], IMG_SIZE, Image.NEAREST)  # (1, 128, 128, 3)
+    prediction = predict_batch(input_arr)
+    return decode_prediction(prediction[0])
+
+
+async def predict_disease_batched(file: BinaryIO | str) -> tuple[str, float]:
+    """
+    Like predict_disease_from_file, but decodes on the inference pool and
+    joins the shared micro-batch. Raises PoolSaturated when the pool is full.
+    """
+    input_arr = await inference_pool.run(load_image_array, file)
+    prediction = await batcher.submit(input_arr)
+    return decode_prediction(prediction)
+
+
+async def decode_images(files: list[BinaryIO | str]) -> np.ndarray:
+    """
+    Decode many uploads into one (n, 128, 128, 3) batch, split across the
+    inference pool workers so a plot's worth of photos decodes in parallel.
+    """
+    batch = np.empty((len(files), IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8)
+
+    def decode_chunk(indices: np.ndarray) -> None:
+        for i in indices:
+            decode_into(batch[i], files[i], Image.NEAREST)
+
+    workers = min(len(files), inference_pool.max_workers)
+    chunks = np.array_split(np.arange(len(files)), workers)
+    await asyncio.gather(*(inference_pool.run(decode_chunk, chunk) for chunk in chunks))
+    return batch
+
+
+async def predict_disease_many(files: list[BinaryIO | str]) -> list[tuple[str, float]]:
+    """Parallel decode, then one forward pass for the whole set."""
+    if not files:
+        return []
+    batch = await decode_images(files)
+    predictions = await inference_pool.run(predict_batch, batch)
+    return [decode_prediction(prediction) for prediction in predictions]
+
+
+def is_healthy(disease_name: str) -> bool:
+    return disease_name.endswith("___healthy")
+
+
+def summarize_plot(predictions: list[tuple[str, float]]) -> dict:
+    """
+    Aggregate per-leaf results into a plot diagnosis: how many leaves show a
+    disease, and the most frequent one (ties go to the higher total confidence).
+    """
+    tally = defaultdict(list)
+    for disease_name, confidence in predictions:
+        tally[disease_name].append(confidence)
+
+    diseases = sorted(
+        (
+            {"disease": name, "count": len(scores), "mean_confidence": float(np.mean(scores))}
+            for name, scores in tally.items()
+        ),
+        key=lambda d: (d["count"], d["count"] * d["mean_confidence"]),
+        reverse=True,
+    )
+    diseased = [d for d in diseases if not is_healthy(d["disease"])]
+    diseased_count = sum(d["count"] for d in diseased)
+    return {
+        "images": len(predictions),
+        "diseased": diseased_count,
+        "diseased_fraction": diseased_count / len(predictions) if predictions else 0.0,
+        "primary_disease": diseased[0]["disease"] if diseased else None,
+        "diseases": diseases,
+    }
@@ -0,0 +1,77 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import INFERENCE_MAX_QUEUED, INFERENCE_WORKERS
+
+
+class PoolSaturated(Exception):
+    """Raised when the inference pool has no free worker and its queue is full."""
+
+
+class InferencePool:
+    """
+    Size-bounded thread pool for CPU-bound image decoding and inference.
+
+    Keeps that work off the event loop so other routes stay responsive, and
+    refuses new work once max_workers are busy and max_queued more are
+    waiting, instead of letting requests pile up without bound.
+    """
+
+    def __init__(self, max_workers: int, max_queued: int, name: str = "inference"):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max(0, max_queued)
+        self.executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queued
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) on the pool, raising PoolSaturated when it is full."""
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise PoolSaturated(f"{self._pending} inference tasks already pending")
+            self._pending += 1
+        try:
+            future = self.executor.submit(functools.partial(fn, *args))
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is held until the work ends, not until the caller stops
+        # waiting: a cancelled request leaves its task running or queued
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Future | None) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled() and future.exception() is None:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = self._pending
+            return {
+                "workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "running": min(pending, self.max_workers),
+                "queued": max(0, pending - self.max_workers),
+                "saturation": pending / self.capacity,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+
+inference_pool = InferencePool(INFERENCE_WORKERS, INFERENCE_MAX_QUEUED)
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable
+
+from app.core.config import DISABLED_MODELS, MODEL_MEMORY_BUDGET_MB
+
+
+class ModelUnavailable(Exception):
+    """Raised when a model is disabled on this worker, unknown or failed to load."""
+
+
+class LazyModel:
+    """
+    A model that is loaded on first use or by the background preload started
+    in the app lifespan, whichever comes first. Importing the module that
+    declares it costs nothing, so workers that never predict never pay for
+    TensorFlow or the weights. The registry may unload it again to stay
+    within the memory budget; the next use then reloads it.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], version: str | None = None):
+        self.name = name
+        self.version = version
+        self._loader = loader
+        self._model = None
+        self._lock = threading.Lock()
+        self.enabled = name not in DISABLED_MODELS
+        self.state = "not_loaded" if self.enabled else "disabled"
+        self.error: str | None = None
+        self.load_seconds: float | None = None
+        self.memory_bytes = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(name: str, version: str | None) -> str:
+        return name if version is None else f"{name}@{version}"
+
+    @property
+    def key(self) -> str:
+        return self.make_key(self.name, self.version)
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Any:
+        model = self._model
+        if model is not None:
+            return model
+        if not self.enabled:
+            raise ModelUnavailable(f"Model '{self.key}' is disabled on this worker")
+        with self._lock:
+            if self._model is None:
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    self._model = self._loader()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise ModelUnavailable(f"Model '{self.key}' failed to load: {e}") from e
+                self.load_seconds = time.perf_counter() - start
+                # Backends report their weights and tensor buffers; anything else counts as 0
+                self.memory_bytes = int(getattr(self._model, "memory_bytes", 0))
+                self.loads += 1
+                self.state = "ready"
+                self.error = None
+            return self._model
+
+    def unload(self) -> None:
+        """Drop the loaded model; requests already holding it finish normally."""
+        with self._lock:
+            if self._model is not None:
+                self._model = None
+                self.memory_bytes = 0
+                self.evictions += 1
+                self.state = "evicted"
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "version": self.version,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "memory_mb": round(self.memory_bytes / 2**20, 2),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+class ModelRegistry:
+    """
+    Maps model names (and optional versions) to lazy loaders.
+
+    get() loads a model on demand and, when the resident models together
+    exceed memory_budget_mb (0 disables the limit), unloads the least
+    recently used others until they fit again. The model being requested is
+    never evicted, so a single model larger than the budget still serves.
+    """
+
+    def __init__(self, memory_budget_mb: float = 0):
+        self.memory_budget = memory_budget_mb * 2**20
+        self.models: dict[str, LazyModel] = {}
+        self._defaults: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._hits = 0
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        version: str | None = None,
+        default: bool = True,
+    ) -> LazyModel:
+        """Add a loader; get(name) without a version resolves to the default one."""
+        lazy = LazyModel(name, loader, version)
+        self.models[lazy.key] = lazy
+        if default or name not in self._defaults:
+            self._defaults[name] = lazy.key
+        return lazy
+
+    def resolve(self, name: str, version: str | None = None) -> LazyModel:
+        key = self._defaults.get(name) if version is None else LazyModel.make_key(name, version)
+        if key not in self.models:
+            raise ModelUnavailable(f"No model registered as '{LazyModel.make_key(name, version)}'")
+        return self.models[key]
+
+    def get(self, name: str, version: str | None = None) -> Any:
+        """The loaded model, loading it (and evicting others) first if needed."""
+        lazy = self.resolve(name, version)
+        with self._lock:
+            self._lookups += 1
+            self._hits += lazy.loaded
+        return self.use(lazy)
+
+    def use(self, lazy: LazyModel) -> Any:
+        model = lazy.get()  # Raises ModelUnavailable if disabled or not loadable
+        lazy.last_used = time.monotonic()
+        if self.memory_budget:
+            self._enforce_budget(keep=lazy)
+        return model
+
+    def resident_bytes(self) -> int:
+        return sum(lazy.memory_bytes for lazy in self.models.values() if lazy.loaded)
+
+    def _enforce_budget(self, keep: LazyModel) -> None:
+        with self._lock:
+            resident = sorted(
+                (lazy for lazy in self.models.values() if lazy.loaded and lazy is not keep),
+                key=lambda lazy: lazy.last_used,
+            )
+            total = self.resident_bytes()
+            for lazy in resident:
+                if total <= self.memory_budget:
+                    break
+                total -= lazy.memory_bytes
+                lazy.unload()
+
+    def stats(self) -> dict:
+        return {
+            "memory_budget_mb": self.memory_budget / 2**20,
+            "resident_mb": round(self.resident_bytes() / 2**20, 2),
+            "lookups": self._lookups,
+            "hits": self._hits,
+            "hit_rate": self._hits / self._lookups if self._lookups else 0.0,
+            "loads": sum(lazy.loads for lazy in self.models.values()),
+            "evictions": sum(lazy.evictions for lazy in self.models.values()),
+            "models": {key: lazy.status() for key, lazy in self.models.items()},
+        }
+
+
+registry = ModelRegistry(MODEL_MEMORY_BUDGET_MB)
+MODELS = registry.models
+
+
+def register(
+    name: str, loader: Callable[[], Any], version: str | None = None, default: bool = True
+) -> LazyModel:
+    return registry.register(name, loader, version, default)
+
+
+async def preload_models() -> None:
+    """Load every enabled model in a worker thread; failures are kept in status()."""
+    for lazy in list(registry.models.values()):
+        if lazy.enabled:
+            try:
+                await asyncio.to_thread(registry.use, lazy)
+            except ModelUnavailable as e:
+                print(e)
@@ -0,0 +1,53 @@
+"""
+Image decoding shared by the disease and soil models.
+
+Phone photos are ~12 MP while the models take 128x128 or 220x220 input.
+For JPEGs, PIL's draft mode asks libjpeg to decode straight at 1/2, 1/4 or
+1/8 scale (the smallest that still covers the target size), so the full
+resolution bitmap is never materialized; the result is then resized once and
+written into a preallocated uint8 batch buffer. Other formats decode fully
+and take the same resize path. Both backends accept uint8 batches and cast
+them to the model's input dtype themselves.
+"""
+
+from typing import BinaryIO, Iterable
+
+import numpy as np
+from PIL import Image
+
+
+def load_image(file: BinaryIO | str, size: tuple[int, int], resample: int) -> Image.Image:
+    """Decode file as an RGB image of exactly size (width, height)."""
+    image = Image.open(file)
+    # No-op for non-JPEG images; for JPEGs it also decodes straight to RGB
+    image.draft("RGB", size)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size != size:
+        image = image.resize(size, resample)
+    return image
+
+
+def decode_into(out: np.ndarray, file: BinaryIO | str, resample: int) -> np.ndarray:
+    """Decode file into out, a (height, width, 3) uint8 view, and return it."""
+    height, width = out.shape[:2]
+    out[...] = np.asarray(load_image(file, (width, height), resample))
+    return out
+
+
+def decode(file: BinaryIO | str, size: tuple[int, int], resample: int) -> np.ndarray:
+    """One (height, width, 3) uint8 array."""
+    width, height = size
+    return decode_into(np.empty((height, width, 3), dtype=np.uint8), file, resample)
+
+
+def decode_batch(
+    files: Iterable[BinaryIO | str], size: tuple[int, int], resample: int
+) -> np.ndarray:
+    """A (n, height, width, 3) uint8 batch, each image decoded into its own slot."""
+    files = list(files)
+    width, height = size
+    batch = np.empty((len(files), height, width, 3), dtype=np.uint8)
+    for slot, file in zip(batch, files):
+        decode_into(slot, file, resample)
+    return batch
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import RESULT_CACHE_SIZE
+from app.db import models
+from app.db.session import dialect_insert
+
+
+def content_hash(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+class ResultCache:
+    """
+    Prediction results for one model, keyed by (upload SHA-256, model version).
+
+    A bounded in-process LRU sits in front of the prediction_cache table, so
+    a repeated upload is answered without inference, and the table keeps the
+    results across restarts and for the other workers. version_fn is called
+    per lookup so switching backends or weights invalidates old entries; it
+    hashes the weights file once, so it runs off the event loop.
+    """
+
+    def __init__(self, model: str, version_fn: Callable[[], str], max_size: int = RESULT_CACHE_SIZE):
+        self.model = model
+        self.version_fn = version_fn
+        self.max_size = max(0, max_size)
+        self._lru: OrderedDict[tuple[str, str], Any] = OrderedDict()
+        self._memory_hits = 0
+        self._db_hits = 0
+        self._misses = 0
+
+    def _remember(self, key: tuple[str, str], result: Any) -> None:
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+    async def get(self, db: AsyncSession, digest: str) -> Any | None:
+        key = (digest, await asyncio.to_thread(self.version_fn))
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self._memory_hits += 1
+            return self._lru[key]
+
+        row = (
+            await db.execute(
+                select(models.PredictionCache.result).filter(
+                    models.PredictionCache.content_hash == digest,
+                    models.PredictionCache.model == self.model,
+                    models.PredictionCache.model_version == key[1],
+                )
+            )
+        ).scalar_one_or_none()
+        if row is None:
+            self._misses += 1
+            return None
+        self._db_hits += 1
+        result = json.loads(row)
+        self._remember(key, result)
+        return result
+
+    async def put(self, db: AsyncSession, digest: str, result: Any, image_path: str) -> None:
+        """
+        Store a JSON-serializable result in the caller's transaction. A row a
+        concurrent upload of the same image inserted first is left as is.
+        """
+        version = await asyncio.to_thread(self.version_fn)
+        self._remember((digest, version), result)
+        values = {
+            "content_hash": digest,
+            "model": self.model,
+            "model_version": version,
+            "result": json.dumps(result),
+            "image_path": image_path,
+        }
+        stmt = dialect_insert(db, models.PredictionCache).values(**values)
+        await db.execute(stmt.on_conflict_do_nothing())
+
+    def stats(self) -> dict:
+        lookups = self._memory_hits + self._db_hits + self._misses
+        return {
+            "size": len(self._lru),
+            "max_size": self.max_size,
+            "memory_hits": self._memory_hits,
+            "db_hits": self._db_hits,
+            "misses": self._misses,
+            "hit_rate": (self._memory_hits + self._db_hits) / lookups if lookups else 0.0,
+        }
@@ -1 +1,175 @@
-def predict(crop, weather_data, soil_params): ...
+"""
+120-day crop risk reports.
+
+The first days come from the weather forecast, analyzed day by day by
+app/services/agri_forecast.py. The rest of the window is filled in with
+the location's day-of-year climate normals (app/services/climatology.py).
+Growing degree days keep accumulating across the extension, assuming the
+crop is sown on the first forecast day. Heat or cold expected in one of the
+crop's critical stages is therefore reported as such.
+
+Each risk factor gets a severity and the report's level is the highest of
+them. Only temperatures and rainfall are known past the forecast, so
+evapotranspiration there is estimated with Hargreaves' temperature method
+instead of the Penman-Monteith one the forecast days use.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.core.agri_constants import CROP_PROFILES
+from app.services.agri_forecast import (
+    analyze_cold_stress,
+    analyze_forecast_for_crop,
+    analyze_heat_stress,
+    calculate_gdd,
+    calculate_water_balance,
+    determine_crop_stage,
+)
+
+# Bumping it makes the risk engine recompute every report
+MODEL_VERSION = "1"
+HORIZON_DAYS = 120
+LEVELS = ("Low", "Medium", "High")
+# Soil moisture (%) agri_forecast assumes when the forecast has none
+DEFAULT_SOIL_MOISTURE = 40
+# Days past the forecast making a stress factor Medium / High, outside critical stages
+STRESS_DAYS = (5, 15)
+# Consecutive days of deficit past the forecast making a Medium / High dry spell
+DRY_SPELL_DAYS = (7, 21)
+
+
+@dataclass
+class RiskReport:
+    crop: str
+    level: str  # One of LEVELS
+    factors: list[str]  # Most severe first
+    start: date
+    end: date
+
+    @property
+    def text(self) -> str:
+        """The factors as stored in RiskPrediction.risk_factors, one per line."""
+        return "\n".join(self.factors)
+
+
+def hargreaves_et0(t_max: float, t_min: float, latitude: float, day_of_year: int) -> float:
+    """FAO-56 Hargreaves reference evapotranspiration (mm/day) from temperatures alone."""
+    phi = math.radians(latitude)
+    angle = 2 * math.pi * day_of_year / 365
+    inverse_distance = 1 + 0.033 * math.cos(angle)
+    declination = 0.409 * math.sin(angle - 1.39)
+    sunset_angle = math.acos(max(-1.0, min(1.0, -math.tan(phi) * math.tan(declination))))
+    # Extraterrestrial radiation, MJ/m2/day
+    ra = (24 * 60 / math.pi) * 0.0820 * inverse_distance * (
+        sunset_angle * math.sin(phi) * math.sin(declination)
+        + math.cos(phi) * math.cos(declination) * math.sin(sunset_angle)
+    )
+    t_mean = (t_max + t_min) / 2
+    return max(0.0, 0.0023 * (t_mean + 17.8) * math.sqrt(max(0.0, t_max - t_min)) * 0.408 * ra)
+
+
+def _day(start: date, day_number: int) -> str:
+    return f"day {day_number} ({(start + timedelta(days=day_number - 1)).isoformat()})"
+
+
+def _stress_factor(
+    name: str, days: list[tuple[int, str]], critical: list[str], start: date
+) -> list[tuple[int, str]]:
+    """A factor for the (day number, crop stage) pairs under one kind of stress."""
+    if not days:
+        return []
+    for day_number, stage in days:
+        if stage in critical:
+            return [(2, f"{name} likely during {stage} around {_day(start, day_number)}")]
+    severity = sum(len(days) >= threshold for threshold in STRESS_DAYS)
+    return [(severity, f"{name} likely on {len(days)} days from {_day(start, days[0][0])}")]
+
+
+def predict(crop: str, forecast: dict, normals: np.ndarray) -> RiskReport:
+    """
+    Risk report for crop over HORIZON_DAYS from the forecast's first day.
+    forecast holds the Open-Meteo "daily" and "hourly" records, the grid
+    "elevation" and "latitude"; normals is the (366, 3) day-of-year array of
+    [t_max, t_min, precipitation] from app/services/climatology.py.
+    """
+    daily = forecast["daily"]
+    start = date.fromisoformat(daily[0]["date"])
+    analysis = analyze_forecast_for_crop(crop, daily, forecast["hourly"], forecast["elevation"])
+    summary = analysis["summary"]
+    forecast_days = len(daily)
+    factors: list[tuple[int, str]] = []
+
+    # The forecast window, as the weather page shows it
+    stress = [
+        (summary["heat_stress_days"], "heat stress"),
+        (summary["cold_stress_days"], "cold stress"),
+        (summary["drought_stress_days"], "drought stress"),
+        (summary["waterlog_days"], "waterlogging"),
+    ]
+    listed = [f"{count} {name}" for count, name in stress if count]
+    if listed:
+        yield_estimate = summary["yield_estimate"]
+        severity = 2 if yield_estimate["modifier"] < 0.8 else int(yield_estimate["modifier"] < 0.95)
+        factors.append(
+            (
+                severity,
+                f"Next {forecast_days} days: {', '.join(listed)} days "
+                f"(yield outlook {yield_estimate['percentage']})",
+            )
+        )
+    disease_days = sum(1 for day in analysis["daily"] if day["disease_risk"]["level"] == "High")
+    if disease_days:
+        severity = 2 if disease_days >= 6 else int(disease_days >= 3)
+        factors.append(
+            (severity, f"High disease pressure on {disease_days} of the next {forecast_days} days")
+        )
+
+    # The climatology extension
+    profile = CROP_PROFILES.get(crop, CROP_PROFILES["Rice"])
+    accumulated_gdd = summary["total_gdd"]
+    heat: list[tuple[int, str]] = []
+    cold: list[tuple[int, str]] = []
+    dry_spells: list[tuple[int, int]] = []  # (first day number, length)
+    dry_run = 0
+    for day_number in range(forecast_days + 1, HORIZON_DAYS + 1):
+        day_of_year = (start + timedelta(days=day_number - 1)).timetuple().tm_yday
+        t_max, t_min, precipitation = (float(value) for value in normals[day_of_year - 1])
+        accumulated_gdd += calculate_gdd(t_max, t_min, profile["T_base"], profile["T_max"])
+        stage = determine_crop_stage(accumulated_gdd, crop)["stage"]
+        if analyze_heat_stress(t_max, crop):
+            heat.append((day_number, stage))
+        if analyze_cold_stress(t_min, crop):
+            cold.append((day_number, stage))
+
+        et0 = hargreaves_et0(t_max, t_min, forecast["latitude"], day_of_year)
+        # Normals are smoothed, so any deficit on a normal day is a dry period
+        if calculate_water_balance(precipitation, et0, DEFAULT_SOIL_MOISTURE)["irrigation_needed"]:
+            dry_run += 1
+        elif dry_run:
+            dry_spells.append((day_number - dry_run, dry_run))
+            dry_run = 0
+    if dry_run:
+        dry_spells.append((HORIZON_DAYS + 1 - dry_run, dry_run))
+
+    critical = profile.get("critical_stages", [])
+    factors += _stress_factor("Heat stress", heat, critical, start)
+    factors += _stress_factor("Cold stress", cold, critical, start)
+    if dry_spells:
+        first_day, length = max(dry_spells, key=lambda spell: spell[1])
+        severity = sum(length >= threshold for threshold in DRY_SPELL_DAYS)
+        factors.append(
+            (severity, f"Dry spell of {length} days likely from {_day(start, first_day)}")
+        )
+
+    factors.sort(key=lambda factor: -factor[0])
+    return RiskReport(
+        crop=crop,
+        level=LEVELS[factors[0][0]] if factors else LEVELS[0],
+        factors=[text for _, text in factors] or ["No significant risks expected"],
+        start=start,
+        end=start + timedelta(days=HORIZON_DAYS),
+    )
@@ -1,10 +1,14 @@
-import tensorflow as tf
 import numpy as np
 from PIL import Image
-import io
+from typing import BinaryIO
+from app.core.config import SOIL_BACKEND, TFLITE_THREADS, TFLITE_VARIANT, WARMUP_MODELS
+from app.models import backends
+from app.models.executor import inference_pool
+from app.models.loading import register, registry
+from app.models.preprocess import decode_batch
+from app.models.result_cache import ResultCache
 
 MODEL_PATH = "app/data/model.h5"
-model = None
 IMG_HEIGHT = 220  # Assuming a fixed image height for the model
 IMG_WIDTH = 220  # Assuming a fixed image width for the model
 SOIL_TYPES = [
@@ -16,23 +20,33 @@ SOIL_TYPES = [
 ]
 
 
-model = tf.keras.models.load_model(MODEL_PATH)
+def load_model():
+    # Soil images are always predicted one at a time
+    warmup_batch_sizes = [1] if WARMUP_MODELS else []
+    return backends.load_backend(
+        SOIL_BACKEND, MODEL_PATH, TFLITE_VARIANT, TFLITE_THREADS, warmup_batch_sizes
+    )
+
+
+def model_version() -> str:
+    return backends.model_version(SOIL_BACKEND, MODEL_PATH, TFLITE_VARIANT)
+
+
+soil_model = register("soil", load_model)
+# Results of earlier uploads with identical bytes, see app/models/result_cache.py
+results = ResultCache("soil", model_version)
 
 
 def preprocess_image(image_file):
-    img = Image.open(image_file).convert("RGB")
-    img = img.resize((IMG_WIDTH, IMG_HEIGHT))
-    img_array = np.array(img)
-    img_array = np.expand_dims(img_array, axis=0)  # Create a batch
-    return img_array
+    # (1, 220, 220, 3) uint8, bicubic like the plain Image.resize this replaced
+    return decode_batch([image_file], (IMG_WIDTH, IMG_HEIGHT), Image.BICUBIC)
 
 
-def predict_soil_type_from_file(image_file: io.BytesIO):
-    if model is None:
-        return "Unknown", 0.0  # Or raise an error, depending on desired behavior
+def predict_soil_type_from_file(image_file: BinaryIO | str):
+    backend = registry.get("soil")  # Raises ModelUnavailable if disabled or not loadable
 
     preprocessed_image = preprocess_image(image_file)
-    predictions = model.predict(preprocessed_image)
+    predictions = backend.predict(preprocessed_image)
 
     # Assuming predictions is a 2D array like [[0.1, 0.8, 0.1]]
     predicted_class_index = np.argmax(predictions, axis=1)[0]
@@ -45,3 +59,8 @@ def predict_soil_type_from_file(image_file: io.BytesIO):
         predicted_soil_type = "Unknown"
 
     return predicted_soil_type, confidence_score
+
+
+async def predict_soil_type_async(image_file: BinaryIO | str):
+    """Run predict_soil_type_from_file on the inference pool (may raise PoolSaturated)."""
+    return await inference_pool.run(predict_soil_type_from_file, image_file)
@@ -22,7 +22,7 @@ class DiseaseBase(BaseModel):
 class RiskBase(BaseModel):
     crop_name: str
     risk_level: str
-    risk_factors: str
+    risk_factors: Optional[str] = None
 
 
 # --- Request Models (Input) ---
@@ -82,6 +82,27 @@ class DiseaseOut(DiseaseBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class DiseaseTally(BaseModel):
+    disease: str
+    count: int
+    mean_confidence: float
+
+
+class PlotDiagnosis(BaseModel):
+    images: int
+    diseased: int
+    diseased_fraction: float
+    primary_disease: Optional[str] = None
+    precautions: Optional[str] = None
+    solutions: Optional[str] = None
+    diseases: List[DiseaseTally] = []
+
+
+class DiseaseBatchOut(BaseModel):
+    scans: List[DiseaseOut]
+    diagnosis: PlotDiagnosis
+
+
 class SoilTypePredictionOut(SoilTypePredictionBase):
     id: int
     created_at: datetime
@@ -106,6 +127,48 @@ class UserOut(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Keyset-paginated history: pass next_cursor back as ?cursor= for the next page
+
+
+class DiseasePage(BaseModel):
+    items: List[DiseaseOut]
+    next_cursor: Optional[str] = None
+
+
+class SoilTypePredictionPage(BaseModel):
+    items: List[SoilTypePredictionOut]
+    next_cursor: Optional[str] = None
+
+
+class RiskPage(BaseModel):
+    items: List[RiskOut]
+    next_cursor: Optional[str] = None
+
+
+class DiseaseHistorySummary(BaseModel):
+    count: int
+    latest: Optional[DiseaseOut] = None
+
+
+class SoilTypeHistorySummary(BaseModel):
+    count: int
+    latest: Optional[SoilTypePredictionOut] = None
+
+
+class RiskHistorySummary(BaseModel):
+    count: int
+    latest: Optional[RiskOut] = None
+
+
+class UserSummaryOut(UserBase):
+    """/users/me?slim=true: history counts and the newest item of each kind."""
+
+    id: int
+    disease_scans: DiseaseHistorySummary
+    soil_type_predictions: SoilTypeHistorySummary
+    risk_reports: RiskHistorySummary
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
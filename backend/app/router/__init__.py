@@ -7,3 +7,4 @@ from .weather import router as weather_router
 from .chat import router as chat_router
 from .forum import router as forum_router
 from .game import router as game_router
+from .system import router as system_router
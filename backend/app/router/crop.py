@@ -1,33 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 import numpy as np
 import httpx
+from datetime import datetime, timedelta, timezone
+import warnings
 
 from app.db.session import get_db
 from app.db import auth
+from app.core.config import CROP_MODEL_MODE
 from app.models.crop import Model as CropModel
 from app.reqtypes.schemas import UserIn
 import openmeteo_requests
-import pandas as pd
 import requests_cache
 from retry_requests import retry
 
 router = APIRouter()
 
+# Built once at startup: loads the dataset and the k-NN index over its rows
+crop_model = CropModel()
 
-@router.post("/recommend")
-async def recommend_crop(
-    user_in: UserIn,
-    db: AsyncSession = Depends(get_db),
-):
-    user = await auth.get_user_by_username(username=user_in.username, db=db)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
 
-    latitude = user.latitude
-    longitude = user.longitude
+FORECAST_DAYS = 16
 
-    # Fetch weather data
+
+def fetch_hourly_forecast(latitude, longitude) -> dict:
+    """
+    Fetch the 16-day hourly forecast used for crop scoring.
+    Returns dict with "time" (epoch seconds of the first hour) and hourly
+    "rain", "humidity" and "temperature" numpy arrays.
+    """
     try:
         cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
         retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
@@ -38,25 +39,25 @@ async def recommend_crop(
             "latitude": float(latitude),
             "longitude": float(longitude),
             "hourly": ["rain", "relative_humidity_2m", "temperature_2m"],
-            "forecast_days": 16,
+            "forecast_days": FORECAST_DAYS,
         }
         responses = openmeteo.weather_api(url, params=params)
         response = responses[0]
 
         hourly = response.Hourly()
-        hourly_rain = hourly.Variables(0).ValuesAsNumpy()
-        hourly_relative_humidity_2m = hourly.Variables(1).ValuesAsNumpy()
-        hourly_temperature_2m = hourly.Variables(2).ValuesAsNumpy()
-
-        # Process weather data
-        temperature = np.mean(hourly_temperature_2m)
-        humidity = np.mean(hourly_relative_humidity_2m)
-        rainfall = np.sum(hourly_rain)
+        return {
+            "time": hourly.Time(),
+            "rain": hourly.Variables(0).ValuesAsNumpy(),
+            "humidity": hourly.Variables(1).ValuesAsNumpy(),
+            "temperature": hourly.Variables(2).ValuesAsNumpy(),
+        }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching weather data: {e}")
 
-    # Fetch soil data
+
+async def fetch_soil_npk_ph(latitude, longitude) -> tuple[float, float, float, float]:
+    """Fetch soil data and return (N, P, K, ph)."""
     try:
         soil_api_url = (
             f"https://soil.narc.gov.np/soil/api/?lat={latitude}&lon={longitude}"
@@ -77,20 +78,126 @@ async def recommend_crop(
             soil_data.get("potassium", "0.0 kg/ha").replace("kg/ha", "").strip()
         )
 
-        N = float(nitrogen_str)
-        P = float(p2o5_str)
-        K = float(potassium_str)
+        return float(nitrogen_str), float(p2o5_str), float(potassium_str), ph
 
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error fetching or parsing soil data: {e}"
         )
 
+
+def windowed_conditions(forecast: dict, window: int) -> np.ndarray:
+    """
+    Aggregate the hourly forecast into rolling windows of whole days.
+    Returns a (windows, 3) array of [temperature, humidity, rainfall].
+
+    Rainfall is the window's mean daily rain scaled to the full forecast
+    horizon, so each window is on the same scale as the single 16-day total
+    that /recommend scores.
+    """
+    days = len(forecast["temperature"]) // 24
+    with warnings.catch_warnings():
+        # A day with no values at all averages to NaN and is filled below
+        warnings.simplefilter("ignore", RuntimeWarning)
+        daily = np.stack(
+            [
+                np.nanmean(forecast["temperature"][: days * 24].reshape(days, 24), axis=1),
+                np.nanmean(forecast["humidity"][: days * 24].reshape(days, 24), axis=1),
+                np.nansum(forecast["rain"][: days * 24].reshape(days, 24), axis=1),
+            ],
+            axis=1,
+        )
+    # Days missing from the forecast tail take the forecast-wide mean
+    daily = np.where(np.isnan(daily), np.nanmean(daily, axis=0), daily)
+    windows = np.lib.stride_tricks.sliding_window_view(daily, min(window, days), axis=0)
+    conditions = windows.mean(axis=2)
+    conditions[:, 2] *= days
+    return conditions
+
+
+@router.post("/recommend")
+async def recommend_crop(
+    user_in: UserIn,
+    mode: str = Query(CROP_MODEL_MODE, pattern="^(centroid|knn)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    user = await auth.get_user_by_username(username=user_in.username, db=db)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    latitude = user.latitude
+    longitude = user.longitude
+
+    # Fetch weather data
+    forecast = fetch_hourly_forecast(latitude, longitude)
+    temperature = np.mean(forecast["temperature"])
+    humidity = np.mean(forecast["humidity"])
+    rainfall = np.sum(forecast["rain"])
+
+    # Fetch soil data
+    N, P, K, ph = await fetch_soil_npk_ph(latitude, longitude)
+
     # Prepare data for prediction
     model_params = np.array([N, P, K, temperature, humidity, ph, rainfall])
 
     # Get crop recommendation
-    crop_model = CropModel()
-    top_crops, predictions = crop_model.topn(3, model_params)
+    top_crops, predictions = crop_model.topn(3, model_params, mode=mode)
+
+    return {"recommended_crops": top_crops, "predictions": predictions, "mode": mode}
+
+
+@router.post("/timeline")
+async def crop_timeline(
+    user_in: UserIn,
+    window: int = Query(1, ge=1, le=FORECAST_DAYS, description="Rolling window in days"),
+    top: int = Query(3, ge=1, le=len(crop_model.crops)),
+    mode: str = Query(CROP_MODEL_MODE, pattern="^(centroid|knn)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Sowing-window view: rank every crop against each day (or rolling window)
+    of the 16-day forecast in one (windows x crops) scoring pass.
+    """
+    user = await auth.get_user_by_username(username=user_in.username, db=db)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    forecast = fetch_hourly_forecast(user.latitude, user.longitude)
+    N, P, K, ph = await fetch_soil_npk_ph(user.latitude, user.longitude)
+
+    conditions = windowed_conditions(forecast, window)
+    soil = np.broadcast_to([N, P, K], (len(conditions), 3))
+    model_params = np.column_stack(
+        [soil, conditions[:, 0], conditions[:, 1], np.full(len(conditions), ph), conditions[:, 2]]
+    )
+    ranked, scores, stability = crop_model.timeline(model_params, top, mode=mode)
+
+    start = datetime.fromtimestamp(forecast["time"], tz=timezone.utc).date()
+    crop_index = {crop: i for i, crop in enumerate(crop_model.crops)}
+    windows = []
+    for i, (crops, row, cond) in enumerate(zip(ranked, scores, conditions)):
+        windows.append(
+            {
+                "start_date": (start + timedelta(days=i)).isoformat(),
+                "end_date": (start + timedelta(days=i + window - 1)).isoformat(),
+                "conditions": {
+                    "temperature": float(cond[0]),
+                    "humidity": float(cond[1]),
+                    "rainfall": float(cond[2]),
+                },
+                "ranked_crops": crops,
+                "scores": {crop: float(row[crop_index[crop]]) for crop in crops},
+            }
+        )
 
-    return {"recommended_crops": top_crops, "predictions": predictions}
+    best = [crops[0] for crops in ranked if crops]
+    best_crop = max(set(best), key=best.count) if best else None
+    return {
+        "mode": mode,
+        "window_days": window,
+        "windows": windows,
+        "stability": stability,
+        "best_crop": best_crop,
+        # Share of windows whose top crop is the overall most frequent one
+        "overall_stability": best.count(best_crop) / len(ranked) if best else 0.0,
+    }
@@ -1,52 +1,45 @@
-from io import BytesIO
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from datetime import date, datetime, timezone
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from sqlalchemy import select
-from app.core.config import UPLOAD_DIR
+from app.core.config import DISEASE_UPLOAD_MAX_IMAGES
 from app.core.constants import DISEASES_INFO
 from app.db import auth, models
+from app.db.history import history_page
 from app.db.session import get_db
-from app.models.disease import predict_disease_from_file
-import uuid
-import os
+from app.models import disease
+from app.services import derivatives, storage, usage
+from app.services.profile_cache import profile_cache
+from app.services.uploads import ingest_image
 from app.reqtypes import schemas
 
-_UPLOAD_DIR = UPLOAD_DIR + "/disease_images"
-os.makedirs(_UPLOAD_DIR, exist_ok=True)
 router = APIRouter()
 
 
 @router.post("/disease/predict", response_model=schemas.DiseaseOut)
 async def predict_disease(
     image: UploadFile = File(...),
-    current_user: models.User = Depends(auth.get_user_from_cookie),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
     db=Depends(get_db),
 ):
-    # 1. Validate File Type (Optional but recommended)
-    if image.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
-        raise HTTPException(
-            status_code=400, detail="Invalid file type. Only JPEG/PNG allowed."
-        )
-    # 2. Generate a unique filename to prevent overwrites and directory traversal attacks
-    if not image.filename:
-        raise HTTPException(
-            status_code=400,
-            detail="Filename should be provided!",
-        )
-
-    contents = await image.read()
-
-    # 3. Save the file to disk
-    file_extension = os.path.splitext(image.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(_UPLOAD_DIR, unique_filename)
-
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
+    # 1. Stream into the content-addressed store, checking type and size on the way
+    upload = await ingest_image(image)
+    file_path = upload.path
+    await usage.enforce_quota(db, current_user.id, [upload])
 
-    file_obj = BytesIO(contents)
-    disease_name, confidence_score = predict_disease_from_file(file_obj)
+    # 2. Re-uploads reuse the earlier result; the model reads the stored file.
+    # A new file is removed again if prediction fails (e.g. a full pool).
+    cached = await disease.results.get(db, upload.sha256)
+    if cached is not None:
+        disease_name, confidence_score = cached
+    else:
+        try:
+            disease_name, confidence_score = await disease.predict_disease_batched(file_path)
+        except Exception:
+            upload.discard()
+            raise
+        await disease.results.put(db, upload.sha256, [disease_name, confidence_score], file_path)
 
-    # 5. Save to Database
+    # 3. Save to Database
     dummy_dict = {"Precautions": "", "Solution": ""}
     new_disease_scan = models.DiseaseDetection(
         user_id=current_user.id,
@@ -58,16 +51,116 @@ async def predict_disease(
     )
 
     db.add(new_disease_scan)
+    await usage.record(db, current_user.id, [upload])
     await db.commit()
     await db.refresh(new_disease_scan)
+    profile_cache.invalidate(current_user.id)
+    if upload.created:
+        derivatives.schedule(file_path)
 
     return new_disease_scan
 
 
+@router.post("/disease/predict-batch", response_model=schemas.DiseaseBatchOut)
+async def predict_disease_batch(
+    images: list[UploadFile] = File(...),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
+    db=Depends(get_db),
+):
+    """
+    Diagnose a plot from many leaf photos in one request: the images are
+    decoded in parallel and run through the model as a single batch, every
+    scan is saved in one transaction, and the per-leaf results are summed up
+    into a diagnosis for the plot.
+    """
+    if len(images) > DISEASE_UPLOAD_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {DISEASE_UPLOAD_MAX_IMAGES} images per request.",
+        )
+    uploads = []
+    try:
+        for image in images:
+            uploads.append(await ingest_image(image))
+        await usage.enforce_quota(db, current_user.id, uploads)
+
+        # Only images not seen before (and each distinct one once) go to the model
+        results = {}
+        for upload in uploads:
+            cached = await disease.results.get(db, upload.sha256)
+            if cached is not None:
+                results[upload.sha256] = tuple(cached)
+        pending = {u.sha256: u.path for u in uploads if u.sha256 not in results}
+        predictions = await disease.predict_disease_many(list(pending.values()))
+    except Exception:
+        for upload in uploads:
+            upload.discard()
+        raise
+
+    for (digest, path), prediction in zip(pending.items(), predictions):
+        results[digest] = prediction
+        await disease.results.put(db, digest, list(prediction), path)
+
+    dummy_dict = {"Precautions": "", "Solution": ""}
+    # Timestamps are set here so the response can be built without a refresh per row
+    now = datetime.now(timezone.utc)
+    scans = []
+    for upload in uploads:
+        disease_name, confidence_score = results[upload.sha256]
+        info = DISEASES_INFO.get(disease_name, dummy_dict)
+        scans.append(
+            models.DiseaseDetection(
+                user_id=current_user.id,
+                image_path=upload.path,
+                detected_disease=disease_name,
+                confidence_score=round(confidence_score, 2),  # As Numeric(5, 2) stores it
+                precautions=info.get("Precautions"),
+                solutions=info.get("Solution"),
+                created_at=now,
+            )
+        )
+    db.add_all(scans)
+    await usage.record(db, current_user.id, uploads)
+    await db.flush()
+    scans_out = [schemas.DiseaseOut.model_validate(scan) for scan in scans]
+    await db.commit()
+    profile_cache.invalidate(current_user.id)
+    for upload in uploads:
+        if upload.created:
+            derivatives.schedule(upload.path)
+
+    diagnosis = disease.summarize_plot([results[upload.sha256] for upload in uploads])
+    primary_info = DISEASES_INFO.get(diagnosis["primary_disease"], dummy_dict)
+    diagnosis["precautions"] = primary_info.get("Precautions")
+    diagnosis["solutions"] = primary_info.get("Solution")
+    return {"scans": scans_out, "diagnosis": diagnosis}
+
+
+@router.get("/disease/history", response_model=schemas.DiseasePage)
+async def list_disease_scans(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    since: date | None = None,
+    until: date | None = None,
+    include_text: bool = Query(True, description="Include precautions and solutions"),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
+    db=Depends(get_db),
+):
+    """The user's disease scans, newest first, a page at a time."""
+    omit = () if include_text else (
+        models.DiseaseDetection.precautions,
+        models.DiseaseDetection.solutions,
+    )
+    items, next_cursor = await history_page(
+        db, models.DiseaseDetection, current_user.id, limit, cursor, since, until, omit
+    )
+    return {"items": items, "next_cursor": next_cursor}
+
+
 @router.delete("/disease/{scan_id}", status_code=204)
 async def delete_disease_scan(
     scan_id: int,
-    current_user: models.User = Depends(auth.get_user_from_cookie),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
     db=Depends(get_db),
 ):
     """
@@ -84,10 +177,7 @@ async def delete_disease_scan(
     if not scan:
         raise HTTPException(status_code=404, detail="Disease scan not found")
 
-    # Optionally delete the image file from the server
-    if os.path.exists(scan.image_path):
-        os.remove(scan.image_path)
-
-    await db.delete(scan)
-    await db.commit()
+    # The image is shared by identical uploads; it goes with its last reference
+    await storage.delete_with_image(db, scan)
+    profile_cache.invalidate(current_user.id)
     return
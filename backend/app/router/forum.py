@@ -1,22 +1,20 @@
 from fastapi import APIRouter, Depends, Response, HTTPException, UploadFile, File, Form, Query, status
 from sqlalchemy import select, func, desc, and_, exists
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-import os
-import uuid
 import shutil
 from typing import List, Optional
 from datetime import datetime
 
 from app.db import auth, models
-from app.db.session import get_db
+from app.db.session import dialect_insert, get_db
 from app.reqtypes import schemas
-from app.core.config import UPLOAD_DIR
+from app.services import derivatives, usage
+from app.services.uploads import IMAGE_TYPES, ingest_image
 
 router = APIRouter()
 
-_FORUM_DIR = os.path.join(UPLOAD_DIR, "forum")
-os.makedirs(_FORUM_DIR, exist_ok=True)
 
 @router.get("/questions", response_model=List[schemas.QuestionOut])
 async def get_questions(
@@ -97,23 +95,14 @@ async def create_question(
     title: str = Form(...),
     content: str = Form(...),
     image: Optional[UploadFile] = File(None),
-    current_user: models.User = Depends(auth.get_user_from_cookie),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
     db: AsyncSession = Depends(get_db)
 ):
-    image_path = None
+    upload = None
     if image:
-        if not image.content_type.startswith("image/"):
-            raise HTTPException(status_code=400, detail="Only image files are allowed")
-        
-        file_ext = os.path.splitext(image.filename)[1] if image.filename else ".jpg"
-        unique_name = f"{uuid.uuid4()}{file_ext}"
-        save_path = os.path.join(_FORUM_DIR, unique_name)
-        
-        contents = await image.read()
-        with open(save_path, "wb") as buffer:
-            buffer.write(contents)
-        
-        image_path = f"/static/forum/{unique_name}"
+        upload = await ingest_image(image, allowed=tuple(IMAGE_TYPES))
+        await usage.enforce_quota(db, current_user.id, [upload])
+    image_path = upload.url if upload else None
 
     question = models.Question(
         title=title,
@@ -122,8 +111,13 @@ async def create_question(
         user_id=current_user.id
     )
     db.add(question)
+    if upload:
+        await usage.record(db, current_user.id, [upload])
     await db.commit()
     await db.refresh(question)
+    if upload and upload.created:
+        # The question list shows thumbnails: have them ready before it is fetched
+        derivatives.schedule(upload.path)
 
     # Return with user loaded
     result = await db.execute(
@@ -134,29 +128,30 @@ async def create_question(
 @router.post("/questions/{question_id}/vote")
 async def vote_question(
     question_id: int,
-    current_user: models.User = Depends(auth.get_user_from_cookie),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
     db: AsyncSession = Depends(get_db)
 ):
-    # Check duplicate
-    existing = await db.execute(
-        select(models.QuestionVote).filter(
-            models.QuestionVote.user_id == current_user.id,
-            models.QuestionVote.question_id == question_id
+    # One statement: the unique (question_id, user_id) index turns a repeat into a no-op
+    try:
+        result = await db.execute(
+            dialect_insert(db, models.QuestionVote)
+            .values(user_id=current_user.id, question_id=question_id)
+            .on_conflict_do_nothing(index_elements=["question_id", "user_id"])
         )
-    )
-    if existing.scalars().first():
+        await db.commit()
+    except IntegrityError:
+        # The question's foreign key: it doesn't exist
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Question not found")
+    if result.rowcount == 0:
         raise HTTPException(status_code=400, detail="Already upvoted")
-
-    vote = models.QuestionVote(user_id=current_user.id, question_id=question_id)
-    db.add(vote)
-    await db.commit()
     return {"message": "Upvoted"}
 
 @router.post("/questions/{question_id}/answer", response_model=schemas.AnswerOut)
 async def create_answer(
     question_id: int,
     answer_in: schemas.AnswerCreate,
-    current_user: models.User = Depends(auth.get_user_from_cookie),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
     db: AsyncSession = Depends(get_db)
 ):
     answer = models.Answer(
@@ -165,7 +160,11 @@ async def create_answer(
         user_id=current_user.id
     )
     db.add(answer)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Question not found")
     await db.refresh(answer)
 
     # Return with user loaded
@@ -178,32 +177,29 @@ async def create_answer(
 async def vote_answer(
     answer_id: int,
     vote_in: schemas.AnswerVoteIn,
-    current_user: models.User = Depends(auth.get_user_from_cookie),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
     db: AsyncSession = Depends(get_db)
 ):
     if vote_in.vote_type not in [1, -1]:
         raise HTTPException(status_code=400, detail="Invalid vote type")
 
-    # Check duplicate/existing
-    existing = await db.execute(
-        select(models.AnswerVote).filter(
-            models.AnswerVote.user_id == current_user.id,
-            models.AnswerVote.answer_id == answer_id
-        )
+    # Insert, or flip an existing opposite vote; the same vote again changes no row
+    stmt = dialect_insert(db, models.AnswerVote).values(
+        user_id=current_user.id, answer_id=answer_id, vote_type=vote_in.vote_type
     )
-    vote = existing.scalars().first()
-
-    if vote:
-        if vote.vote_type == vote_in.vote_type:
-            raise HTTPException(status_code=400, detail="Already voted this way")
-        vote.vote_type = vote_in.vote_type
-    else:
-        vote = models.AnswerVote(
-            user_id=current_user.id,
-            answer_id=answer_id,
-            vote_type=vote_in.vote_type
+    try:
+        result = await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["answer_id", "user_id"],
+                set_={"vote_type": stmt.excluded.vote_type},
+                where=models.AnswerVote.vote_type != stmt.excluded.vote_type,
+            )
         )
-        db.add(vote)
-    
-    await db.commit()
+        await db.commit()
+    except IntegrityError:
+        # The answer's foreign key: it doesn't exist
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Answer not found")
+    if result.rowcount == 0:
+        raise HTTPException(status_code=400, detail="Already voted this way")
     return {"message": "Vote recorded"}
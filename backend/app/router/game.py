@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, File, UploadFile
+from fastapi import APIRouter, HTTPException, File, UploadFile, Query
 from typing import List, Optional, Dict
 from pydantic import BaseModel
 import numpy as np
@@ -17,7 +17,7 @@ from app.game.game_engine.engine import (
     InitRequest,
 )
 from app.game.game_engine.clock import Clock
-from app.game.constants import GRID_WIDTH, CROPS, ACTIONS, REGIONS
+from app.game.constants import GRID_WIDTH, CROPS, ACTIONS, REGIONS, CROPS_USED
 from app.game.model import Model
 from app.game.chat_service import get_chat_response, analyze_disease_chat
 
@@ -49,6 +49,10 @@ def clean_value(val):
     try: return float(val)
     except ValueError: return 0.0
 
+def grid_matrix(grid: List[CellState]) -> np.ndarray:
+    """Stack cells into a (cells, 7) array in the model's feature order."""
+    return np.array([[c.n, c.p, c.k, c.temperature, c.humidity, c.ph, c.rainfall] for c in grid], dtype=np.float64)
+
 def initialize_grid(region: str) -> List[CellState]:
     region_data = REGIONS.get(region, REGIONS["Hilly"])
     grid = []
@@ -125,7 +129,7 @@ def get_weather(lat: float, lng: float):
 def get_time(): return {"time": clock.now()}
 
 @router.get("/tick")
-def tick():
+def tick(overlay: bool = False, top_k: int = Query(3, ge=1, le=len(CROPS_USED))):
     global game_state
     if not game_state: raise HTTPException(status_code=400, detail="Not initialized")
     game_state.day += 1
@@ -137,7 +141,9 @@ def tick():
             if 40 <= cell.moisture <= 80: growth_rate += 0.5
             if cell.weed < 30: growth_rate += 0.3
             cell.stage = min(cell.max_stage, cell.stage + int(growth_rate))
-    return {"grid": [c.model_dump() for c in game_state.grid], "gold": game_state.gold, "day": game_state.day}
+    result = {"grid": [c.model_dump() for c in game_state.grid], "gold": game_state.gold, "day": game_state.day}
+    if overlay: result["suitability"] = model.recommend_grid(grid_matrix(game_state.grid), top_k)
+    return result
 
 @router.post("/init")
 def init_game(request: InitRequest):
@@ -218,11 +224,16 @@ def plant(request: PlantRequest):
 def recommend(request: RecommendRequest):
     return {"recommendations": model.get_recommendations(request.n, request.p, request.k, request.temperature, request.humidity, request.ph, request.rainfall)}
 
+@router.get("/suitability")
+def suitability(top_k: int = Query(3, ge=1, le=len(CROPS_USED))):
+    """Top-k crop recommendations for every cell of the current grid"""
+    if not game_state: raise HTTPException(status_code=400, detail="Not initialized")
+    return {"day": game_state.day, "suitability": model.recommend_grid(grid_matrix(game_state.grid), top_k)}
+
 @router.post("/chat")
 def chat(request: ChatRequest):
     global game_state
     curr = game_state or GameState(grid=initialize_grid("Hilly"))
-    preds = {}
-    for i, c in enumerate(curr.grid):
-        preds[f"Cell {i}"] = sorted(model.predict(np.array([c.n, c.p, c.k, c.temperature, c.humidity, c.ph, c.rainfall])).items(), key=lambda x:x[1])[:3]
+    top = model.top_crops_per_cell(grid_matrix(curr.grid), 3)
+    preds = {f"Cell {i}": cell_top for i, cell_top in enumerate(top)}
     return {"response": get_chat_response(request.message, curr, request.recent_actions, preds)}
@@ -1,17 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import auth, models
+from app.db.history import history_page
 from app.db.session import get_db
+from app.reqtypes import schemas
+from app.services.profile_cache import profile_cache
 
 router = APIRouter()
 
 
+@router.get("/risk/history", response_model=schemas.RiskPage)
+async def list_risk_reports(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    since: date | None = None,
+    until: date | None = None,
+    include_text: bool = Query(True, description="Include the risk factors"),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
+    db: AsyncSession = Depends(get_db),
+):
+    """The user's risk reports, newest first, a page at a time."""
+    omit = () if include_text else (models.RiskPrediction.risk_factors,)
+    items, next_cursor = await history_page(
+        db, models.RiskPrediction, current_user.id, limit, cursor, since, until, omit
+    )
+    return {"items": items, "next_cursor": next_cursor}
+
+
 @router.delete("/risk/{report_id}", status_code=204)
 async def delete_risk_report(
     report_id: int,
-    current_user: models.User = Depends(auth.get_user_from_cookie),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -30,4 +53,5 @@ async def delete_risk_report(
 
     await db.delete(report)
     await db.commit()
+    profile_cache.invalidate(current_user.id)
     return
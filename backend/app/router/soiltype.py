@@ -1,51 +1,45 @@
-from io import BytesIO
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from datetime import date
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from sqlalchemy import select
-from app.core.config import UPLOAD_DIR
 from app.db import auth, models
+from app.db.history import history_page
 from app.db.session import get_db
-from app.models.soil import predict_soil_type_from_file
-import uuid
-import os
+from app.models import soil
+from app.services import derivatives, storage, usage
+from app.services.profile_cache import profile_cache
+from app.services.uploads import ingest_image
 from app.reqtypes import schemas
 
-_UPLOAD_DIR = UPLOAD_DIR + "/soil_images"
-os.makedirs(_UPLOAD_DIR, exist_ok=True)
 router = APIRouter()
 
 
 @router.post("/soiltype/predict", response_model=schemas.SoilTypePredictionOut)
 async def predict_soil_type(
     image: UploadFile = File(...),
-    current_user: models.User = Depends(auth.get_user_from_cookie),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
     db=Depends(get_db),
 ):
-    # 1. Validate File Type (Optional but recommended)
-    if image.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
-        raise HTTPException(
-            status_code=400, detail="Invalid file type. Only JPEG/PNG allowed."
-        )
-    # 2. Generate a unique filename to prevent overwrites and directory traversal attacks
-    if not image.filename:
-        raise HTTPException(
-            status_code=400,
-            detail="Filename should be provided!",
-        )
-
-    contents = await image.read()
-
-    # 3. Save the file to disk
-    file_extension = os.path.splitext(image.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(_UPLOAD_DIR, unique_filename)
+    # 1. Stream into the content-addressed store, checking type and size on the way
+    upload = await ingest_image(image)
+    file_path = upload.path
+    await usage.enforce_quota(db, current_user.id, [upload])
 
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
-
-    file_obj = BytesIO(contents)
-    predicted_soil_type, confidence_score = predict_soil_type_from_file(file_obj)
+    # 2. Re-uploads reuse the earlier result; the model reads the stored file.
+    # A new file is removed again if prediction fails (e.g. a full pool).
+    cached = await soil.results.get(db, upload.sha256)
+    if cached is not None:
+        predicted_soil_type, confidence_score = cached
+    else:
+        try:
+            predicted_soil_type, confidence_score = await soil.predict_soil_type_async(file_path)
+        except Exception:
+            upload.discard()
+            raise
+        await soil.results.put(
+            db, upload.sha256, [predicted_soil_type, confidence_score], file_path
+        )
 
-    # 5. Save to Database
+    # 3. Save to Database
     new_soil_type_prediction = models.SoilTypePrediction(
         user_id=current_user.id,
         image_path=file_path,
@@ -53,16 +47,36 @@ async def predict_soil_type(
     )
 
     db.add(new_soil_type_prediction)
+    await usage.record(db, current_user.id, [upload])
     await db.commit()
     await db.refresh(new_soil_type_prediction)
+    profile_cache.invalidate(current_user.id)
+    if upload.created:
+        derivatives.schedule(file_path)
 
     return new_soil_type_prediction
 
 
+@router.get("/soiltype/history", response_model=schemas.SoilTypePredictionPage)
+async def list_soil_type_predictions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    since: date | None = None,
+    until: date | None = None,
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
+    db=Depends(get_db),
+):
+    """The user's soil type predictions, newest first, a page at a time."""
+    items, next_cursor = await history_page(
+        db, models.SoilTypePrediction, current_user.id, limit, cursor, since, until
+    )
+    return {"items": items, "next_cursor": next_cursor}
+
+
 @router.delete("/soiltype/{prediction_id}", status_code=204)
 async def delete_soil_type_prediction(
     prediction_id: int,
-    current_user: models.User = Depends(auth.get_user_from_cookie),
+    current_user: auth.CurrentUser = Depends(auth.get_user_from_cookie),
     db=Depends(get_db),
 ):
     """
@@ -79,10 +93,7 @@ async def delete_soil_type_prediction(
     if not prediction:
         raise HTTPException(status_code=404, detail="Soil type prediction not found")
 
-    # Optionally delete the image file from the server
-    if os.path.exists(prediction.image_path):
-        os.remove(prediction.image_path)
-
-    await db.delete(prediction)
-    await db.commit()
+    # The image is shared by identical uploads; it goes with its last reference
+    await storage.delete_with_image(db, prediction)
+    profile_cache.invalidate(current_user.id)
     return
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Response
+
+from app.core.config import PRELOAD_MODELS
+from app.models import disease, soil
+from app.models.executor import inference_pool
+from app.models.loading import MODELS, registry
+from app.services.maintenance import maintenance
+from app.services.profile_cache import profile_cache
+from app.services.risk_engine import risk_engine
+
+router = APIRouter()
+
+
+@router.get("/system/inference")
+async def inference_stats():
+    """Inference pool saturation, micro-batching queue depth and result cache hit rates."""
+    return {
+        "pool": inference_pool.stats(),
+        "disease": disease.batcher.stats(),
+        "result_cache": {"disease": disease.results.stats(), "soil": soil.results.stats()},
+    }
+
+
+@router.get("/system/models")
+async def model_stats():
+    """Model registry: resident memory against the budget, loads, evictions and hit rate."""
+    return registry.stats()
+
+
+@router.get("/system/storage")
+async def storage_stats():
+    """Storage maintenance: position in the collection cycle and what it has removed."""
+    return maintenance.stats()
+
+
+@router.get("/system/risk-engine")
+async def risk_engine_stats():
+    """Risk report runs: users checked against their last forecast and recomputed."""
+    return risk_engine.stats()
+
+
+@router.get("/system/profile-cache")
+async def profile_cache_stats():
+    """Hit rate of the serialized /users/me cache on this worker."""
+    return profile_cache.stats()
+
+
+@router.get("/ready")
+async def readiness(response: Response):
+    """
+    Per-model load state. 503 until every enabled model is loaded, or, when
+    models load on first use (PRELOAD_MODELS=0), while any of them failed.
+    """
+    models = {name: lazy.status() for name, lazy in MODELS.items()}
+    enabled = [lazy for lazy in MODELS.values() if lazy.enabled]
+    if PRELOAD_MODELS:
+        # A model unloaded to stay within the memory budget reloads on demand
+        ready = all(lazy.state in ("ready", "evicted") for lazy in enabled)
+    else:
+        ready = all(lazy.state != "failed" for lazy in enabled)
+    if not ready:
+        response.status_code = 503
+    return {"ready": ready, "models": models}
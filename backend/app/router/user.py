@@ -3,8 +3,10 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import auth, models
+from app.db.history import history_summary
 from app.db.session import get_db
 from app.reqtypes import schemas
+from app.services.profile_cache import profile_cache
 
 router = APIRouter()
 
@@ -33,20 +35,64 @@ async def register_user(
     return new_user_db
 
 
-@router.get("/me", response_model=schemas.UserOut)
+async def render_profile(db: AsyncSession, username: str, slim: bool) -> bytes | None:
+    """The /users/me JSON body, or None if there is no such user."""
+    if not slim:
+        user = await auth.get_user_with_history(username=username, db=db)
+        return schemas.UserOut.model_validate(user).model_dump_json().encode() if user else None
+
+    user = await auth.get_user_by_username(username=username, db=db)
+    if not user:
+        return None
+    summaries = {
+        "disease_scans": await history_summary(
+            db,
+            models.DiseaseDetection,
+            user.id,
+            omit=(models.DiseaseDetection.precautions, models.DiseaseDetection.solutions),
+        ),
+        "soil_type_predictions": await history_summary(db, models.SoilTypePrediction, user.id),
+        "risk_reports": await history_summary(
+            db, models.RiskPrediction, user.id, omit=(models.RiskPrediction.risk_factors,)
+        ),
+    }
+    profile = schemas.UserSummaryOut(
+        **schemas.UserBase.model_validate(user, from_attributes=True).model_dump(),
+        id=user.id,
+        **summaries,
+    )
+    return profile.model_dump_json().encode()
+
+
+@router.get("/me", response_model=schemas.UserOut | schemas.UserSummaryOut)
 async def read_users_me(
     username: str,
-    response: Response,
+    slim: bool = False,
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Get current user profile.
+    Get current user profile. With slim=true, history is reduced to counts
+    and the newest item of each kind (without the long advice texts); the
+    full lists are paged through /tests/disease/history,
+    /tests/soiltype/history and /tests/risk/history.
+
+    Served from the profile cache when nothing changed since the last call.
     """
-    user = await auth.get_user_by_username(username=username, db=db)
-    if not user:
+    identity = await auth.get_identity(username, db)
+    if identity is None:
         raise HTTPException(status_code=404, detail="User not found")
+    variant = "slim" if slim else "full"
+    body = profile_cache.get(identity.id, variant)
+    if body is None:
+        version = profile_cache.version(identity.id)
+        body = await render_profile(db, username, slim)
+        if body is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        profile_cache.put(identity.id, variant, version, body)
+
+    response = Response(content=body, media_type="application/json")
     response.set_cookie(key="username", value=username)
-    return user
+    return response
 
 
 @router.put("/", response_model=schemas.UserOut)
@@ -57,7 +103,7 @@ async def update_user(
     """
     Update user profile.
     """
-    user = await auth.get_user_by_username(username=user_update.current_username, db=db)
+    user = await auth.get_user_with_history(username=user_update.current_username, db=db)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -78,4 +124,6 @@ async def update_user(
 
     await db.commit()
     await db.refresh(user)
+    auth.identity_cache.forget(user_update.current_username, user.username)
+    profile_cache.invalidate(user.id)
     return user
@@ -0,0 +1,119 @@
+"""
+Day-of-year climate normals per grid cell: the part of a 120-day risk
+report past the weather forecast (app/models/risk.py).
+
+A cell's normals are computed once from the daily temperature and
+precipitation history of the past CLIMATE_NORMAL_YEARS (Open-Meteo
+archive). The daily means are smoothed with a centered SMOOTHING_DAYS window,
+so one hot or wet year leaves no spikes. The result is stored in the
+climate_normals table and read back from there, and only computed again
+when CLIMATE_NORMAL_YEARS changes.
+"""
+
+import asyncio
+import json
+import math
+from datetime import date, datetime, timezone
+
+import numpy as np
+import openmeteo_requests
+import requests_cache
+from retry_requests import retry
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import CLIMATE_NORMAL_YEARS, RISK_GRID_DEGREES
+from app.db import models
+from app.db.session import dialect_insert
+
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+SMOOTHING_DAYS = 31
+
+
+def open_meteo() -> openmeteo_requests.Client:
+    cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
+    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+    return openmeteo_requests.Client(session=retry_session)
+
+
+def cell_of(latitude: float, longitude: float) -> str:
+    """Key of the RISK_GRID_DEGREES cell containing a point: its center, "lat,lon"."""
+    center = [
+        (math.floor(float(value) / RISK_GRID_DEGREES) + 0.5) * RISK_GRID_DEGREES
+        for value in (latitude, longitude)
+    ]
+    return ",".join(f"{value:.4f}" for value in center)
+
+
+def cell_center(cell: str) -> tuple[float, float]:
+    latitude, longitude = cell.split(",")
+    return float(latitude), float(longitude)
+
+
+def fetch_daily_history(
+    latitude: float, longitude: float, years: int
+) -> tuple[list[date], np.ndarray]:
+    """Days and (n, 3) [t_max, t_min, precipitation] of the last `years` calendar years."""
+    last_year = date.today().year - 1
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "start_date": f"{last_year - years + 1}-01-01",
+        "end_date": f"{last_year}-12-31",
+        "daily": ["temperature_2m_max", "temperature_2m_min", "precipitation_sum"],
+    }
+    daily = open_meteo().weather_api(ARCHIVE_URL, params=params)[0].Daily()
+    values = np.column_stack([daily.Variables(i).ValuesAsNumpy() for i in range(3)])
+    days = [
+        datetime.fromtimestamp(daily.Time() + i * daily.Interval(), timezone.utc).date()
+        for i in range(len(values))
+    ]
+    return days, values
+
+
+def compute_normals(days: list[date], values: np.ndarray) -> np.ndarray:
+    """(366, 3) smoothed day-of-year means of values; missing values are skipped."""
+    index = np.array([day.timetuple().tm_yday - 1 for day in days])
+    valid = ~np.isnan(values)
+    sums = np.zeros((366, 3))
+    counts = np.zeros((366, 3))
+    np.add.at(sums, index, np.where(valid, values, 0.0))
+    np.add.at(counts, index, valid)
+
+    normals = np.empty((366, 3))
+    positions = np.arange(366)
+    half = SMOOTHING_DAYS // 2
+    for column in range(3):
+        seen = counts[:, column] > 0
+        if not seen.any():
+            raise ValueError("No usable history to compute normals from")
+        means = sums[seen, column] / counts[seen, column]
+        # Days no year had a value for, taken from their neighbors across the year end
+        filled = np.interp(positions, positions[seen], means, period=366)
+        wrapped = np.concatenate([filled[-half:], filled, filled[:half]])
+        normals[:, column] = np.convolve(wrapped, np.ones(SMOOTHING_DAYS) / SMOOTHING_DAYS, "valid")
+    return normals
+
+
+async def normals_for(db: AsyncSession, cell: str) -> np.ndarray:
+    """The cell's (366, 3) normals, computed and committed on first use."""
+    row = await db.get(models.ClimateNormal, cell)
+    if row is not None and row.years == CLIMATE_NORMAL_YEARS:
+        return np.array(json.loads(row.normals))
+
+    days, values = await asyncio.to_thread(
+        fetch_daily_history, *cell_center(cell), CLIMATE_NORMAL_YEARS
+    )
+    normals = compute_normals(days, values)
+    encoded = json.dumps(np.round(normals, 2).tolist())
+    stmt = dialect_insert(db, models.ClimateNormal).values(
+        cell=cell, years=CLIMATE_NORMAL_YEARS, normals=encoded
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[models.ClimateNormal.cell],
+            set_={"years": CLIMATE_NORMAL_YEARS, "normals": encoded, "computed_at": func.now()},
+        )
+    )
+    await db.commit()
+    return normals
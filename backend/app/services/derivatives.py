@@ -0,0 +1,134 @@
+"""
+Resized WebP/JPEG variants of stored images.
+
+The forum list and scan history show thumbnails, so /static/<path>?w=200
+answers with a copy no wider than the nearest configured width at or above
+the one asked for (IMAGE_VARIANT_WIDTHS), in WebP when the client accepts
+it and JPEG otherwise. Variants are written next to each other under
+storage.DERIVED_DIR on first request, or right after an upload for the
+IMAGE_VARIANT_EAGER_WIDTHS, on a small dedicated thread pool so neither the
+upload nor the event loop waits for the resize. Concurrent requests for the
+same missing variant share one generation.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from app.core.config import (
+    IMAGE_VARIANT_EAGER_WIDTHS,
+    IMAGE_VARIANT_WIDTHS,
+    IMAGE_VARIANT_WORKERS,
+)
+from app.services import storage
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+# format -> (PIL format, file extension, media type, save options)
+FORMATS = {
+    "webp": ("WEBP", ".webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+executor = ThreadPoolExecutor(max(1, IMAGE_VARIANT_WORKERS), thread_name_prefix="derivatives")
+_in_flight: dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def snap_width(width: int) -> int:
+    """The smallest configured width covering width, or the largest one."""
+    for candidate in IMAGE_VARIANT_WIDTHS:
+        if candidate >= width:
+            return candidate
+    return IMAGE_VARIANT_WIDTHS[-1]
+
+
+def negotiate_format(accept: str) -> str:
+    return "webp" if "image/webp" in accept else "jpeg"
+
+
+def variant_path(source: str, width: int, fmt: str) -> str:
+    return f"{storage.derived_prefix(source)}.w{width}{FORMATS[fmt][1]}"
+
+
+def media_type(fmt: str) -> str:
+    return FORMATS[fmt][2]
+
+
+def is_image(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def render(source: str, width: int, fmt: str) -> str:
+    """Write the variant (atomically, so readers never see half a file) and return its path."""
+    target = variant_path(source, width, fmt)
+    if os.path.exists(target):
+        return target
+    pil_format, _, _, options = FORMATS[fmt]
+    with Image.open(source) as image:
+        # Square request: still covers the width if EXIF rotates the photo below
+        image.draft("RGB", (width, width))
+        # Phone photos are often stored sideways with an EXIF rotation flag
+        image = ImageOps.exif_transpose(image)
+        alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        mode = "RGBA" if alpha and fmt == "webp" else "RGB"
+        if image.mode != mode:
+            image = image.convert(mode)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                image.save(out, pil_format, **options)
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return target
+
+
+def submit(source: str, width: int, fmt: str) -> Future:
+    """Queue generation of one variant, joining a generation already under way."""
+    target = variant_path(source, width, fmt)
+    with _lock:
+        future = _in_flight.get(target)
+        if future is not None:
+            return future
+        future = executor.submit(render, source, width, fmt)
+        _in_flight[target] = future
+    # Outside the lock: a future that is already done runs the callback right here
+    future.add_done_callback(lambda _: _forget(target))
+    return future
+
+
+def _forget(target: str) -> None:
+    with _lock:
+        _in_flight.pop(target, None)
+
+
+async def ensure(source: str, width: int, fmt: str) -> str:
+    """Path of the variant, generating it on the pool first if it doesn't exist yet."""
+    target = variant_path(source, width, fmt)
+    if os.path.exists(target):
+        return target
+    return await asyncio.wrap_future(submit(source, width, fmt))
+
+
+def schedule(source: str) -> None:
+    """Pre-generate the eager widths in every format after an upload; fire and forget."""
+    if not is_image(source):
+        return
+    for width in IMAGE_VARIANT_EAGER_WIDTHS:
+        for fmt in FORMATS:
+            if not os.path.exists(variant_path(source, width, fmt)):
+                submit(source, width, fmt).add_done_callback(_log_failure)
+
+
+def _log_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Image variant generation failed: {future.exception()}")
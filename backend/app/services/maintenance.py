@@ -0,0 +1,224 @@
+"""
+Background storage maintenance.
+
+Image files can outlive their rows: a row deleted outside the delete
+routes, a crash between writing the upload and committing the row, a
+resized variant rendered just after its blob was removed. Every
+STORAGE_GC_INTERVAL_SECONDS the task started in the app lifespan takes the
+next unit of work in a fixed cycle and handles only that:
+
+- one of the 256 blob shards (blobs/ab/), deleting files no
+  DiseaseDetection, SoilTypePrediction or Question row refers to, along
+  with their variants and any stale upload temp files;
+- the matching shard of resized variants whose blob is gone, and of
+  variants of legacy uploads whose original is gone (variants are only
+  served through their original, so these can never be requested again);
+- one of 16 buckets of each legacy flat upload directory.
+
+Files younger than STORAGE_GC_GRACE_HOURS are never touched, which covers
+uploads whose row is not committed yet. Each run also recomputes the
+storage usage of the next STORAGE_USAGE_BATCH users (app/services/usage.py).
+A full cycle therefore never scans the whole store or user table at once.
+"""
+
+import asyncio
+import glob
+import os
+import time
+import zlib
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import (
+    STORAGE_GC_GRACE_HOURS,
+    STORAGE_GC_INTERVAL_SECONDS,
+    STORAGE_USAGE_BATCH,
+    UPLOAD_DIR,
+)
+from app.db.session import AsyncSessionLocal
+from app.services import storage, usage
+
+LEGACY_DIRS = ("disease_images", "soil_images", "forum")
+LEGACY_BUCKETS = 16
+# Bound on the IN (...) list of one reference query; SQLite allows 999 parameters
+QUERY_CHUNK = 500
+
+
+def work_units() -> list[tuple[str, str]]:
+    """The cycle: ("blobs", "ab") per shard, then ("legacy:<dir>", "<bucket>")."""
+    units = [("blobs", f"{i:02x}") for i in range(256)]
+    for directory in LEGACY_DIRS:
+        units += [(f"legacy:{directory}", str(bucket)) for bucket in range(LEGACY_BUCKETS)]
+    return units
+
+
+def _files_under(directory: str) -> list[str]:
+    found = []
+    for root, _, names in os.walk(directory):
+        found += [os.path.join(root, name) for name in names]
+    return found
+
+
+def _legacy_files(directory: str, bucket: int | None) -> list[str]:
+    """Files directly in directory, only those of bucket unless it is None."""
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return []
+    return [
+        entry.path
+        for entry in entries
+        if entry.is_file()
+        and (bucket is None or zlib.crc32(entry.name.encode()) % LEGACY_BUCKETS == bucket)
+    ]
+
+
+def _old_enough(path: str, cutoff: float) -> bool:
+    try:
+        return os.stat(path).st_mtime < cutoff
+    except FileNotFoundError:
+        return False
+
+
+def unit_files(unit: tuple[str, str], cutoff: float) -> list[str]:
+    kind, key = unit
+    if kind == "blobs":
+        files = _files_under(os.path.join(storage.BLOB_DIR, key))
+        if key == "00":
+            # Upload temp files sit in the store's root until they are renamed
+            files += glob.glob(os.path.join(glob.escape(storage.BLOB_DIR), "*.part"))
+    else:
+        files = _legacy_files(os.path.join(UPLOAD_DIR, kind.split(":", 1)[1]), int(key))
+    return [path for path in files if _old_enough(path, cutoff)]
+
+
+def orphaned_variants(shard: str, cutoff: float) -> list[str]:
+    """Variants in a derived shard whose blob no longer exists."""
+    orphans = []
+    for path in _files_under(os.path.join(storage.DERIVED_DIR, shard)):
+        sha = os.path.basename(path).split(".", 1)[0]
+        blob_pattern = storage.blob_path(storage.blob_key(sha, ".*"))
+        if not glob.glob(blob_pattern) and _old_enough(path, cutoff):
+            orphans.append(path)
+    return orphans
+
+
+def legacy_variant_names() -> set[str]:
+    """Hashed names of the variants legacy uploads still on disk can have."""
+    names = set()
+    for directory in LEGACY_DIRS:
+        for path in _legacy_files(os.path.join(UPLOAD_DIR, directory), None):
+            names.add(os.path.basename(storage.derived_prefix(path)))
+    return names
+
+
+def orphaned_legacy_variants(shard: str, cutoff: float) -> list[str]:
+    """Variants in a derived/legacy shard whose legacy original no longer exists."""
+    variants = _files_under(os.path.join(storage.DERIVED_DIR, "legacy", shard))
+    if not variants:
+        return []
+    sources = legacy_variant_names()
+    return [
+        path
+        for path in variants
+        if os.path.basename(path).split(".", 1)[0] not in sources and _old_enough(path, cutoff)
+    ]
+
+
+async def referenced(db: AsyncSession, files: list[str]) -> set[str]:
+    """The subset of files some row refers to, by path or /static URL."""
+    forms = {form: path for path in files for form in storage.reference_forms(path)}
+    found = set()
+    keys = list(forms)
+    for model in storage.REFERENCING_MODELS:
+        for start in range(0, len(keys), QUERY_CHUNK):
+            chunk = keys[start : start + QUERY_CHUNK]
+            rows = await db.execute(
+                select(model.image_path).filter(model.image_path.in_(chunk)).distinct()
+            )
+            found.update(forms[image_path] for image_path in rows.scalars())
+    return found
+
+
+class StorageMaintenance:
+    def __init__(self):
+        self.units = work_units()
+        self.position = 0
+        self.usage_cursor = 0
+        self.cycles = 0
+        self.runs = 0
+        self.files_removed = 0
+        self.bytes_freed = 0
+        self.last_error: str | None = None
+
+    async def collect(self, db: AsyncSession, unit: tuple[str, str]) -> None:
+        cutoff = time.time() - STORAGE_GC_GRACE_HOURS * 3600
+        files = await asyncio.to_thread(unit_files, unit, cutoff)
+        # Temp files of an upload that died before being renamed into place
+        stale = [path for path in files if path.endswith(".part")]
+        candidates = [path for path in files if not path.endswith(".part")]
+        keep = await referenced(db, candidates)
+        # Read-only so far: end the transaction before touching the disk
+        await db.rollback()
+        orphans = stale + [path for path in candidates if path not in keep]
+        if unit[0] == "blobs":
+            orphans += await asyncio.to_thread(orphaned_variants, unit[1], cutoff)
+            orphans += await asyncio.to_thread(orphaned_legacy_variants, unit[1], cutoff)
+        await asyncio.to_thread(self._remove, orphans, cutoff)
+
+    def _remove(self, paths: list[str], cutoff: float) -> None:
+        for path in paths:
+            try:
+                stat_result = os.stat(path)
+                # Re-uploading a blob touches it: it may be about to be referenced again
+                if stat_result.st_mtime >= cutoff:
+                    continue
+                storage.unlink(path)
+            except FileNotFoundError:
+                continue
+            self.files_removed += 1
+            self.bytes_freed += stat_result.st_size
+
+    async def run_once(self, db: AsyncSession) -> None:
+        """Handle the next unit of the cycle and the next batch of users."""
+        unit = self.units[self.position]
+        # Advance first, so a unit that keeps failing doesn't stall the cycle
+        self.position = (self.position + 1) % len(self.units)
+        if self.position == 0:
+            self.cycles += 1
+        await self.collect(db, unit)
+
+        last_user = await usage.refresh(db, self.usage_cursor, STORAGE_USAGE_BATCH)
+        self.usage_cursor = last_user or 0
+        self.runs += 1
+
+    async def run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(STORAGE_GC_INTERVAL_SECONDS)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.run_once(db)
+                self.last_error = None
+            except Exception as e:
+                # Keep going: one bad unit must not stop collection for good
+                self.last_error = str(e)
+                print(f"Storage maintenance run failed: {e}")
+
+    def stats(self) -> dict:
+        kind, key = self.units[self.position]
+        return {
+            "interval_seconds": STORAGE_GC_INTERVAL_SECONDS,
+            "grace_hours": STORAGE_GC_GRACE_HOURS,
+            "next_unit": f"{kind}/{key}",
+            "progress": self.position / len(self.units),
+            "cycles": self.cycles,
+            "runs": self.runs,
+            "files_removed": self.files_removed,
+            "bytes_freed": self.bytes_freed,
+            "usage_cursor": self.usage_cursor,
+            "last_error": self.last_error,
+        }
+
+
+maintenance = StorageMaintenance()
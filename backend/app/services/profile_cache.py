@@ -0,0 +1,85 @@
+"""
+Serialized /users/me responses, keyed by user id.
+
+The frontend polls /users/me on every navigation, and rendering it means a
+user query, three history queries and a UserOut validation. A hit here
+returns the JSON bytes from last time without touching the database (the
+username -> id lookup comes from the identity cache in app/db/auth.py).
+
+Every user has a version number that routes changing what the profile
+shows bump through invalidate(): profile updates, new scans and soil
+predictions, and deletes. A response is stored under the version read
+before rendering it, so one rendered while a write landed is never served.
+Versions come from one counter and only the max_size most recently
+invalidated users keep theirs. Everyone else reads the highest version
+dropped so far, which is at least their last one, so dropping a version
+can turn hits into misses but never revives a stale response.
+Entries also expire after PROFILE_CACHE_TTL_SECONDS, which bounds how stale
+another worker's copy can be.
+"""
+
+import time
+from collections import OrderedDict
+
+from app.core.config import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS
+
+
+class ProfileCache:
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._versions: OrderedDict[int, int] = OrderedDict()
+        self._last_version = 0
+        # Version of the users not in _versions
+        self._dropped_version = 0
+        # (user id, variant) -> (version, expiry, body)
+        self._entries: OrderedDict[tuple[int, str], tuple[int, float, bytes]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user_id: int) -> int:
+        return self._versions.get(user_id, self._dropped_version)
+
+    def get(self, user_id: int, variant: str) -> bytes | None:
+        entry = self._entries.get((user_id, variant))
+        if entry is None or entry[0] != self.version(user_id) or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end((user_id, variant))
+        self.hits += 1
+        return entry[2]
+
+    def put(self, user_id: int, variant: str, version: int, body: bytes) -> None:
+        if not self.ttl or version != self.version(user_id):
+            return
+        self._entries[(user_id, variant)] = (version, time.monotonic() + self.ttl, body)
+        self._entries.move_to_end((user_id, variant))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        self._last_version += 1
+        self._versions[user_id] = self._last_version
+        self._versions.move_to_end(user_id)
+        while len(self._versions) > self.max_size:
+            self._dropped_version = self._versions.popitem(last=False)[1]
+        for key in [key for key in self._entries if key[0] == user_id]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._versions.clear()
+        self._last_version = self._dropped_version = 0
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "versions": len(self._versions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+profile_cache = ProfileCache(PROFILE_CACHE_TTL_SECONDS, PROFILE_CACHE_SIZE)
@@ -0,0 +1,331 @@
+"""
+Scheduled 120-day risk reports (app/models/risk.py) for every user and crop.
+
+Every RISK_ENGINE_INTERVAL_SECONDS, starting one interval after startup,
+the task started in the app lifespan walks the users with a location,
+RISK_ENGINE_USER_BATCH at a time by id. Users in the same RISK_GRID_DEGREES
+cell share one forecast fetch, one set of climate normals and one report
+per crop.
+
+Recomputation is incremental. A user is recomputed only when the hash of
+their cell's forecast differs from the one their reports were last computed
+from (risk_forecast_state). A new forecast, a move to another cell, another
+crop list or a new risk MODEL_VERSION all change it. Each batch's reports
+are upserted on (user_id, crop_name, forecast_start_date) in multi-row
+statements and committed in one transaction with the new hashes. The same
+transaction deletes a user's reports whose forecast started more than
+RISK_REPORT_KEEP_DAYS ago.
+
+Every worker process starts the task, but only the holder of the
+"risk_engine" row in task_leases runs it. The holder renews the lease before
+each batch, so a long run keeps it throughout, and a renewal lasts
+LEASE_INTERVALS intervals. When the holder is gone, another worker takes
+over once the lease expires; a run that finds its lease taken stops.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import socket
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.agri_constants import CROP_PROFILES
+from app.core.config import (
+    CLIMATE_NORMAL_YEARS,
+    RISK_ENGINE_CROPS,
+    RISK_ENGINE_INTERVAL_SECONDS,
+    RISK_ENGINE_USER_BATCH,
+    RISK_REPORT_KEEP_DAYS,
+)
+from app.db import models
+from app.db.session import AsyncSessionLocal, dialect_insert
+from app.models.risk import MODEL_VERSION, RiskReport, predict
+from app.services import climatology
+from app.services.profile_cache import profile_cache
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+FORECAST_DAYS = 16
+# The variables app/services/agri_forecast.py reads, as the weather route fetches them
+DAILY = ["temperature_2m_max", "temperature_2m_min", "precipitation_sum", "rain_sum"]
+HOURLY = [
+    "relative_humidity_2m",
+    "wind_speed_120m",
+    "soil_temperature_54cm",
+    "soil_moisture_27_to_81cm",
+    "terrestrial_radiation",
+]
+CROPS = RISK_ENGINE_CROPS or list(CROP_PROFILES)
+# Rows per INSERT: 6 columns each stays under SQLite's 999 parameters
+UPSERT_CHUNK = 150
+LEASE_NAME = "risk_engine"
+# Renewed before every batch: one batch and the sleep after a run must fit in it
+LEASE_INTERVALS = 2
+
+
+def _records(block, names: list[str]) -> list[dict]:
+    """One dict per time step; missing values are left out so agri_forecast's defaults apply."""
+    columns = [block.Variables(i).ValuesAsNumpy() for i in range(len(names))]
+    records = []
+    for step in range(len(columns[0]) if columns else 0):
+        moment = datetime.fromtimestamp(block.Time() + step * block.Interval(), timezone.utc)
+        record = {"date": moment.date().isoformat()}
+        for name, values in zip(names, columns):
+            value = float(values[step])
+            if not math.isnan(value):
+                record[name] = round(value, 2)
+        records.append(record)
+    return records
+
+
+def fetch_forecast(latitude: float, longitude: float) -> dict:
+    """The FORECAST_DAYS forecast in the form app/models/risk.py's predict takes."""
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "daily": DAILY,
+        "hourly": HOURLY,
+        "forecast_days": FORECAST_DAYS,
+    }
+    response = climatology.open_meteo().weather_api(FORECAST_URL, params=params)[0]
+    return {
+        "latitude": latitude,
+        "elevation": float(response.Elevation()),
+        "daily": _records(response.Daily(), DAILY),
+        "hourly": _records(response.Hourly(), HOURLY),
+    }
+
+
+def forecast_hash(forecast: dict) -> str:
+    """Changes with the forecast and with anything else the reports depend on."""
+    inputs = {
+        "model": MODEL_VERSION,
+        "crops": CROPS,
+        "normal_years": CLIMATE_NORMAL_YEARS,
+        "forecast": forecast,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+class RiskEngine:
+    def __init__(self):
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_held = False
+        self.runs = 0
+        self.users_checked = 0
+        self.users_recomputed = 0
+        self.reports_written = 0
+        self.cells_failed = 0
+        self.last_run_at: str | None = None
+        self.last_error: str | None = None
+
+    async def _forecast(self, cell: str) -> tuple[dict, str] | None:
+        try:
+            forecast = await asyncio.to_thread(fetch_forecast, *climatology.cell_center(cell))
+        except Exception as e:
+            # Users in the cell keep their reports and are retried next run
+            print(f"Risk engine: forecast for cell {cell} failed: {e}")
+            self.cells_failed += 1
+            return None
+        if not forecast["daily"]:
+            return None
+        return forecast, forecast_hash(forecast)
+
+    async def _reports(
+        self, db: AsyncSession, cell: str, forecast: dict
+    ) -> list[RiskReport] | None:
+        try:
+            normals = await climatology.normals_for(db, cell)
+            return await asyncio.to_thread(
+                lambda: [predict(crop, forecast, normals) for crop in CROPS]
+            )
+        except Exception as e:
+            await db.rollback()
+            print(f"Risk engine: reports for cell {cell} failed: {e}")
+            self.cells_failed += 1
+            return None
+
+    async def run_batch(
+        self,
+        db: AsyncSession,
+        users: list,
+        forecasts: dict[str, tuple[dict, str] | None],
+        reports: dict[str, list[RiskReport] | None],
+    ) -> None:
+        """
+        Recompute the users (rows of id, latitude, longitude) whose forecast
+        changed and commit. forecasts and reports are per cell and shared
+        across the batches of one run.
+        """
+        cells = {user.id: climatology.cell_of(user.latitude, user.longitude) for user in users}
+        for cell in set(cells.values()) - forecasts.keys():
+            forecasts[cell] = await self._forecast(cell)
+        stored = dict(
+            (
+                await db.execute(
+                    select(models.RiskForecastState.user_id, models.RiskForecastState.forecast_hash)
+                    .filter(models.RiskForecastState.user_id.in_(cells))
+                )
+            ).all()
+        )
+        changed = {
+            user_id: cell
+            for user_id, cell in cells.items()
+            if forecasts[cell] and forecasts[cell][1] != stored.get(user_id)
+        }
+        self.users_checked += len(users)
+        for cell in set(changed.values()) - reports.keys():
+            reports[cell] = await self._reports(db, cell, forecasts[cell][0])
+        changed = {user_id: cell for user_id, cell in changed.items() if reports[cell]}
+        if not changed:
+            await db.rollback()  # Read-only: end the transaction
+            return
+
+        rows = [
+            {
+                "user_id": user_id,
+                "crop_name": report.crop,
+                "risk_level": report.level,
+                "risk_factors": report.text,
+                "forecast_start_date": report.start,
+                "forecast_end_date": report.end,
+            }
+            for user_id, cell in changed.items()
+            for report in reports[cell]
+        ]
+        for start in range(0, len(rows), UPSERT_CHUNK):
+            chunk = rows[start : start + UPSERT_CHUNK]
+            stmt = dialect_insert(db, models.RiskPrediction).values(chunk)
+            await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[
+                        models.RiskPrediction.user_id,
+                        models.RiskPrediction.crop_name,
+                        models.RiskPrediction.forecast_start_date,
+                    ],
+                    set_={
+                        "risk_level": stmt.excluded.risk_level,
+                        "risk_factors": stmt.excluded.risk_factors,
+                        "forecast_end_date": stmt.excluded.forecast_end_date,
+                        "created_at": func.now(),
+                    },
+                )
+            )
+
+        stmt = dialect_insert(db, models.RiskForecastState).values(
+            [
+                {"user_id": user_id, "cell": cell, "forecast_hash": forecasts[cell][1]}
+                for user_id, cell in changed.items()
+            ]
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[models.RiskForecastState.user_id],
+                set_={
+                    "cell": stmt.excluded.cell,
+                    "forecast_hash": stmt.excluded.forecast_hash,
+                    "computed_at": func.now(),
+                },
+            )
+        )
+        if RISK_REPORT_KEEP_DAYS:
+            await db.execute(
+                delete(models.RiskPrediction).filter(
+                    models.RiskPrediction.user_id.in_(changed),
+                    models.RiskPrediction.forecast_start_date
+                    < date.today() - timedelta(days=RISK_REPORT_KEEP_DAYS),
+                )
+            )
+        await db.commit()
+
+        for user_id in changed:
+            profile_cache.invalidate(user_id)
+        self.users_recomputed += len(changed)
+        self.reports_written += len(rows)
+
+    async def run_once(self, db: AsyncSession) -> None:
+        """
+        Recompute every user whose forecast changed, RISK_ENGINE_USER_BATCH at
+        a time. Stops early when another process holds the lease.
+        """
+        forecasts: dict[str, tuple[dict, str] | None] = {}
+        reports: dict[str, list[RiskReport] | None] = {}
+        after_user_id = 0
+        while True:
+            if not await self.acquire_lease(db):
+                return
+            users = (
+                await db.execute(
+                    select(models.User.id, models.User.latitude, models.User.longitude)
+                    .filter(
+                        models.User.id > after_user_id,
+                        models.User.latitude.is_not(None),
+                        models.User.longitude.is_not(None),
+                    )
+                    .order_by(models.User.id)
+                    .limit(RISK_ENGINE_USER_BATCH)
+                )
+            ).all()
+            if not users:
+                break
+            await self.run_batch(db, users, forecasts, reports)
+            after_user_id = users[-1].id
+        self.runs += 1
+        self.last_run_at = datetime.now(timezone.utc).isoformat()
+
+    async def acquire_lease(self, db: AsyncSession) -> bool:
+        """Take or renew the lease unless another process holds an unexpired one."""
+        now = time.time()
+        lease = models.TaskLease
+        stmt = dialect_insert(db, lease).values(
+            name=LEASE_NAME,
+            holder=self.holder,
+            expires_at=now + LEASE_INTERVALS * RISK_ENGINE_INTERVAL_SECONDS,
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[lease.name],
+                set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+                where=(lease.holder == self.holder) | (lease.expires_at < now),
+            )
+        )
+        holder = await db.scalar(select(lease.holder).filter(lease.name == LEASE_NAME))
+        await db.commit()
+        self.lease_held = holder == self.holder
+        return self.lease_held
+
+    async def run_forever(self) -> None:
+        while True:
+            # Not at startup: every worker restart would recompute everything
+            await asyncio.sleep(RISK_ENGINE_INTERVAL_SECONDS)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.run_once(db)
+                self.last_error = None
+            except Exception as e:
+                # Keep going: the next run starts over from the first user
+                self.last_error = str(e)
+                print(f"Risk engine run failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": RISK_ENGINE_INTERVAL_SECONDS,
+            "holder": self.holder,
+            "lease_held": self.lease_held,
+            "crops": CROPS,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "users_checked": self.users_checked,
+            "users_recomputed": self.users_recomputed,
+            "reports_written": self.reports_written,
+            "cells_failed": self.cells_failed,
+            "last_error": self.last_error,
+        }
+
+
+risk_engine = RiskEngine()
@@ -0,0 +1,141 @@
+"""
+The /static mount for uploaded images.
+
+Plain StaticFiles, except that:
+
+- an image requested with ?w=<pixels> is answered with a resized variant
+  from app/services/derivatives.py, so list views can ask for thumbnails
+  instead of the original photos;
+- uploads never change once written (blobs are named by their SHA-256,
+  legacy files by a fresh UUID), so every response carries a long-lived
+  immutable Cache-Control and a strong ETag, and revalidations get a 304;
+- a client accepting br or gzip is sent a precompressed .br / .gz sibling
+  of a compressible file when one exists. JPEG, PNG and WebP are
+  compressed already and are always sent as they are.
+
+Range requests are answered by Starlette's FileResponse.
+"""
+
+import os
+import re
+from mimetypes import guess_type
+from urllib.parse import parse_qs
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.core.config import STATIC_MAX_AGE
+from app.services import derivatives
+
+CACHE_CONTROL = f"public, max-age={STATIC_MAX_AGE}, immutable"
+# Content-Encoding -> sibling file suffix, in order of preference
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE_EXTENSIONS = (".svg", ".json", ".txt", ".csv", ".html", ".css", ".js")
+# Blobs and their variants: the name starts with the content hash
+CONTENT_NAMED = re.compile(r"^[0-9a-f]{64}(\.|$)")
+
+
+def strong_etag(full_path: str, stat_result: os.stat_result) -> str:
+    """The content hash in the file name where there is one, else size and mtime."""
+    name = os.path.basename(full_path)
+    if CONTENT_NAMED.match(name):
+        return f'"{name}"'
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}-{stat_result.st_ino:x}"'
+
+
+class UploadStaticFiles(StaticFiles):
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        width = self._requested_width(scope)
+        if width is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+        try:
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        except (OSError, ValueError):
+            stat_result = None
+        if stat_result is None or not derivatives.is_image(full_path):
+            # Let the parent produce its usual 404 / 401 or serve non-images as they are
+            return await super().get_response(path, scope)
+
+        fmt = derivatives.negotiate_format(Headers(scope=scope).get("accept", ""))
+        try:
+            variant = await derivatives.ensure(full_path, derivatives.snap_width(width), fmt)
+        except Exception as e:
+            # A file PIL can't read still deserves an answer: the original
+            print(f"Serving original {path}, variant failed: {e}")
+            return await super().get_response(path, scope)
+        stat_result = await anyio.to_thread.run_sync(os.stat, variant)
+        return self.respond(
+            variant, stat_result, scope, media_type=derivatives.media_type(fmt), vary="Accept"
+        )
+
+    def file_response(
+        self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        if not str(full_path).lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            return self.respond(full_path, stat_result, scope, status_code=status_code)
+
+        media_type = guess_type(str(full_path))[0]
+        accepted = Headers(scope=scope).get("accept-encoding", "")
+        for encoding, suffix in PRECOMPRESSED.items():
+            if encoding in accepted:
+                try:
+                    sibling_stat = os.stat(f"{full_path}{suffix}")
+                except OSError:
+                    continue
+                return self.respond(
+                    f"{full_path}{suffix}",
+                    sibling_stat,
+                    scope,
+                    status_code=status_code,
+                    media_type=media_type,
+                    vary="Accept-Encoding",
+                    encoding=encoding,
+                )
+        return self.respond(
+            full_path, stat_result, scope, status_code=status_code, vary="Accept-Encoding"
+        )
+
+    def respond(
+        self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+        media_type: str | None = None,
+        vary: str | None = None,
+        encoding: str | None = None,
+    ) -> Response:
+        """A FileResponse with caching headers, or a 304 if the client's copy is current."""
+        headers = {"cache-control": CACHE_CONTROL, "etag": strong_etag(full_path, stat_result)}
+        if vary:
+            headers["vary"] = vary
+        if encoding:
+            headers["content-encoding"] = encoding
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _requested_width(scope: Scope) -> int | None:
+        values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("w")
+        if not values:
+            return None
+        try:
+            width = int(values[0])
+        except ValueError:
+            return None
+        return width if width > 0 else None
@@ -0,0 +1,120 @@
+"""
+Content-addressed image store.
+
+Every uploaded image lives once under UPLOAD_DIR/blobs, named by its
+SHA-256 and sharded by the first two byte pairs of the hash
+(blobs/ab/cd/abcdef....jpg), so no directory grows past a few thousand
+entries however many images are stored. Rows refer to a blob by its file
+path (disease and soil predictions) or by its /static URL (forum
+questions); a blob is unlinked only once no DiseaseDetection,
+SoilTypePrediction or Question row refers to it any more, together with
+its resized variants under UPLOAD_DIR/derived (app/services/derivatives.py).
+A blob written or re-uploaded within STORAGE_GC_GRACE_HOURS may be about
+to gain a reference from a row not committed yet, so it is left for the
+maintenance task (app/services/maintenance.py) to collect later.
+"""
+
+import glob
+import hashlib
+import os
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import STORAGE_GC_GRACE_HOURS, UPLOAD_DIR
+from app.db import models
+
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+DERIVED_DIR = os.path.join(UPLOAD_DIR, "derived")
+STATIC_PREFIX = "/static/"
+
+# Tables whose image_path column holds blob references
+REFERENCING_MODELS = (models.DiseaseDetection, models.SoilTypePrediction, models.Question)
+
+
+def blob_key(sha256: str, extension: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def blob_path(key: str) -> str:
+    return os.path.join(BLOB_DIR, key)
+
+
+def blob_url(key: str) -> str:
+    return f"{STATIC_PREFIX}blobs/{key}"
+
+
+def file_path_of(image_path: str) -> str:
+    """Filesystem path for a stored image_path, whether a path or a /static URL."""
+    if image_path.startswith(STATIC_PREFIX):
+        return os.path.join(UPLOAD_DIR, image_path[len(STATIC_PREFIX) :])
+    return image_path
+
+
+def derived_prefix(path: str) -> str:
+    """
+    Shared prefix of a file's variants in DERIVED_DIR. Blobs are named by
+    their content hash already; legacy flat uploads use a hash of their path.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if os.path.relpath(path, BLOB_DIR).startswith(".."):
+        name = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()
+        return os.path.join(DERIVED_DIR, "legacy", name[:2], name[2:4], name)
+    return os.path.join(DERIVED_DIR, name[:2], name[2:4], name)
+
+
+def reference_forms(image_path: str) -> list[str]:
+    """Every image_path value that can point at the same file."""
+    path = os.path.normpath(file_path_of(image_path))
+    forms = {image_path, file_path_of(image_path), path}
+    relative = os.path.relpath(path, BLOB_DIR)
+    if not relative.startswith(".."):
+        forms |= {blob_path(relative), blob_url(relative)}
+    relative = os.path.relpath(path, UPLOAD_DIR)
+    if not relative.startswith(".."):
+        # Legacy scans were saved as UPLOAD_DIR + "/disease_images/<uuid>.jpg"
+        forms |= {os.path.join(UPLOAD_DIR, relative), f"{UPLOAD_DIR}/{relative}"}
+        forms.add(f"{STATIC_PREFIX}{relative}")
+    return sorted(forms)
+
+
+async def count_references(db: AsyncSession, image_path: str) -> int:
+    forms = reference_forms(image_path)
+    total = 0
+    for model in REFERENCING_MODELS:
+        total += await db.scalar(select(func.count()).filter(model.image_path.in_(forms)))
+    return total
+
+
+def unlink(image_path: str) -> None:
+    path = file_path_of(image_path)
+    if os.path.exists(path):
+        os.remove(path)
+    for variant in glob.glob(glob.escape(derived_prefix(path)) + ".*"):
+        os.remove(variant)
+
+
+def recently_touched(image_path: str) -> bool:
+    """Whether the file was written or re-uploaded within the GC grace period."""
+    try:
+        mtime = os.stat(file_path_of(image_path)).st_mtime
+    except FileNotFoundError:
+        return False
+    return mtime >= time.time() - STORAGE_GC_GRACE_HOURS * 3600
+
+
+async def delete_with_image(db: AsyncSession, row) -> None:
+    """
+    Delete row and commit; unlink its image afterwards if that was the last
+    reference, so a failed commit never leaves a row pointing at nothing.
+    A recently touched image is kept: a concurrent upload of the same bytes
+    reuses the file before its row is committed.
+    """
+    image_path = row.image_path
+    await db.delete(row)
+    await db.flush()
+    orphaned = bool(image_path) and await count_references(db, image_path) == 0
+    await db.commit()
+    if orphaned and not recently_touched(image_path):
+        unlink(image_path)
@@ -0,0 +1,116 @@
+"""
+Upload ingestion shared by the image routes.
+
+The multipart body is copied from Starlette's spooled upload file into the
+content-addressed store (app/services/storage.py) in fixed-size chunks, on
+a worker thread, hashing as it goes; it is never held in memory as one
+bytes object. The image type comes from the file's magic bytes, not the
+client's content_type, and uploads over MAX_UPLOAD_BYTES are cut off with
+a 413. A duplicate upload reuses the blob already on disk.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import MAX_UPLOAD_BYTES
+from app.services import storage
+
+CHUNK_SIZE = 256 * 1024
+
+# kind -> (extension, signature check on the first bytes)
+IMAGE_TYPES = {
+    "jpeg": (".jpg", lambda head: head.startswith(b"\xff\xd8\xff")),
+    "png": (".png", lambda head: head.startswith(b"\x89PNG\r\n\x1a\n")),
+    "webp": (".webp", lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP"),
+    "gif": (".gif", lambda head: head[:6] in (b"GIF87a", b"GIF89a")),
+}
+MODEL_IMAGE_TYPES = ("jpeg", "png")
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    for kind, (_, matches) in IMAGE_TYPES.items():
+        if matches(head):
+            return kind
+    return None
+
+
+@dataclass
+class StoredUpload:
+    key: str  # ab/cd/<sha256><ext> inside the blob store
+    sha256: str
+    size: int
+    kind: str
+    created: bool  # False when an identical file was already stored
+
+    @property
+    def path(self) -> str:
+        return storage.blob_path(self.key)
+
+    @property
+    def url(self) -> str:
+        return storage.blob_url(self.key)
+
+    def discard(self) -> None:
+        """Remove the file if this upload created it, e.g. when prediction failed."""
+        if self.created and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _copy_to_disk(source: BinaryIO, allowed: tuple[str, ...], max_bytes: int) -> StoredUpload:
+    source.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    kind = None
+    os.makedirs(storage.BLOB_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=storage.BLOB_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := source.read(CHUNK_SIZE):
+                if kind is None:
+                    kind = sniff_image_type(chunk[:16])
+                    if kind not in allowed:
+                        names = "/".join(k.upper() for k in allowed)
+                        raise HTTPException(400, f"Invalid file type. Only {names} allowed.")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        413, f"Image exceeds the {max_bytes // 2**20} MB upload limit."
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+        if kind is None:
+            raise HTTPException(400, "Empty file.")
+
+        key = storage.blob_key(digest.hexdigest(), IMAGE_TYPES[kind][0])
+        path = storage.blob_path(key)
+        created = not os.path.exists(path)
+        if created:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+            # Restart the garbage collector's grace period for a blob about to be referenced
+            os.utime(path)
+        return StoredUpload(key, digest.hexdigest(), size, kind, created)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+async def ingest_image(
+    upload: UploadFile,
+    allowed: tuple[str, ...] = MODEL_IMAGE_TYPES,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+) -> StoredUpload:
+    """
+    Store an uploaded image in the blob store. Raises HTTPException 400 for
+    a type outside allowed and 413 past max_bytes.
+    """
+    return await asyncio.to_thread(_copy_to_disk, upload.file, allowed, max_bytes)
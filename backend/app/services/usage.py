@@ -0,0 +1,121 @@
+"""
+Per-user storage accounting for the upload quota.
+
+A user's usage is the size of the distinct image files their scans, soil
+predictions and questions refer to. Routes check the quota before running
+a model on a new upload and add the bytes in the transaction that saves
+the row; the maintenance task recomputes the totals from the rows a batch
+of users at a time, so deletes and anything the increments miss (an image
+uploaded twice, a row removed by hand) are corrected within one cycle.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import USER_STORAGE_QUOTA_MB
+from app.db import models
+from app.db.session import dialect_insert
+from app.services import storage
+from app.services.uploads import StoredUpload
+
+QUOTA_BYTES = int(USER_STORAGE_QUOTA_MB * 2**20)
+
+
+async def used_bytes(db: AsyncSession, user_id: int) -> int:
+    used = await db.scalar(
+        select(models.StorageUsage.bytes).filter(models.StorageUsage.user_id == user_id)
+    )
+    return used or 0
+
+
+async def enforce_quota(db: AsyncSession, user_id: int, uploads: list[StoredUpload]) -> None:
+    """Raise a 413, removing the new files, if uploads would take the user past the quota."""
+    if not QUOTA_BYTES:
+        return
+    incoming = sum(upload.size for upload in uploads)
+    used = await used_bytes(db, user_id)
+    if used + incoming > QUOTA_BYTES:
+        for upload in uploads:
+            upload.discard()
+        raise HTTPException(
+            status_code=413,
+            detail=f"Storage quota of {QUOTA_BYTES // 2**20} MB exceeded "
+            f"({used // 2**20} MB used).",
+        )
+
+
+async def record(db: AsyncSession, user_id: int, uploads: list[StoredUpload]) -> None:
+    """Add the uploads to the user's usage in the caller's transaction."""
+    added = sum(upload.size for upload in uploads)
+    stmt = dialect_insert(db, models.StorageUsage).values(
+        user_id=user_id, bytes=added, files=len(uploads)
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[models.StorageUsage.user_id],
+            set_={
+                "bytes": models.StorageUsage.bytes + added,
+                "files": models.StorageUsage.files + len(uploads),
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+    )
+
+
+def _sizes(paths: set[str]) -> int:
+    total = 0
+    for path in paths:
+        try:
+            total += os.stat(path).st_size
+        except OSError:
+            pass  # Row points at a missing file; it costs nothing
+    return total
+
+
+async def refresh(db: AsyncSession, after_user_id: int, limit: int) -> int | None:
+    """
+    Recompute usage for the next limit users with an id above after_user_id
+    and commit. Returns the last user id handled, or None past the last user.
+    """
+    user_ids = (
+        await db.execute(
+            select(models.User.id)
+            .filter(models.User.id > after_user_id)
+            .order_by(models.User.id)
+            .limit(limit)
+        )
+    ).scalars().all()
+    if not user_ids:
+        return None
+
+    references = union_all(
+        *(
+            select(model.user_id, model.image_path).filter(
+                model.user_id.in_(user_ids), model.image_path.is_not(None)
+            )
+            for model in storage.REFERENCING_MODELS
+        )
+    )
+    files: dict[int, set[str]] = {user_id: set() for user_id in user_ids}
+    for user_id, image_path in await db.execute(references):
+        files[user_id].add(os.path.normpath(storage.file_path_of(image_path)))
+
+    now = datetime.now(timezone.utc)
+    for user_id, paths in files.items():
+        total = await asyncio.to_thread(_sizes, paths)
+        stmt = dialect_insert(db, models.StorageUsage).values(
+            user_id=user_id, bytes=total, files=len(paths), updated_at=now
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[models.StorageUsage.user_id],
+                set_={"bytes": total, "files": len(paths), "updated_at": now},
+            )
+        )
+    await db.commit()
+    return user_ids[-1]
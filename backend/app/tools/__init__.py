@@ -0,0 +1 @@
+# Offline build and maintenance tools, run with `python -m app.tools.<name>`
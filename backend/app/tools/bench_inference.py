@@ -0,0 +1,285 @@
+"""
+Benchmark disease and soil image classification throughput on this machine.
+
+Run from the backend directory (offline, CPU only):
+
+    python -m app.tools.bench_inference
+    python -m app.tools.bench_inference --mode asgi --model disease --concurrency 1 4 16
+    python -m app.tools.bench_inference --images path/to/photos --batch-sizes 1 8 32
+
+"direct" calls predict_disease_from_file / predict_soil_type_from_file
+(or, for disease batches, one decode_batch + predict_batch call) from a
+thread pool of the given concurrency. "asgi" posts the same images to the
+upload routes through an in-process ASGI client backed by a scratch SQLite
+database, with batches going to /tests/disease/predict-batch. Uploads go
+to a scratch directory and no display variants are generated.
+
+Without --images a corpus of synthetic phone-sized JPEGs is generated.
+Every request carries unique bytes so the content-hash result cache never
+answers. Reports images/sec, p50/p95/p99 latency per request, the mean
+decode and forward-pass time per image and the process peak RSS.
+"""
+
+import argparse
+import asyncio
+import functools
+import io
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from app.models import disease, soil
+from app.models.loading import registry
+from app.services import derivatives, storage
+from app.tools.convert_models import find_images
+
+
+class Timings:
+    """Thread-safe accumulator for the decode / forward breakdown."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.seconds = {"decode": 0.0, "forward": 0.0}
+
+    def wrap(self, kind: str, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds[kind] += time.perf_counter() - start
+
+        return timed
+
+
+timings = Timings()
+
+
+def instrument() -> None:
+    """Time every decode entry point and the forward pass of both loaded models."""
+    for name in ("decode_batch", "load_image_array"):
+        setattr(disease, name, timings.wrap("decode", getattr(disease, name)))
+    soil.preprocess_image = timings.wrap("decode", soil.preprocess_image)
+
+    decode_images = disease.decode_images
+
+    @functools.wraps(decode_images)
+    async def timed_decode_images(contents):
+        start = time.perf_counter()
+        try:
+            return await decode_images(contents)
+        finally:
+            timings.seconds["decode"] += time.perf_counter() - start
+
+    disease.decode_images = timed_decode_images
+    for name in ("disease", "soil"):
+        backend = registry.get(name)
+        backend.predict = timings.wrap("forward", backend.predict)
+
+
+def synthetic_corpus(count: int, size: tuple[int, int]) -> list[bytes]:
+    """Smooth random gradients with noise: compresses and decodes like real photos."""
+    rng = np.random.default_rng(0)
+    corpus = []
+    for _ in range(count):
+        small = rng.integers(0, 256, (12, 16, 3), dtype=np.uint8)
+        image = Image.fromarray(small).resize(size, Image.BICUBIC)
+        noise = rng.normal(0, 8, (size[1], size[0], 3))
+        pixels = np.clip(np.asarray(image) + noise, 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+        corpus.append(buffer.getvalue())
+    return corpus
+
+
+def load_corpus(images: str | None, count: int, size: tuple[int, int]) -> list[bytes]:
+    if not images:
+        return synthetic_corpus(count, size)
+    paths = find_images(images)[:count]
+    if not paths:
+        raise SystemExit(f"No images found under {images}")
+    corpus = []
+    for path in paths:
+        with open(path, "rb") as f:
+            corpus.append(f.read())
+    return corpus
+
+
+class Uploads:
+    """Cycles through the corpus, making each upload's bytes unique."""
+
+    def __init__(self, corpus: list[bytes]):
+        self.corpus = corpus
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> bytes:
+        with self._lock:
+            self._count += 1
+            n = self._count
+        # Decoders stop at the JPEG/PNG end marker, so the trailer only changes the hash
+        return self.corpus[n % len(self.corpus)] + n.to_bytes(8, "little")
+
+
+def direct_call(model: str, batch: list[bytes]) -> None:
+    if model == "soil":
+        soil.predict_soil_type_from_file(io.BytesIO(batch[0]))
+    elif len(batch) == 1:
+        disease.predict_disease_from_file(io.BytesIO(batch[0]))
+    else:
+        files = [io.BytesIO(data) for data in batch]
+        disease.predict_batch(disease.decode_batch(files, disease.IMG_SIZE, Image.NEAREST))
+
+
+def run_direct(model: str, uploads: Uploads, concurrency: int, batch_size: int, requests: int):
+    def one_request(_) -> float:
+        batch = [uploads.next() for _ in range(batch_size)]
+        start = time.perf_counter()
+        direct_call(model, batch)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(one_request, range(requests)))
+
+
+async def asgi_client(workdir: str):
+    from httpx import ASGITransport, AsyncClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from app.__main__ import app
+    from app.db.session import Base, build_engine, get_db
+
+    # A file, like production: concurrent sessions on one in-memory connection interfere
+    engine = build_engine(f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def bench_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = bench_db
+    client = AsyncClient(transport=ASGITransport(app=app), base_url="http://bench")
+    await client.post("/users/", json={"username": "bench", "latitude": 0, "longitude": 0})
+    client.cookies.set("username", "bench")
+    return client
+
+
+async def run_asgi(client, model, uploads, concurrency, batch_size, requests):
+    """Latencies of the accepted requests; uploads the pool turned away (429) are dropped."""
+    semaphore = asyncio.Semaphore(concurrency)
+    field = "images" if batch_size > 1 else "image"
+
+    async def one_request() -> float | None:
+        async with semaphore:
+            files = [
+                (field, (f"{i}.jpg", uploads.next(), "image/jpeg")) for i in range(batch_size)
+            ]
+            if model == "soil":
+                url = "/tests/soiltype/predict"
+            elif batch_size > 1:
+                url = "/tests/disease/predict-batch"
+            else:
+                url = "/tests/disease/predict"
+            start = time.perf_counter()
+            response = await client.post(url, files=files)
+            elapsed = time.perf_counter() - start
+            if response.status_code == 429:
+                return None
+            if response.status_code != 200:
+                raise SystemExit(f"{url} returned {response.status_code}: {response.text}")
+            return elapsed
+
+    latencies = await asyncio.gather(*(one_request() for _ in range(requests)))
+    return [latency for latency in latencies if latency is not None]
+
+
+def report(mode, model, concurrency, batch_size, latencies, requests, wall) -> None:
+    images = len(latencies) * batch_size
+    if not latencies:
+        print(f"{mode:<7}{model:<8}{concurrency:>5}{batch_size:>6}  every request got a 429")
+        return
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    decode_ms = timings.seconds["decode"] * 1000 / images
+    forward_ms = timings.seconds["forward"] * 1000 / images
+    # ru_maxrss is in KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{mode:<7}{model:<8}{concurrency:>5}{batch_size:>6}{images / wall:>10.1f}"
+        f"{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{decode_ms:>9.2f}{forward_ms:>9.2f}"
+        f"{peak_rss:>9.0f}{requests - len(latencies):>6}"
+    )
+
+
+async def main_async(args) -> None:
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    uploads = Uploads(load_corpus(args.images, args.corpus, (width, height)))
+    models = ["disease", "soil"] if args.model == "all" else [args.model]
+    modes = ["direct", "asgi"] if args.mode == "all" else [args.mode]
+
+    instrument()  # Also loads and warms both models, outside any measurement
+    workdir = tempfile.mkdtemp(prefix="bench-inference-")
+    client = await asgi_client(workdir) if "asgi" in modes else None
+    storage.BLOB_DIR = os.path.join(workdir, "blobs")
+    storage.DERIVED_DIR = os.path.join(workdir, "derived")
+    # Upload routes queue thumbnail encoding, which would compete with inference
+    derivatives.schedule = lambda source: None
+
+    print(f"corpus: {len(uploads.corpus)} images, {args.requests} requests per row, times in ms")
+    print(
+        f"{'mode':<7}{'model':<8}{'conc':>5}{'batch':>6}{'img/s':>10}"
+        f"{'p50':>9}{'p95':>9}{'p99':>9}{'decode':>9}{'forward':>9}{'RSS MB':>9}{'429':>6}"
+    )
+    for mode in modes:
+        for model in models:
+            # Soil images are only ever predicted one at a time
+            batch_sizes = args.batch_sizes if model == "disease" else [1]
+            for batch_size in batch_sizes:
+                for concurrency in args.concurrency:
+                    timings.reset()
+                    start = time.perf_counter()
+                    if mode == "direct":
+                        latencies = await asyncio.to_thread(
+                            run_direct, model, uploads, concurrency, batch_size, args.requests
+                        )
+                    else:
+                        latencies = await run_asgi(
+                            client, model, uploads, concurrency, batch_size, args.requests
+                        )
+                    wall = time.perf_counter() - start
+                    report(mode, model, concurrency, batch_size, latencies, args.requests, wall)
+    if client:
+        await client.aclose()
+    shutil.rmtree(workdir)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=["direct", "asgi", "all"], default="all")
+    parser.add_argument("--model", choices=["disease", "soil", "all"], default="all")
+    parser.add_argument("--images", help="Directory of real photos instead of synthetic ones")
+    parser.add_argument("--corpus", type=int, default=32, help="Images to generate or load")
+    parser.add_argument("--size", default="1600x1200", help="Synthetic image size, WxH")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per configuration")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark model.predict against the compiled forward pass KerasBackend uses.
+
+Run from the backend directory:
+
+    python -m app.tools.bench_predict
+    python -m app.tools.bench_predict --model soil --batch-sizes 1 4 --calls 200
+
+Reports the first call (tracing included) and the steady-state median and
+p95 per call for each batch size, so the fixed per-call overhead of
+model.predict shows up directly at batch size 1.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.models import disease, soil
+from app.models.backends import KerasBackend
+
+MODELS = {"disease": disease, "soil": soil}
+
+
+def measure(fn, batch: np.ndarray, calls: int) -> tuple[float, float, float]:
+    start = time.perf_counter()
+    fn(batch)
+    first = (time.perf_counter() - start) * 1000
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    return first, float(np.percentile(timings, 50)), float(np.percentile(timings, 95))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", choices=list(MODELS), default="disease")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--calls", type=int, default=100)
+    args = parser.parse_args()
+
+    backend = KerasBackend(MODELS[args.model].MODEL_PATH)
+    model = backend.model
+    rng = np.random.default_rng(0)
+
+    print(f"{args.model}: {args.calls} calls per batch size, times in ms")
+    print(f"{'batch':>5}  {'method':<10}{'first':>9}{'p50':>9}{'p95':>9}")
+    for size in args.batch_sizes:
+        batch = rng.uniform(0, 255, (size, *backend.input_shape)).astype(np.float32)
+        methods = {
+            "predict": lambda b: model.predict(b, batch_size=len(b), verbose=0),
+            "compiled": backend.predict,
+        }
+        for name, fn in methods.items():
+            first, p50, p95 = measure(fn, batch, args.calls)
+            print(f"{size:>5}  {name:<10}{first:>9.2f}{p50:>9.2f}{p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
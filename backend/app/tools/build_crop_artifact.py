@@ -0,0 +1,57 @@
+"""
+Compile the crop recommendation CSVs into memory-mappable .npz artifacts.
+
+Run from the backend directory after changing a data.csv:
+
+    python -m app.tools.build_crop_artifact
+    python -m app.tools.build_crop_artifact --csv path/to/data.csv --out path/to/crop_model.npz
+"""
+
+import argparse
+import time
+
+from app.models import crop as crop_model
+from app.game import model as game_model
+from app.models.crop_artifact import compile_csv, write_artifact
+
+DEFAULT_TARGETS = [
+    (crop_model.CSV_PATH, crop_model.ARTIFACT_PATH),
+    (game_model.CSV_PATH, game_model.ARTIFACT_PATH),
+]
+
+
+def build(csv_path: str, out_path: str, with_index: bool = True) -> None:
+    start = time.perf_counter()
+    arrays = compile_csv(csv_path, with_index=with_index)
+    write_artifact(arrays, out_path)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(
+        f"{csv_path} -> {out_path}: {len(arrays['rows'])} rows, "
+        f"{len(arrays['crops'])} crops ({elapsed:.1f} ms)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", help="Source CSV (defaults to both app datasets)")
+    parser.add_argument("--out", help="Output .npz path, required with --csv")
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Skip the standardized rows used for the k-NN tree",
+    )
+    args = parser.parse_args()
+
+    if args.csv:
+        if not args.out:
+            parser.error("--out is required with --csv")
+        targets = [(args.csv, args.out)]
+    else:
+        targets = DEFAULT_TARGETS
+
+    for csv_path, out_path in targets:
+        build(csv_path, out_path, with_index=not args.no_index)
+
+
+if __name__ == "__main__":
+    main()
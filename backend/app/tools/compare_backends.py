@@ -0,0 +1,150 @@
+"""
+Compare the Keras model against its TFLite variants: accuracy, latency and memory.
+
+Run from the backend directory after app.tools.convert_models:
+
+    python -m app.tools.compare_backends --model disease --images path/to/samples
+    python -m app.tools.compare_backends --model soil --variants float16 int8 --batch-size 8
+
+If --images has one subdirectory per class (named like DISEASE_CLASSES or
+SOIL_TYPES), accuracy against those labels is reported; otherwise, and for
+random inputs when --images is omitted, each variant is scored by top-1
+agreement with the Keras model. Every backend runs in its own subprocess so
+load time and peak RSS are not polluted by the others.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from app.tools.convert_models import MODELS, find_images, input_array
+
+
+def class_names(name: str) -> list[str]:
+    if name == "disease":
+        from app.core.constants import DISEASE_CLASSES
+
+        return DISEASE_CLASSES
+    return MODELS[name].SOIL_TYPES
+
+
+def load_inputs(name: str, images: str | None, count: int) -> tuple[np.ndarray, list]:
+    """Returns (inputs, labels); a label is None when the image is not in a class folder."""
+    if not images:
+        shape = (128, 128, 3) if name == "disease" else (220, 220, 3)
+        rng = np.random.default_rng(0)
+        return rng.uniform(0, 255, (count, *shape)).astype(np.float32), [None] * count
+
+    classes = class_names(name)
+    paths = find_images(images)[:count]
+    inputs = np.concatenate([input_array(name, path) for path in paths]).astype(np.float32)
+    labels = []
+    for path in paths:
+        folder = os.path.basename(os.path.dirname(path))
+        labels.append(classes.index(folder) if folder in classes else None)
+    return inputs, labels
+
+
+def run_worker(args) -> None:
+    """Child process: load one backend, predict, print a JSON report on stdout."""
+    from app.models.backends import load_backend
+
+    module = MODELS[args.model]
+    kind, _, variant = args.worker.partition(":")
+    inputs, _ = load_inputs(args.model, args.images, args.count)
+
+    start = time.perf_counter()
+    backend = load_backend(kind, module.MODEL_PATH, variant or "float16", args.threads)
+    load_seconds = time.perf_counter() - start
+
+    backend.predict(inputs[: args.batch_size])  # Warm-up, not timed
+    predictions, latencies = [], []
+    for _ in range(args.repeat):
+        predictions = []
+        for i in range(0, len(inputs), args.batch_size):
+            batch = inputs[i : i + args.batch_size]
+            start = time.perf_counter()
+            output = backend.predict(batch)
+            latencies.append((time.perf_counter() - start) * 1000 / len(batch))
+            predictions += np.argmax(output, axis=1).tolist()
+
+    print(
+        json.dumps(
+            {
+                "predictions": predictions,
+                "load_seconds": load_seconds,
+                "ms_per_image_p50": float(np.percentile(latencies, 50)),
+                "ms_per_image_p95": float(np.percentile(latencies, 95)),
+                # ru_maxrss is in KiB on Linux
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            }
+        )
+    )
+
+
+def run_backend(args, spec: str) -> dict:
+    cmd = [sys.executable, "-m", "app.tools.compare_backends", "--worker", spec]
+    cmd += ["--model", args.model, "--count", str(args.count)]
+    cmd += ["--batch-size", str(args.batch_size), "--repeat", str(args.repeat)]
+    if args.images:
+        cmd += ["--images", args.images]
+    if args.threads:
+        cmd += ["--threads", str(args.threads)]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"{spec} failed:\n{result.stderr.strip()}", file=sys.stderr)
+        return {}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", choices=list(MODELS), default="disease")
+    parser.add_argument("--variants", nargs="+", default=["float16", "int8"])
+    parser.add_argument("--images", help="Evaluation images, optionally in class folders")
+    parser.add_argument("--count", type=int, default=64, help="Images to evaluate")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, help="TFLite interpreter threads")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    _, labels = load_inputs(args.model, args.images, args.count)
+    labelled = [i for i, label in enumerate(labels) if label is not None]
+
+    reports = {}
+    for spec in ["keras", *(f"tflite:{variant}" for variant in args.variants)]:
+        reports[spec] = run_backend(args, spec)
+    reference = reports["keras"].get("predictions")
+
+    print(f"{args.model}: {args.count} images, batch size {args.batch_size}")
+    header = f"{'backend':<16}{'accuracy':>10}{'agree':>8}{'load s':>8}"
+    print(header + f"{'p50 ms':>9}{'p95 ms':>9}{'RSS MB':>9}")
+    for spec, report in reports.items():
+        if not report:
+            print(f"{spec:<16}{'failed':>10}")
+            continue
+        predictions = report["predictions"]
+        accuracy = (
+            f"{np.mean([predictions[i] == labels[i] for i in labelled]):.3f}" if labelled else "-"
+        )
+        agree = f"{np.mean(np.equal(predictions, reference)):.3f}" if reference else "-"
+        print(
+            f"{spec:<16}{accuracy:>10}{agree:>8}{report['load_seconds']:>8.2f}"
+            f"{report['ms_per_image_p50']:>9.2f}{report['ms_per_image_p95']:>9.2f}"
+            f"{report['peak_rss_mb']:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
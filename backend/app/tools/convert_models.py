@@ -0,0 +1,121 @@
+"""
+Convert the Keras image classifiers to TFLite variants for INFERENCE_BACKEND=tflite.
+
+Run from the backend directory (needs TensorFlow, unlike serving the result):
+
+    python -m app.tools.convert_models
+    python -m app.tools.convert_models --model disease --quant int8 --images path/to/samples
+
+float16 halves the weights and keeps accuracy essentially unchanged. int8
+quantizes weights and activations, calibrated on --images (a directory of
+JPEG/PNG files, searched recursively); without it random pixels are used,
+which produces a model that runs but should not be trusted for accuracy.
+"""
+
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from app.models import disease, soil
+from app.models.backends import tflite_path
+
+MODELS = {"disease": disease, "soil": soil}
+QUANTIZATIONS = ("float16", "int8", "dynamic")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def input_array(name: str, image_path: str) -> np.ndarray:
+    """Preprocess one file exactly as the serving path does, with a batch dimension."""
+    if name == "disease":
+        with open(image_path, "rb") as f:
+            batch = np.expand_dims(disease.load_image_array(f), axis=0)
+    else:
+        batch = soil.preprocess_image(image_path)
+    return batch.astype(np.float32)  # The converter feeds calibration data as given
+
+
+def find_images(directory: str) -> list[str]:
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths += [os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(paths)
+
+
+def representative_dataset(name: str, input_shape, images: str | None, samples: int):
+    if images:
+        paths = find_images(images)
+        random.Random(0).shuffle(paths)
+        paths = paths[:samples]
+        if not paths:
+            raise SystemExit(f"No images found under {images}")
+        print(f"  calibrating {name} on {len(paths)} images from {images}")
+
+        def generator():
+            for path in paths:
+                yield [input_array(name, path)]
+
+        return generator
+
+    print(f"  WARNING: no --images given, calibrating {name} on random pixels")
+    rng = np.random.default_rng(0)
+
+    def generator():
+        for _ in range(samples):
+            yield [rng.uniform(0, 255, (1, *input_shape[1:])).astype(np.float32)]
+
+    return generator
+
+
+def convert(name: str, quant: str, images: str | None, samples: int) -> str:
+    import tensorflow as tf
+
+    module = MODELS[name]
+    out_path = tflite_path(module.MODEL_PATH, quant)
+    start = time.perf_counter()
+
+    model = tf.keras.models.load_model(module.MODEL_PATH)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quant == "int8":
+        # Inputs and outputs stay float32 so the serving code does not change
+        converter.representative_dataset = representative_dataset(
+            name, model.input_shape, images, samples
+        )
+    flatbuffer = converter.convert()
+
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(flatbuffer)
+    os.replace(tmp_path, out_path)
+
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(module.MODEL_PATH) / 2**20
+    print(
+        f"{module.MODEL_PATH} ({size_mb:.1f} MB) -> {out_path} "
+        f"({len(flatbuffer) / 2**20:.1f} MB, {elapsed:.1f} s)"
+    )
+    return out_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", choices=[*MODELS, "all"], default="all")
+    parser.add_argument("--quant", choices=QUANTIZATIONS, default="float16")
+    parser.add_argument("--images", help="Calibration images for --quant int8")
+    parser.add_argument(
+        "--samples", type=int, default=200, help="Calibration images to use (default 200)"
+    )
+    args = parser.parse_args()
+
+    names = list(MODELS) if args.model == "all" else [args.model]
+    for name in names:
+        convert(name, args.quant, args.images, args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Move legacy flat uploads into the content-addressed blob store.
+
+Run from the backend directory, ideally while the API is stopped:
+
+    python -m app.tools.migrate_uploads --dry-run
+    python -m app.tools.migrate_uploads
+
+Images referenced from DiseaseDetection, SoilTypePrediction and Question
+rows that still live in uploads/disease_images, uploads/soil_images or
+uploads/forum are copied to blobs/ab/cd/<sha256><ext>, the rows are
+repointed (keeping the path or /static URL form they used), and the old
+files are removed once the transaction has committed. Identical images
+collapse into one blob.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import shutil
+
+from sqlalchemy import select
+
+from app.db.session import AsyncSessionLocal
+from app.services import storage
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def in_blob_store(path: str) -> bool:
+    return not os.path.relpath(path, storage.BLOB_DIR).startswith("..")
+
+
+async def migrate(dry_run: bool) -> None:
+    moved, missing, rows_updated = set(), 0, 0
+    async with AsyncSessionLocal() as db:
+        for model in storage.REFERENCING_MODELS:
+            rows = (
+                await db.execute(select(model).filter(model.image_path.is_not(None)))
+            ).scalars()
+            for row in rows:
+                source = storage.file_path_of(row.image_path)
+                if in_blob_store(source):
+                    continue
+                if not os.path.exists(source):
+                    missing += 1
+                    continue
+                key = storage.blob_key(file_sha256(source), os.path.splitext(source)[1].lower())
+                target = storage.blob_path(key)
+                if not dry_run and not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copy2(source, target)
+                if row.image_path.startswith(storage.STATIC_PREFIX):
+                    row.image_path = storage.blob_url(key)
+                else:
+                    row.image_path = target
+                moved.add(source)
+                rows_updated += 1
+        if dry_run:
+            await db.rollback()
+        else:
+            await db.commit()
+
+    if not dry_run:
+        for source in moved:
+            os.remove(source)
+    action = "Would move" if dry_run else "Moved"
+    print(
+        f"{action} {len(moved)} files for {rows_updated} rows; "
+        f"{missing} rows point at missing files"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="Report without changing anything")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.models.backends import KerasBackend, TFLiteBackend, load_backend, tflite_path
+
+
+def test_tflite_path_sits_next_to_the_keras_model():
+    assert tflite_path("app/data/model.h5", "int8") == "app/data/model.int8.tflite"
+
+
+def test_missing_tflite_variant_names_the_converter(tmp_path):
+    with pytest.raises(FileNotFoundError, match="convert_models"):
+        load_backend("tflite", str(tmp_path / "model.h5"), "float16")
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="onnx"):
+        load_backend("onnx", "app/data/model.h5", "float16")
+
+
+@pytest.mark.parametrize("quant, tolerance", [("float16", 1e-2), ("dynamic", 5e-2)])
+def test_tflite_matches_keras(tmp_path, monkeypatch, quant, tolerance):
+    tf = pytest.importorskip("tensorflow")
+    from app.tools import convert_models
+
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential(
+        [
+            tf.keras.Input((16, 16, 3)),
+            tf.keras.layers.Rescaling(1 / 255),
+            tf.keras.layers.Conv2D(4, 3, activation="relu"),
+            tf.keras.layers.GlobalAveragePooling2D(),
+            tf.keras.layers.Dense(5, activation="softmax"),
+        ]
+    )
+    h5_path = str(tmp_path / "tiny.h5")
+    model.save(h5_path)
+    monkeypatch.setitem(convert_models.MODELS, "tiny", SimpleNamespace(MODEL_PATH=h5_path))
+    out_path = convert_models.convert("tiny", quant, images=None, samples=4)
+    assert out_path == tflite_path(h5_path, quant)
+
+    keras, tflite = KerasBackend(h5_path), TFLiteBackend(out_path)
+    rng = np.random.default_rng(0)
+    # Batch sizes other than the converted one go through the input resize
+    for size in (1, 3, 1):
+        batch = rng.uniform(0, 255, (size, 16, 16, 3)).astype(np.float32)
+        expected, actual = keras.predict(batch), tflite.predict(batch)
+        assert actual.shape == expected.shape == (size, 5)
+        np.testing.assert_allclose(actual, expected, atol=tolerance)
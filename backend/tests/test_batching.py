@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from app.models.batching import MicroBatcher
+from app.models.executor import InferencePool, PoolSaturated
+
+
+@pytest.mark.anyio
+async def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    def predict(batch):
+        calls.append(len(batch))
+        return batch.sum(axis=1)
+
+    batcher = MicroBatcher(predict, max_batch_size=8, max_wait_ms=50)
+    results = await asyncio.gather(*(batcher.submit(np.full(3, i)) for i in range(5)))
+
+    assert [float(r) for r in results] == [0.0, 3.0, 6.0, 9.0, 12.0]
+    assert calls == [5]
+    assert batcher.stats()["avg_batch_size"] == 5
+
+
+@pytest.mark.anyio
+async def test_batch_size_limit_splits_batches():
+    calls = []
+
+    def predict(batch):
+        calls.append(len(batch))
+        return batch
+
+    batcher = MicroBatcher(predict, max_batch_size=2, max_wait_ms=50)
+    await asyncio.gather(*(batcher.submit(np.zeros(1)) for _ in range(5)))
+    assert sum(calls) == 5 and max(calls) == 2
+
+
+@pytest.mark.anyio
+async def test_errors_reach_every_waiting_request():
+    def predict(batch):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=10)
+    results = await asyncio.gather(
+        *(batcher.submit(np.zeros(1)) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.anyio
+async def test_full_inference_pool_rejects_new_work():
+    pool = InferencePool(max_workers=1, max_queued=1)
+    release = threading.Event()
+    busy = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+
+    assert pool.stats()["saturation"] == 1.0
+    with pytest.raises(PoolSaturated):
+        await pool.run(lambda: None)
+
+    release.set()
+    await asyncio.gather(*busy)
+    stats = pool.stats()
+    assert stats["rejected"] == 1 and stats["completed"] == 2 and stats["saturation"] == 0
+
+
+@pytest.mark.anyio
+async def test_cancelled_requests_keep_their_slot_until_the_work_ends():
+    pool = InferencePool(max_workers=1, max_queued=1)
+    release = threading.Event()
+    try:
+        busy = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        # Clients gone: the queued task never starts, the running one can't be stopped
+        for task in busy:
+            task.cancel()
+        await asyncio.gather(*busy, return_exceptions=True)
+        assert pool.stats()["running"] == 1 and pool.stats()["queued"] == 0
+
+        queued = asyncio.ensure_future(pool.run(lambda: None))
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturated):
+            await pool.run(lambda: None)
+    finally:
+        release.set()
+    await queued
+
+    def fail():
+        raise ValueError("corrupt image")
+
+    with pytest.raises(ValueError):
+        await pool.run(fail)
+    stats = pool.stats()
+    assert stats["completed"] == 2 and stats["failed"] == 2 and stats["saturation"] == 0
+
+
+@pytest.mark.anyio
+async def test_batches_count_against_the_inference_pool():
+    pool = InferencePool(max_workers=1, max_queued=0)
+    batcher = MicroBatcher(lambda batch: batch, max_batch_size=4, max_wait_ms=10, run=pool.run)
+    await asyncio.gather(*(batcher.submit(np.zeros(1)) for _ in range(3)))
+    assert pool.stats()["completed"] == 1
+
+    # A full pool fails the whole batch with PoolSaturated, which the app answers with a 429
+    release = threading.Event()
+    busy = asyncio.ensure_future(pool.run(release.wait))
+    await asyncio.sleep(0.05)
+    results = await asyncio.gather(
+        *(batcher.submit(np.zeros(1)) for _ in range(2)), return_exceptions=True
+    )
+    release.set()
+    await busy
+    assert all(isinstance(r, PoolSaturated) for r in results)
+    assert pool.stats()["rejected"] == 1
+
+    await batcher.close()
+    assert batcher._worker is None
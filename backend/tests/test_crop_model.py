@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from app.models.crop import CSV_PATH, Model
+from app.models.crop_artifact import compile_csv, load_crop_data, write_artifact
+from app.game.model import Model as GameModel
+
+
+@pytest.fixture(scope="module")
+def model():
+    return Model()
+
+
+def test_centroid_mode_ranks_by_distance(model):
+    params = model.d["rice"]
+    top, predictions = model.topn(3, params, mode="centroid")
+    assert top[0] == "rice"
+    assert predictions["rice"] == pytest.approx(0.0)
+    assert list(predictions.values()) == sorted(predictions.values())
+
+
+def test_knn_mode_votes_over_training_rows(model):
+    params = np.array([90, 42, 43, 20.88, 82.0, 6.5, 202.9])  # a rice row
+    top, predictions = model.topn(3, params, mode="knn")
+    assert top[0] == "rice"
+    assert sum(predictions.values()) == pytest.approx(1.0)
+    assert list(predictions.values()) == sorted(predictions.values(), reverse=True)
+
+
+def test_standardize_puts_ph_on_rainfall_scale(model):
+    # A pH shift that is tiny in raw units still moves the query in
+    # standardized space, so rainfall no longer swamps it.
+    low = model.standardize(np.array([50, 50, 50, 25, 70, 4.0, 100]))
+    high = model.standardize(np.array([50, 50, 50, 25, 70, 9.0, 100]))
+    assert abs(high[5] - low[5]) > 5
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        Model(mode="nearest")
+
+
+def test_artifact_is_memory_mapped(tmp_path):
+    out = tmp_path / "crop_model.npz"
+    write_artifact(compile_csv(CSV_PATH), str(out))
+    data = load_crop_data(CSV_PATH, str(out))
+    assert data.source == "artifact"
+    assert isinstance(data.rows, np.memmap)
+    assert data.labels[0] == "rice"
+
+
+def test_stale_artifact_falls_back_to_csv(tmp_path):
+    csv_path = tmp_path / "data.csv"
+    csv_path.write_text("N,P,K,temperature,humidity,ph,rainfall,label\n1,2,3,4,5,6,7,rice\n")
+    out = tmp_path / "crop_model.npz"
+    write_artifact(compile_csv(str(csv_path)), str(out))
+
+    csv_path.write_text(csv_path.read_text() + "2,3,4,5,6,7,8,maize\n")
+    data = load_crop_data(str(csv_path), str(out))
+    assert data.source == "csv"
+    assert list(data.crops) == ["maize", "rice"]
+
+
+@pytest.mark.parametrize("mode", ["centroid", "knn"])
+def test_score_matrix_matches_single_predictions(model, mode):
+    params = np.array([[90, 42, 43, 20.88, 82.0, 6.5, 202.9], [40, 40, 40, 25, 65, 6.5, 100]])
+    scores = model.score_matrix(params, mode=mode)
+    assert scores.shape == (2, len(model.crops))
+    for row, single in zip(scores, params):
+        _, predictions = model.topn(len(model.crops), single, mode=mode)
+        expected = [predictions.get(crop, 0.0) for crop in model.crops]
+        assert row == pytest.approx(expected)
+
+
+def test_timeline_ranks_each_day_and_reports_stability(model):
+    rice_day = [90, 42, 43, 20.88, 82.0, 6.5, 202.9]
+    dry_day = [20, 68, 19, 25, 65, 7, 46]
+    ranked, scores, stability = model.timeline(np.array([rice_day, rice_day, dry_day]), 2)
+    assert len(ranked) == 3 and all(len(day) == 2 for day in ranked)
+    assert ranked[0] == ranked[1]
+    assert stability[ranked[0][0]] >= 2 / 3
+
+
+def test_game_grid_scoring_matches_per_cell_sort():
+    game = GameModel()
+    grid = np.array([[40, 40, 40, 25, 65, 6.5, 100], [90, 42, 43, 20.9, 82, 6.5, 203]])
+    for cell, top in zip(grid, game.top_crops_per_cell(grid, 3)):
+        expected = sorted(game.predict(cell).items(), key=lambda item: item[1])[:3]
+        assert [crop for crop, _ in top] == [crop for crop, _ in expected]
+        assert [d for _, d in top] == pytest.approx([d for _, d in expected])
+    assert game.recommend_grid(grid[:1], 3)[0] == game.get_recommendations(*grid[0])
@@ -0,0 +1,66 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.core.constants import DISEASE_CLASSES
+from app.models import disease
+from app.models.result_cache import ResultCache
+
+
+def jpeg(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_plot_summary_ignores_healthy_leaves():
+    summary = disease.summarize_plot(
+        [
+            ("Tomato___healthy", 0.9),
+            ("Tomato___healthy", 0.8),
+            ("Tomato___Early_blight", 0.7),
+            ("Tomato___Late_blight", 0.6),
+            ("Tomato___Early_blight", 0.5),
+        ]
+    )
+    assert summary["images"] == 5 and summary["diseased"] == 3
+    assert summary["primary_disease"] == "Tomato___Early_blight"
+
+
+@pytest.mark.anyio
+async def test_batch_upload_runs_one_forward_pass(client, monkeypatch, upload_store):
+    batches = []
+
+    def fake_predict_batch(batch):
+        batches.append(batch.shape)
+        # Class 0 for dark images, the last class for bright ones
+        out = np.zeros((len(batch), len(DISEASE_CLASSES)))
+        out[np.arange(len(batch)), np.where(batch.mean(axis=(1, 2, 3)) > 127, -1, 0)] = 0.9
+        return out
+
+    monkeypatch.setattr(disease, "predict_batch", fake_predict_batch)
+    monkeypatch.setattr(disease, "results", ResultCache("disease", lambda: "v1"))
+
+    await client.post("/users/", json={"username": "agent", "latitude": 1, "longitude": 1})
+    client.cookies.set("username", "agent")
+    dark, bright = jpeg((10, 10, 10)), jpeg((250, 250, 250))
+    files = [
+        ("images", (f"leaf{i}.jpg", data, "image/jpeg"))
+        for i, data in enumerate([dark, bright, dark])
+    ]
+    response = await client.post("/tests/disease/predict-batch", files=files)
+
+    assert response.status_code == 200
+    body = response.json()
+    # The repeated photo is decoded and predicted once
+    assert batches == [(2, 128, 128, 3)]
+    assert [scan["detected_disease"] for scan in body["scans"]] == [
+        DISEASE_CLASSES[0],
+        DISEASE_CLASSES[-1],
+        DISEASE_CLASSES[0],
+    ]
+    assert len({scan["id"] for scan in body["scans"]}) == 3
+    assert body["diagnosis"]["primary_disease"] == DISEASE_CLASSES[0]
+    assert len([p for p in (upload_store / "blobs").rglob("*") if p.is_file()]) == 2
@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.fixture
+async def farmer(client):
+    await client.post("/users/", json={"username": "farmer", "latitude": 1, "longitude": 1})
+    client.cookies.set("username", "farmer")
+
+
+@pytest.mark.anyio
+async def test_vote_on_missing_question_is_404(client, farmer):
+    response = await client.post("/forum/questions/999/vote")
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_answer_to_missing_question_is_404(client, farmer):
+    response = await client.post("/forum/questions/999/answer", json={"content": "Try neem oil"})
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_vote_on_missing_answer_is_404(client, farmer):
+    response = await client.post("/forum/answers/999/vote", json={"vote_type": 1})
+    assert response.status_code == 404
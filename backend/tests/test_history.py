@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db import models
+
+
+async def seed_scans(client, db_session, count):
+    await client.post("/users/", json={"username": "farmer", "latitude": 1, "longitude": 1})
+    client.cookies.set("username", "farmer")
+    user_id = (await client.get("/users/me", params={"username": "farmer"})).json()["id"]
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    # Pairs of scans share a timestamp, so the id has to break ties
+    db_session.add_all(
+        models.DiseaseDetection(
+            user_id=user_id,
+            image_path=f"scan{i}.jpg",
+            detected_disease="Tomato___healthy",
+            confidence_score=0.9,
+            precautions="long text",
+            solutions="long text",
+            created_at=start + timedelta(days=i // 2),
+        )
+        for i in range(count)
+    )
+    await db_session.commit()
+
+
+@pytest.mark.anyio
+async def test_history_pages_through_every_scan_once(client, db_session):
+    await seed_scans(client, db_session, 7)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/tests/disease/history", params=params)).json()
+        seen += [item["image_path"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"scan{i}.jpg" for i in reversed(range(7))]
+
+
+@pytest.mark.anyio
+async def test_history_filters_dates_and_omits_text(client, db_session):
+    await seed_scans(client, db_session, 6)
+
+    response = await client.get(
+        "/tests/disease/history",
+        params={"since": "2026-03-02", "until": "2026-03-02", "include_text": "false"},
+    )
+    items = response.json()["items"]
+    assert [item["image_path"] for item in items] == ["scan3.jpg", "scan2.jpg"]
+    assert items[0]["precautions"] is None and items[0]["solutions"] is None
+
+    bad = await client.get("/tests/disease/history", params={"cursor": "nonsense"})
+    assert bad.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_slim_profile_has_counts_and_latest_item(client, db_session):
+    await seed_scans(client, db_session, 3)
+
+    data = (await client.get("/users/me", params={"username": "farmer", "slim": "true"})).json()
+    assert data["disease_scans"]["count"] == 3
+    assert data["disease_scans"]["latest"]["image_path"] == "scan2.jpg"
+    assert data["disease_scans"]["latest"]["precautions"] is None
+    assert data["risk_reports"] == {"count": 0, "latest": None}
+    assert data["username"] == "farmer"
@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import inspect, text
+
+from app.db.migrations import MIGRATIONS, run_migrations, status
+from app.db.session import build_engine
+
+
+@pytest.fixture
+async def legacy_engine(tmp_path):
+    """A database created before the indexes existed, with a racing duplicate vote."""
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "CREATE TABLE question_votes "
+                "(id INTEGER PRIMARY KEY, user_id INT, question_id INT)"
+            )
+        )
+        await conn.execute(
+            text("INSERT INTO question_votes (user_id, question_id) VALUES (1, 7), (1, 7), (2, 7)")
+        )
+    yield engine
+    await engine.dispose()
+
+
+def index_names(conn, table):
+    return {index["name"] for index in inspect(conn).get_indexes(table)}
+
+
+@pytest.mark.anyio
+async def test_migrations_add_indexes_once(legacy_engine):
+    assert await run_migrations(legacy_engine) == [version for version, _, _ in MIGRATIONS]
+    assert await run_migrations(legacy_engine) == []
+    assert all(applied for _, _, applied in await status(legacy_engine))
+
+    async with legacy_engine.connect() as conn:
+        assert "uq_question_votes_question_user" in await conn.run_sync(
+            index_names, "question_votes"
+        )
+        assert "ix_disease_detections_user_created" in await conn.run_sync(
+            index_names, "disease_detections"
+        )
+        votes = (await conn.execute(text("SELECT user_id FROM question_votes"))).scalars()
+        assert sorted(votes) == [1, 2]
+
+
+@pytest.mark.anyio
+async def test_votes_are_single_statement_upserts(client):
+    await client.post("/users/", json={"username": "farmer", "latitude": 1, "longitude": 1})
+    client.cookies.set("username", "farmer")
+    question = (await client.post("/forum/questions", data={"title": "t", "content": "c"})).json()
+    answer = (
+        await client.post(f"/forum/questions/{question['id']}/answer", json={"content": "a"})
+    ).json()
+
+    vote = f"/forum/questions/{question['id']}/vote"
+    assert (await client.post(vote)).status_code == 200
+    assert (await client.post(vote)).status_code == 400
+
+    vote = f"/forum/answers/{answer['id']}/vote"
+    assert (await client.post(vote, json={"vote_type": 1})).status_code == 200
+    assert (await client.post(vote, json={"vote_type": 1})).status_code == 400
+    assert (await client.post(vote, json={"vote_type": -1})).status_code == 200
+
+    detail = (await client.get(f"/forum/questions/{question['id']}")).json()
+    assert detail["upvotes"] == 1
+    assert (detail["answers"][0]["upvotes"], detail["answers"][0]["downvotes"]) == (0, 1)
@@ -0,0 +1,37 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.models import preprocess
+
+
+def encoded(size, fmt="JPEG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (40, 160, 80)).save(buffer, fmt)
+    buffer.seek(0)
+    return buffer
+
+
+def test_large_jpeg_is_decoded_at_reduced_scale(monkeypatch):
+    decoded_sizes = []
+    resize = Image.Image.resize
+
+    def spy(self, size, *args, **kwargs):
+        decoded_sizes.append(self.size)
+        return resize(self, size, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, "resize", spy)
+    array = preprocess.decode(encoded((2048, 1536)), (128, 128), Image.NEAREST)
+
+    assert array.shape == (128, 128, 3) and array.dtype == np.uint8
+    # libjpeg's 1/8 scale is the smallest that still covers 128x128
+    assert decoded_sizes == [(256, 192)]
+
+
+def test_batch_fills_each_slot():
+    files = [encoded((300, 200)), encoded((64, 64), "PNG")]
+    batch = preprocess.decode_batch(files, (220, 220), Image.BICUBIC)
+
+    assert batch.shape == (2, 220, 220, 3) and batch.dtype == np.uint8
+    assert np.allclose(batch.reshape(-1, 3).mean(axis=0), [40, 160, 80], atol=2)
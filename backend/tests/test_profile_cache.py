@@ -0,0 +1,17 @@
+from app.services.profile_cache import ProfileCache
+
+
+def test_versions_are_bounded_and_never_revive_stale_responses():
+    cache = ProfileCache(ttl=60, max_size=2)
+    stale = cache.version(1)  # Read before rendering user 1's profile
+    for user_id in (1, 2, 3):
+        cache.invalidate(user_id)
+    assert cache.stats()["versions"] == 2
+
+    # User 1's version was dropped, but the one read before the write still misses
+    cache.put(1, "full", stale, b"stale")
+    assert cache.get(1, "full") is None
+    cache.invalidate(2)
+    cache.invalidate(4)  # Drops user 3
+    cache.put(3, "full", cache.version(3), b"fresh")
+    assert cache.get(3, "full") == b"fresh"
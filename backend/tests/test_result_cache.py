@@ -0,0 +1,62 @@
+import pytest
+
+from app.models import disease
+from app.models.result_cache import ResultCache, content_hash
+
+JPEG_MAGIC = b"\xff\xd8\xff\xe0"
+
+
+@pytest.mark.anyio
+async def test_results_survive_in_the_table_and_follow_the_model_version(db_session):
+    version = "v1"
+    cache = ResultCache("disease", lambda: version)
+    digest = content_hash(b"leaf")
+
+    assert await cache.get(db_session, digest) is None
+    await cache.put(db_session, digest, ["Tomato___healthy", 0.9], "uploads/leaf.jpg")
+    assert await cache.get(db_session, digest) == ["Tomato___healthy", 0.9]
+
+    # A fresh process has an empty LRU but still finds the row
+    restarted = ResultCache("disease", lambda: version)
+    assert await restarted.get(db_session, digest) == ["Tomato___healthy", 0.9]
+    assert restarted.stats()["db_hits"] == 1
+
+    version = "v2"
+    assert await restarted.get(db_session, digest) is None
+
+
+@pytest.mark.anyio
+async def test_lru_is_bounded(db_session):
+    cache = ResultCache("soil", lambda: "v1", max_size=2)
+    for name in ["a", "b", "c"]:
+        await cache.put(db_session, content_hash(name.encode()), [name, 1.0], f"{name}.jpg")
+    assert cache.stats()["size"] == 2
+
+
+@pytest.mark.anyio
+async def test_duplicate_upload_skips_inference_and_reuses_the_file(
+    client, monkeypatch, upload_store
+):
+    calls = []
+
+    async def fake_predict(file):
+        calls.append(file)
+        return "Apple___Black_rot", 0.75
+
+    monkeypatch.setattr(disease, "predict_disease_batched", fake_predict)
+    monkeypatch.setattr(disease, "results", ResultCache("disease", lambda: "v1"))
+
+    await client.post("/users/", json={"username": "farmer", "latitude": 1, "longitude": 1})
+    client.cookies.set("username", "farmer")
+    responses = [
+        await client.post(
+            "/tests/disease/predict",
+            files={"image": ("leaf.jpg", JPEG_MAGIC + b"same bytes", "image/jpeg")},
+        )
+        for _ in range(2)
+    ]
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert len(calls) == 1
+    assert responses[0].json()["detected_disease"] == responses[1].json()["detected_disease"]
+    assert len([p for p in (upload_store / "blobs").rglob("*") if p.is_file()]) == 1
@@ -0,0 +1,204 @@
+import asyncio
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+
+from app.db import models
+from app.models import risk
+from app.services import climatology, risk_engine
+from app.services.risk_engine import RiskEngine
+
+
+def make_forecast(t_max=28.0, days=16):
+    start = date.today()
+    daily = [
+        {
+            "date": (start + timedelta(days=i)).isoformat(),
+            "temperature_2m_max": t_max,
+            "temperature_2m_min": 18.0,
+            "precipitation_sum": 8.0,
+        }
+        for i in range(days)
+    ]
+    hourly = [
+        {"relative_humidity_2m": 60, "soil_moisture_27_to_81cm": 50, "terrestrial_radiation": 250}
+    ] * (24 * days)
+    return {"latitude": 27.7, "elevation": 1300.0, "daily": daily, "hourly": hourly}
+
+
+def flat_normals(t_max=28.0, t_min=18.0, precipitation=6.0):
+    return np.tile([t_max, t_min, precipitation], (366, 1))
+
+
+def test_mild_season_is_low_risk():
+    report = risk.predict("Rice", make_forecast(), flat_normals())
+    assert report.level == "Low"
+    assert report.factors == ["No significant risks expected"]
+    assert report.end - report.start == timedelta(days=risk.HORIZON_DAYS)
+
+
+def test_climatology_extends_the_forecast():
+    # Hot and dry past the forecast: heat in a critical stage and a long dry spell
+    report = risk.predict("Rice", make_forecast(), flat_normals(t_max=39.0, precipitation=0.0))
+    assert report.level == "High"
+    assert any(f.startswith("Heat stress likely during Flowering") for f in report.factors)
+    assert any(f.startswith(f"Dry spell of {risk.HORIZON_DAYS - 16} days") for f in report.factors)
+
+
+def test_normals_smooth_and_fill_missing_days():
+    days = [date(2024, 1, 1) + timedelta(days=i) for i in range(366)]
+    values = np.tile([30.0, 20.0, 4.0], (366, 1))
+    values[100] = [np.nan, np.nan, 400.0]  # One storm, one missing temperature
+    normals = climatology.compute_normals(days, values)
+    assert normals.shape == (366, 3)
+    assert np.allclose(normals[:, :2], [30.0, 20.0])
+    assert normals[100, 2] == pytest.approx(4.0 + 396.0 / climatology.SMOOTHING_DAYS)
+
+
+@pytest.fixture
+def weather(monkeypatch):
+    """Forecasts and history served from memory, counting forecast fetches."""
+    state = {"forecast": make_forecast(), "fetches": 0}
+
+    def fetch_forecast(latitude, longitude):
+        state["fetches"] += 1
+        return state["forecast"]
+
+    def fetch_daily_history(latitude, longitude, years):
+        days = [date(2024, 1, 1) + timedelta(days=i) for i in range(366)]
+        return days, np.tile([28.0, 18.0, 6.0], (366, 1))
+
+    monkeypatch.setattr(risk_engine, "fetch_forecast", fetch_forecast)
+    monkeypatch.setattr(climatology, "fetch_daily_history", fetch_daily_history)
+    monkeypatch.setattr(risk_engine, "CROPS", ["Rice", "Maize"])
+    return state
+
+
+async def report_rows(db):
+    rows = await db.execute(
+        select(models.RiskPrediction.user_id, models.RiskPrediction.crop_name,
+               models.RiskPrediction.risk_level)
+        .order_by(models.RiskPrediction.user_id, models.RiskPrediction.crop_name)
+    )
+    return rows.all()
+
+
+@pytest.mark.anyio
+async def test_engine_recomputes_only_changed_forecasts(db_session, weather):
+    db_session.add_all(
+        [
+            models.User(username="a", latitude=27.71, longitude=85.31),
+            models.User(username="b", latitude=27.72, longitude=85.32),  # Same cell
+            models.User(username="nowhere"),
+        ]
+    )
+    await db_session.commit()
+    engine = RiskEngine()
+
+    await engine.run_once(db_session)
+    rows = await report_rows(db_session)
+    assert [(user_id, crop) for user_id, crop, _ in rows] == [
+        (1, "Maize"), (1, "Rice"), (2, "Maize"), (2, "Rice")
+    ]
+    assert weather["fetches"] == 1  # One forecast per cell
+    assert await db_session.scalar(select(func.count()).select_from(models.ClimateNormal)) == 1
+
+    # Same forecast: nothing to recompute
+    await engine.run_once(db_session)
+    assert engine.users_recomputed == 2 and engine.reports_written == 4
+
+    # A hot forecast for the same days replaces the reports in place
+    weather["forecast"] = make_forecast(t_max=45.0)
+    await engine.run_once(db_session)
+    rows = await report_rows(db_session)
+    assert len(rows) == 4
+    assert {level for _, _, level in rows} == {"High"}
+    assert engine.users_recomputed == 4
+
+
+@pytest.mark.anyio
+async def test_failed_forecast_keeps_reports(db_session, weather, monkeypatch):
+    db_session.add(models.User(username="a", latitude=27.71, longitude=85.31))
+    await db_session.commit()
+
+    def unavailable(latitude, longitude):
+        raise ConnectionError("forecast service down")
+
+    monkeypatch.setattr(risk_engine, "fetch_forecast", unavailable)
+    engine = RiskEngine()
+    await engine.run_once(db_session)
+    assert engine.cells_failed == 1
+    assert await report_rows(db_session) == []
+
+
+@pytest.mark.anyio
+async def test_one_worker_holds_the_lease(db_session, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(risk_engine.time, "time", lambda: clock[0])
+    first, second = RiskEngine(), RiskEngine()
+    first.holder, second.holder = "host:1", "host:2"
+
+    assert await first.acquire_lease(db_session)
+    assert not await second.acquire_lease(db_session)
+    clock[0] += risk_engine.RISK_ENGINE_INTERVAL_SECONDS
+    assert await first.acquire_lease(db_session)  # Renewed
+
+    # The holder stopped renewing: the lease passes on once it expires
+    clock[0] += risk_engine.LEASE_INTERVALS * risk_engine.RISK_ENGINE_INTERVAL_SECONDS + 1
+    assert await second.acquire_lease(db_session)
+    assert not await first.acquire_lease(db_session)
+
+
+@pytest.mark.anyio
+async def test_long_runs_keep_the_lease(db_session, weather, monkeypatch):
+    clock = [1000.0]
+    lease_seconds = risk_engine.LEASE_INTERVALS * risk_engine.RISK_ENGINE_INTERVAL_SECONDS
+    monkeypatch.setattr(risk_engine.time, "time", lambda: clock[0])
+    monkeypatch.setattr(risk_engine, "RISK_ENGINE_USER_BATCH", 1)
+    fetch_forecast = risk_engine.fetch_forecast
+
+    def slow_fetch(latitude, longitude):
+        clock[0] += lease_seconds - 1  # Each batch nearly outlasts the lease
+        return fetch_forecast(latitude, longitude)
+
+    monkeypatch.setattr(risk_engine, "fetch_forecast", slow_fetch)
+    db_session.add_all(
+        [
+            models.User(username="a", latitude=27.71, longitude=85.31),
+            models.User(username="b", latitude=20.71, longitude=80.31),  # Another cell
+        ]
+    )
+    await db_session.commit()
+    first, second = RiskEngine(), RiskEngine()
+    first.holder, second.holder = "host:1", "host:2"
+
+    await first.run_once(db_session)
+    assert first.users_recomputed == 2
+    assert not await second.acquire_lease(db_session)
+
+    # A run that finds the lease taken stops before its first batch
+    clock[0] += lease_seconds + 1
+    assert await second.acquire_lease(db_session)
+    await first.run_once(db_session)
+    assert first.runs == 1
+
+
+@pytest.mark.anyio
+async def test_first_run_waits_for_the_interval(monkeypatch):
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        raise asyncio.CancelledError
+
+    async def run_once(db):
+        raise AssertionError("ran at startup")
+
+    engine = RiskEngine()
+    monkeypatch.setattr(risk_engine.asyncio, "sleep", sleep)
+    monkeypatch.setattr(engine, "run_once", run_once)
+    with pytest.raises(asyncio.CancelledError):
+        await engine.run_forever()
+    assert sleeps == [risk_engine.RISK_ENGINE_INTERVAL_SECONDS]
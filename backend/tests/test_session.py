@@ -0,0 +1,23 @@
+import pytest
+from sqlalchemy import text
+
+from app.core.config import SQLITE_BUSY_TIMEOUT_MS
+from app.db.session import build_engine
+
+
+async def pragma(conn, name):
+    return await conn.scalar(text(f"PRAGMA {name}"))
+
+
+@pytest.mark.anyio
+async def test_sqlite_connections_get_pragmas(tmp_path):
+    # A file database: an in-memory one can't use WAL
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'pragmas.db'}")
+    try:
+        async with engine.connect() as conn:
+            assert await pragma(conn, "journal_mode") == "wal"
+            assert await pragma(conn, "busy_timeout") == SQLITE_BUSY_TIMEOUT_MS
+            assert await pragma(conn, "synchronous") == 1  # NORMAL
+            assert await pragma(conn, "foreign_keys") == 1
+    finally:
+        await engine.dispose()
@@ -0,0 +1,89 @@
+import pytest
+
+from app.models.loading import MODELS, LazyModel, ModelRegistry, ModelUnavailable
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    models = {
+        "ok": LazyModel("ok", lambda: "weights"),
+        "broken": LazyModel("broken", lambda: 1 / 0),
+    }
+    monkeypatch.setattr("app.models.loading.MODELS", models)
+    monkeypatch.setattr("app.router.system.MODELS", models)
+    return models
+
+
+def test_model_loads_once_on_first_use():
+    calls = []
+    lazy = LazyModel("counted", lambda: calls.append(1) or "weights")
+    assert lazy.state == "not_loaded"
+    assert lazy.get() == "weights" and lazy.get() == "weights"
+    assert calls == [1] and lazy.state == "ready"
+
+
+def test_disabled_model_is_never_loaded(monkeypatch):
+    monkeypatch.setattr("app.models.loading.DISABLED_MODELS", {"soil"})
+    lazy = LazyModel("soil", lambda: pytest.fail("disabled model was loaded"))
+    assert lazy.state == "disabled"
+    with pytest.raises(ModelUnavailable):
+        lazy.get()
+
+
+def test_app_models_are_not_loaded_at_import():
+    assert MODELS["disease"].state == "not_loaded"
+    assert MODELS["soil"].state == "not_loaded"
+
+
+@pytest.mark.anyio
+async def test_ready_reports_per_model_state(client, fake_models):
+    response = await client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["models"]["ok"]["state"] == "not_loaded"
+
+    fake_models["ok"].get()
+    with pytest.raises(ModelUnavailable):
+        fake_models["broken"].get()
+    fake_models["broken"].enabled = False
+
+    response = await client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["models"]["broken"]["state"] == "failed"
+
+
+class FakeWeights:
+    def __init__(self, mb):
+        self.memory_bytes = mb * 2**20
+
+
+def test_registry_evicts_least_recently_used_over_budget():
+    registry = ModelRegistry(memory_budget_mb=100)
+    for name in ["a", "b", "c"]:
+        registry.register(name, lambda: FakeWeights(40))
+
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")  # b is now the least recently used
+    registry.get("c")
+
+    assert [key for key, lazy in registry.models.items() if lazy.loaded] == ["a", "c"]
+    assert registry.models["b"].state == "evicted"
+
+    registry.get("b")  # Reloads, evicting a
+    stats = registry.stats()
+    assert stats["loads"] == 4 and stats["evictions"] == 2
+    assert stats["hits"] == 1 and stats["lookups"] == 5
+    assert stats["resident_mb"] == 80
+
+
+def test_registry_resolves_versions():
+    registry = ModelRegistry()
+    registry.register("disease", lambda: "v1", version="1")
+    registry.register("disease", lambda: "v2", version="2")
+    registry.register("disease", lambda: "tomato", version="tomato", default=False)
+
+    assert registry.get("disease") == "v2"
+    assert registry.get("disease", "1") == "v1"
+    assert registry.get("disease", "tomato") == "tomato"
+    with pytest.raises(ModelUnavailable):
+        registry.get("disease", "3")
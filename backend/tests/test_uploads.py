@@ -0,0 +1,270 @@
+import gzip
+import io
+import os
+import time
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from httpx import ASGITransport, AsyncClient
+from PIL import Image
+from sqlalchemy import select
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app.db import models
+from app.services import derivatives, storage, usage
+from app.services.maintenance import StorageMaintenance
+from app.services.static import UploadStaticFiles
+from app.services.uploads import ingest_image, sniff_image_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+@pytest.fixture
+def blob_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "BLOB_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setattr(storage, "DERIVED_DIR", str(tmp_path / "derived"))
+    return tmp_path / "blobs"
+
+
+def stored_files(directory):
+    return [p for p in directory.rglob("*") if p.is_file()]
+
+
+def test_type_comes_from_magic_bytes():
+    assert sniff_image_type(b"\xff\xd8\xff\xe0rest") == "jpeg"
+    assert sniff_image_type(PNG) == "png"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert sniff_image_type(b"<html>") is None
+
+
+@pytest.mark.anyio
+async def test_upload_is_stored_once_in_a_sharded_blob(blob_dir):
+    first = await ingest_image(UploadFile(io.BytesIO(PNG), filename="a.jpg"))
+    second = await ingest_image(UploadFile(io.BytesIO(PNG), filename="b.png"))
+
+    sha = first.sha256
+    assert first.key == f"{sha[:2]}/{sha[2:4]}/{sha}.png" and first.size == len(PNG)
+    assert first.created and not second.created
+    assert stored_files(blob_dir) == [blob_dir / first.key]
+
+
+@pytest.mark.anyio
+async def test_rejected_uploads_leave_nothing_behind(blob_dir):
+    with pytest.raises(HTTPException) as e:
+        await ingest_image(UploadFile(io.BytesIO(b"GIF89a...")))
+    assert e.value.status_code == 400
+
+    with pytest.raises(HTTPException) as e:
+        await ingest_image(UploadFile(io.BytesIO(PNG * 10)), max_bytes=100)
+    assert e.value.status_code == 413
+    assert stored_files(blob_dir) == []
+
+
+@pytest.mark.anyio
+async def test_blob_is_unlinked_with_its_last_reference(blob_dir, db_session):
+    upload = await ingest_image(UploadFile(io.BytesIO(PNG)))
+    user = models.User(username="farmer")
+    db_session.add(user)
+    await db_session.flush()
+    scans = [
+        models.SoilTypePrediction(
+            user_id=user.id, image_path=upload.path, predicted_soil_type="Black Soil"
+        )
+        for _ in range(2)
+    ]
+    # The forum refers to the same blob by URL
+    question = models.Question(title="t", content="c", image_path=upload.url, user_id=user.id)
+    db_session.add_all([*scans, question])
+    await db_session.commit()
+
+    for row in [scans[0], question]:
+        await db_session.refresh(row)  # Expired by the previous commit
+        await storage.delete_with_image(db_session, row)
+        assert stored_files(blob_dir) == [blob_dir / upload.key]
+
+    # Past the grace period nothing can be about to refer to it again
+    old = time.time() - (storage.STORAGE_GC_GRACE_HOURS + 1) * 3600
+    os.utime(upload.path, (old, old))
+    await db_session.refresh(scans[1])
+    await storage.delete_with_image(db_session, scans[1])
+    assert stored_files(blob_dir) == []
+    assert (await db_session.execute(select(models.SoilTypePrediction))).first() is None
+
+
+@pytest.mark.anyio
+async def test_delete_keeps_a_blob_a_concurrent_upload_reuses(blob_dir, db_session):
+    first = await ingest_image(UploadFile(io.BytesIO(PNG)))
+    user = models.User(username="farmer")
+    db_session.add(user)
+    await db_session.flush()
+    row = models.SoilTypePrediction(
+        user_id=user.id, image_path=first.path, predicted_soil_type="Black Soil"
+    )
+    db_session.add(row)
+    await db_session.commit()
+    old = time.time() - (storage.STORAGE_GC_GRACE_HOURS + 1) * 3600
+    os.utime(first.path, (old, old))
+
+    # Same bytes again: the upload reuses the file, its row is not committed yet
+    second = await ingest_image(UploadFile(io.BytesIO(PNG)))
+    assert not second.created
+    await db_session.refresh(row)
+    await storage.delete_with_image(db_session, row)
+    assert stored_files(blob_dir) == [blob_dir / second.key]
+
+
+def photo(size, color=(30, 120, 40)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def static_client(blob_dir, tmp_path):
+    app = Starlette(routes=[Mount("/static", UploadStaticFiles(directory=tmp_path))])
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.anyio
+async def test_width_parameter_serves_a_cached_variant(static_client, tmp_path):
+    upload = await ingest_image(UploadFile(io.BytesIO(photo((1600, 1200)))))
+    url = f"/static/blobs/{upload.key}"
+
+    async with static_client as client:
+        webp = await client.get(f"{url}?w=150", headers={"accept": "image/webp,*/*"})
+        jpeg = await client.get(f"{url}?w=150")
+        original = await client.get(url)
+
+    assert webp.headers["content-type"] == "image/webp" and webp.headers["vary"] == "Accept"
+    assert Image.open(io.BytesIO(webp.content)).size == (200, 150)  # Snapped up to 200
+    assert Image.open(io.BytesIO(jpeg.content)).format == "JPEG"
+    assert original.content == photo((1600, 1200))
+    variants = sorted(p.name for p in (tmp_path / "derived").rglob("*") if p.is_file())
+    assert variants == [f"{upload.sha256}.w200.jpg", f"{upload.sha256}.w200.webp"]
+
+    # Deleting the blob takes its variants with it
+    storage.unlink(upload.path)
+    assert not any(p.is_file() for p in (tmp_path / "derived").rglob("*"))
+
+
+@pytest.mark.anyio
+async def test_small_images_are_not_upscaled(static_client):
+    upload = await ingest_image(UploadFile(io.BytesIO(photo((120, 90)))))
+    async with static_client as client:
+        response = await client.get(f"/static/blobs/{upload.key}?w=480")
+    assert Image.open(io.BytesIO(response.content)).size == (120, 90)
+
+
+@pytest.mark.anyio
+async def test_static_files_are_immutable_and_revalidate_with_304(static_client):
+    upload = await ingest_image(UploadFile(io.BytesIO(photo((64, 48)))))
+    url = f"/static/blobs/{upload.key}"
+
+    async with static_client as client:
+        first = await client.get(url)
+        again = await client.get(url, headers={"if-none-match": first.headers["etag"]})
+        part = await client.get(url, headers={"range": "bytes=0-9"})
+
+    assert "immutable" in first.headers["cache-control"]
+    assert first.headers["etag"] == f'"{upload.key.rsplit("/", 1)[1]}"'
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == first.headers["etag"]
+    assert part.status_code == 206 and part.content == first.content[:10]
+
+
+@pytest.mark.anyio
+async def test_precompressed_sibling_is_served_when_accepted(static_client, tmp_path):
+    (tmp_path / "guide.svg").write_bytes(b"<svg/>")
+    (tmp_path / "guide.svg.gz").write_bytes(gzip.compress(b"<svg/>"))
+
+    async with static_client as client:
+        gzipped = await client.get("/static/guide.svg", headers={"accept-encoding": "gzip"})
+        plain = await client.get("/static/guide.svg", headers={"accept-encoding": "identity"})
+
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["content-type"].startswith("image/svg+xml")
+    assert gzipped.content == b"<svg/>"  # httpx decodes it
+    assert "content-encoding" not in plain.headers and plain.content == b"<svg/>"
+    assert gzipped.headers["etag"] != plain.headers["etag"]
+    assert gzipped.headers["vary"] == "Accept-Encoding"
+
+
+def age(path, hours):
+    old = time.time() - hours * 3600
+    os.utime(path, (old, old))
+
+
+@pytest.mark.anyio
+async def test_collector_removes_old_unreferenced_blobs_and_variants(blob_dir, db_session):
+    kept, orphan, young = [
+        await ingest_image(UploadFile(io.BytesIO(photo((32, 32), color))))
+        for color in [(1, 1, 1), (2, 2, 2), (3, 3, 3)]
+    ]
+    user = models.User(username="farmer")
+    db_session.add(user)
+    await db_session.flush()
+    db_session.add(models.Question(title="t", content="c", image_path=kept.url, user_id=user.id))
+    await db_session.commit()
+    variant = derivatives.render(orphan.path, 200, "webp")
+    for upload in (kept, orphan):
+        age(upload.path, 48)
+    age(variant, 48)
+
+    gc = StorageMaintenance()
+    for shard in {u.key[:2] for u in (kept, orphan, young)}:
+        await gc.collect(db_session, ("blobs", shard))
+
+    assert sorted(stored_files(blob_dir)) == sorted([blob_dir / kept.key, blob_dir / young.key])
+    assert not os.path.exists(variant)
+    assert gc.files_removed == 1 and gc.bytes_freed == orphan.size
+
+
+@pytest.mark.anyio
+async def test_collector_removes_variants_of_missing_legacy_uploads(
+    blob_dir, db_session, monkeypatch, tmp_path
+):
+    monkeypatch.setattr("app.services.maintenance.UPLOAD_DIR", str(tmp_path))
+    (tmp_path / "disease_images").mkdir()
+    kept, gone = tmp_path / "disease_images" / "kept.jpg", tmp_path / "disease_images" / "gone.jpg"
+    variants = {}
+    for path in (kept, gone):
+        path.write_bytes(photo((32, 32)))
+        variants[path] = derivatives.render(str(path), 200, "webp")
+        assert "legacy" in variants[path]
+        age(variants[path], 48)
+    gone.unlink()
+
+    gc = StorageMaintenance()
+    for variant in variants.values():
+        await gc.collect(db_session, ("blobs", os.path.basename(variant)[:2]))
+
+    assert os.path.exists(variants[kept])
+    assert not os.path.exists(variants[gone])
+
+
+@pytest.mark.anyio
+async def test_quota_is_enforced_and_usage_recomputed(blob_dir, db_session, monkeypatch):
+    monkeypatch.setattr(usage, "QUOTA_BYTES", 2 * len(PNG))
+    user = models.User(username="farmer")
+    db_session.add(user)
+    await db_session.flush()
+    user_id = user.id  # user expires on commit
+    first = await ingest_image(UploadFile(io.BytesIO(PNG)))
+    await usage.enforce_quota(db_session, user_id, [first])
+    db_session.add(
+        models.SoilTypePrediction(user_id=user_id, image_path=first.path, predicted_soil_type="x")
+    )
+    await usage.record(db_session, user_id, [first])
+    await usage.record(db_session, user_id, [first])  # Same image saved twice
+    await db_session.commit()
+
+    second = await ingest_image(UploadFile(io.BytesIO(PNG + b"\x01")))
+    with pytest.raises(HTTPException) as e:
+        await usage.enforce_quota(db_session, user_id, [second])
+    assert e.value.status_code == 413 and not os.path.exists(second.path)
+
+    # The recount charges each distinct file once
+    assert await usage.refresh(db_session, 0, 100) == user_id
+    assert await usage.used_bytes(db_session, user_id) == len(PNG)
+    assert await usage.refresh(db_session, user_id, 100) is None
@@ -1,50 +1,6 @@
 import pytest
-from httpx import AsyncClient, ASGITransport
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from app.__main__ import app
-from app.db.session import get_db, Base
-from app.db import models
-
-# Use an in-memory SQLite database for testing, with aiosqlite driver
-SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
-
-engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-TestingSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-# Dependency override for a test database session
-async def override_get_db():
-    async with TestingSessionLocal() as db:
-        yield db
-
-
-app.dependency_overrides[get_db] = override_get_db
-
-
-@pytest.fixture(scope="function")
-async def db_session():
-    # Setup: Create tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    async with TestingSessionLocal() as db:
-        yield db
-        
-    # Teardown: Drop tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
-
-@pytest.fixture(scope="function")
-async def client(db_session):
-    """
-    A test client for the app.
-    """
-    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
-        yield ac
+from sqlalchemy import event, select
+from app.db import auth, models
 
 
 @pytest.mark.anyio
@@ -162,3 +118,37 @@ async def test_read_users_me_with_soil_type_predictions(client, db_session):
     assert data["username"] == "user_with_predictions"
     assert len(data["soil_type_predictions"]) == 1
     assert data["soil_type_predictions"][0]["predicted_soil_type"] == "sandy"
+
+
+@pytest.mark.anyio
+async def test_identity_is_cached_until_the_user_changes(client, db_session):
+    await client.post("/users/", json={"username": "farmer", "latitude": 1, "longitude": 2})
+
+    first = await auth.get_identity("farmer", db_session)
+    assert first == auth.CurrentUser(first.id, "farmer", False, 1.0, 2.0)
+    assert await auth.get_identity("farmer", db_session) is first
+
+    await client.put("/users/", json={"current_username": "farmer", "new_username": "grower"})
+    assert await auth.get_identity("farmer", db_session) is None
+    assert (await auth.get_identity("grower", db_session)).id == first.id
+
+
+@pytest.mark.anyio
+async def test_profile_is_served_from_cache_until_a_write(client, db_session):
+    await client.post("/users/", json={"username": "farmer", "latitude": 1, "longitude": 2})
+    statements = []
+    engine = db_session.bind.sync_engine
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        first = await client.get("/users/me", params={"username": "farmer"})
+        statements.clear()
+        second = await client.get("/users/me", params={"username": "farmer"})
+        assert statements == [] and second.content == first.content
+        assert second.cookies["username"] == "farmer"
+
+        await client.put("/users/", json={"current_username": "farmer", "latitude": 5})
+        third = await client.get("/users/me", params={"username": "farmer"})
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert third.json()["latitude"] == 5